@@ -0,0 +1,424 @@
+"""
+Serviciu HTTP/JSON local, doar pentru citire, peste preturi si forumuri.
+
+    python api_server.py --db prices.db --forum-db scraper_data.db --port 8080
+
+    GET /api/products?site=eMAG&q=galaxy&sort=recent&page=1&per_page=50
+    GET /api/products/12
+    GET /api/products/12/history?page=2
+    GET /api/compare?q=galaxy s24
+    GET /api/forum/search?q="battery life" samsung&page=1
+    GET /api/forum/stats
+    GET /api/health
+
+Listele au page/per_page (maxim 200) si raspund cu has_more, fara COUNT(*).
+Conexiunile sunt read-only (mode=ro) si tinute cate una pe thread-ul din
+pool-ul serverului, deci nu blocheaza scraping-ul care scrie in aceleasi baze.
+Raspunsurile se pastreaza intr-un cache LRU cu TTL; o intrare e valabila cat
+timp PRAGMA data_version al bazelor citite nu s-a schimbat, adica pana la
+primul commit facut de alt proces (preturi noi, joburi, forumuri).
+"""
+import argparse
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from forumuri_scraper import to_fts_query
+from product_matching import search_canonical
+from storage import get_storage
+
+
+MAX_PER_PAGE = 200
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class DataVersion:
+    """
+    PRAGMA data_version pe o conexiune proprie, care nu scrie niciodata: valoarea
+    se schimba doar cand alta conexiune (alt proces) face commit in baza.
+    """
+    def __init__(self, db_name):
+        self.storage = get_storage(db_name, read_only=True)
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def current(self):
+        with self.lock:
+            if self.conn is None:
+                self.conn = self.storage.open_connection()
+            return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+
+class ResponseCache:
+    """LRU cu TTL; cheia e calea ceruta, valoarea corpul JSON deja serializat"""
+    def __init__(self, max_entries=1024, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.monotonic() and entry[1] == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, body):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, version, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def int_param(params, name, default, minimum=1, maximum=None):
+    value = params.get(name, [None])[0]
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ApiError(400, f"Parametrul {name} trebuie sa fie numar intreg")
+    if value < minimum:
+        raise ApiError(400, f"Parametrul {name} trebuie sa fie cel putin {minimum}")
+    if maximum is not None and value > maximum:
+        raise ApiError(400, f"Parametrul {name} trebuie sa fie cel mult {maximum}")
+    return value
+
+
+def text_param(params, name, required=False):
+    value = (params.get(name, [''])[0] or '').strip()
+    if required and not value:
+        raise ApiError(400, f"Lipseste parametrul {name}")
+    return value
+
+
+def paginate(params, default_per_page=50):
+    page = int_param(params, 'page', 1)
+    per_page = int_param(params, 'per_page', default_per_page, maximum=MAX_PER_PAGE)
+    return page, per_page, (page - 1) * per_page
+
+
+def page_result(rows, page, per_page, columns):
+    # Se cere un rand in plus doar ca sa se stie daca exista pagina urmatoare
+    return {
+        'items': [dict(zip(columns, row)) for row in rows[:per_page]],
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(rows) > per_page
+    }
+
+
+class PriceQueries:
+    """Interogarile serviciului; fiecare citeste doar din product_summary si indecsi"""
+    PRODUCT_COLUMNS = ('id', 'name', 'site_name', 'url', 'canonical_id', 'latest_price',
+                       'min_price', 'max_price', 'avg_price', 'samples', 'first_seen', 'last_seen')
+    PRODUCT_SELECT = '''
+        SELECT p.id, p.name, p.site_name, p.url, p.canonical_id, s.latest_price,
+               s.min_price, s.max_price, s.price_sum / s.samples, s.samples, s.first_seen, s.last_seen
+    '''
+
+    def __init__(self, db_name):
+        self.storage = get_storage(db_name, read_only=True)
+
+    def products(self, params):
+        page, per_page, offset = paginate(params)
+        conditions, args = [], []
+        site = text_param(params, 'site')
+        if site:
+            conditions.append('p.site_name = ?')
+            args.append(site)
+        text = text_param(params, 'q')
+        if text:
+            canonical_ids = search_canonical(self.storage, text, limit=500)
+            if canonical_ids:
+                conditions.append(f"p.canonical_id IN ({','.join('?' * len(canonical_ids))})")
+                args.extend(canonical_ids)
+            else:
+                conditions.append('p.name LIKE ?')
+                args.append(f'%{text}%')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        sort = text_param(params, 'sort') or 'id'
+        if sort == 'recent':
+            # Pe indexul product_summary.last_seen; produsele fara preturi nu apar
+            sql = f'''{self.PRODUCT_SELECT}
+                FROM product_summary s JOIN products p ON p.id = s.product_id
+                {where} ORDER BY s.last_seen DESC, p.id LIMIT ? OFFSET ?'''
+        elif sort == 'id':
+            sql = f'''{self.PRODUCT_SELECT}
+                FROM products p LEFT JOIN product_summary s ON s.product_id = p.id
+                {where} ORDER BY p.id LIMIT ? OFFSET ?'''
+        else:
+            raise ApiError(400, "sort poate fi 'id' sau 'recent'")
+        rows = self.storage.query(sql, args + [per_page + 1, offset])
+        return page_result(rows, page, per_page, self.PRODUCT_COLUMNS)
+
+    def product(self, product_id, params):
+        row = self.storage.query_one(f'''{self.PRODUCT_SELECT}
+            FROM products p LEFT JOIN product_summary s ON s.product_id = p.id
+            WHERE p.id = ?''', (product_id,))
+        if not row:
+            raise ApiError(404, f"Produsul {product_id} nu exista")
+        return dict(zip(self.PRODUCT_COLUMNS, row))
+
+    def history(self, product_id, params):
+        page, per_page, offset = paginate(params, default_per_page=100)
+        if not self.storage.query_one('SELECT 1 FROM products WHERE id = ?', (product_id,)):
+            raise ApiError(404, f"Produsul {product_id} nu exista")
+        # Un rand e o serie de preturi egale (prima/ultima observare, cate observari)
+        rows = self.storage.query('''
+            SELECT price, date_scraped, COALESCE(last_seen, date_scraped), samples FROM prices
+            WHERE product_id = ?
+            ORDER BY date_scraped DESC, id DESC LIMIT ? OFFSET ?
+        ''', (product_id, per_page + 1, offset))
+        result = page_result(rows, page, per_page, ('price', 'first_seen', 'last_seen', 'samples'))
+        result['product_id'] = product_id
+        return result
+
+    def compare(self, params):
+        """Ofertele pe site pentru fiecare produs canonic gasit, ca in compare_prices"""
+        text = text_param(params, 'q', required=True)
+        page, per_page, offset = paginate(params, default_per_page=10)
+        canonical_ids = search_canonical(self.storage, text, limit=offset + per_page + 1)[offset:]
+        if canonical_ids:
+            condition = f"p.canonical_id IN ({','.join('?' * len(canonical_ids))})"
+            args = canonical_ids
+        else:
+            condition = 'p.name LIKE ?'
+            args = [f'%{text}%']
+        # Un rand pe listare; listarile aceluiasi site se combina aici, ca sa ramana
+        # si ultimul pret al celei observate cel mai recent
+        rows = self.storage.query(f'''
+            SELECT p.canonical_id, COALESCE(c.title, p.name), p.site_name, s.latest_price,
+                   s.min_price, s.max_price, s.price_sum, s.samples, s.last_seen
+            FROM products p
+            JOIN product_summary s ON p.id = s.product_id
+            LEFT JOIN canonical_products c ON c.id = p.canonical_id
+            WHERE {condition}
+            ORDER BY p.canonical_id, p.site_name, s.last_seen
+        ''', args)
+
+        groups = OrderedDict()
+        for canonical_id, title, site, latest, min_price, max_price, price_sum, samples, last_seen in rows:
+            group = groups.setdefault(canonical_id, {'canonical_id': canonical_id, 'title': title, 'offers': {}})
+            offer = group['offers'].get(site)
+            if offer is None:
+                group['offers'][site] = {
+                    'site_name': site, 'latest_price': latest, 'min_price': min_price, 'max_price': max_price,
+                    'price_sum': price_sum, 'samples': samples, 'last_seen': last_seen
+                }
+                continue
+            offer['latest_price'] = latest
+            offer['min_price'] = min(offer['min_price'], min_price)
+            offer['max_price'] = max(offer['max_price'], max_price)
+            offer['price_sum'] += price_sum
+            offer['samples'] += samples
+            offer['last_seen'] = last_seen
+        for group in groups.values():
+            offers = sorted(group['offers'].values(), key=lambda offer: offer['min_price'])
+            for offer in offers:
+                offer['avg_price'] = offer.pop('price_sum') / offer['samples']
+            group['offers'] = offers
+        items = list(groups.values())
+        if not canonical_ids:
+            items = items[offset:]
+        return {
+            'query': text,
+            'items': items[:per_page],
+            'page': page,
+            'per_page': per_page,
+            'has_more': len(items) > per_page
+        }
+
+
+class ForumQueries:
+    POST_COLUMNS = ('forum', 'title', 'author', 'snippet', 'post_date', 'keywords')
+
+    def __init__(self, db_name):
+        self.storage = get_storage(db_name, read_only=True)
+        self.fts_enabled = None
+
+    def search(self, params):
+        text = text_param(params, 'q', required=True)
+        page, per_page, offset = paginate(params, default_per_page=20)
+        if self.fts_enabled is None:
+            self.fts_enabled = bool(self.storage.query_one(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'phone_posts_fts'"
+            ))
+        if self.fts_enabled:
+            rows = self.storage.query('''
+                SELECT f.name, p.title, p.author,
+                       snippet(phone_posts_fts, 1, '[', ']', '...', 24),
+                       p.post_date, p.keywords_found
+                FROM phone_posts_fts
+                JOIN phone_posts p ON p.id = phone_posts_fts.rowid
+                JOIN phone_forums f ON p.forum_id = f.id
+                WHERE phone_posts_fts MATCH ?
+                ORDER BY bm25(phone_posts_fts, 10.0, 1.0, 5.0)
+                LIMIT ? OFFSET ?
+            ''', (to_fts_query(text), per_page + 1, offset))
+        else:
+            rows = self.storage.query('''
+                SELECT f.name, p.title, p.author, substr(p.content, 1, 150) || '...', p.post_date, p.keywords_found
+                FROM phone_posts p
+                JOIN phone_forums f ON p.forum_id = f.id
+                WHERE p.title LIKE ? OR p.content LIKE ? OR p.keywords_found LIKE ?
+                ORDER BY p.post_date DESC
+                LIMIT ? OFFSET ?
+            ''', (f'%{text}%', f'%{text}%', f'%{text}%', per_page + 1, offset))
+        result = page_result(rows, page, per_page, self.POST_COLUMNS)
+        result['query'] = text
+        return result
+
+    def stats(self, params):
+        rows = self.storage.query('''
+            SELECT f.name, COUNT(p.id), MAX(p.post_date)
+            FROM phone_forums f
+            LEFT JOIN phone_posts p ON f.id = p.forum_id
+            GROUP BY f.id
+            ORDER BY COUNT(p.id) DESC
+        ''')
+        forums = [{'forum': name, 'posts': count, 'latest_post': latest} for name, count, latest in rows]
+        return {'forums': forums, 'total_posts': sum(forum['posts'] for forum in forums)}
+
+
+class QueryService:
+    """Rutele, cache-ul si versiunea bazelor; independent de serverul HTTP"""
+    def __init__(self, db_name='prices.db', forum_db='scraper_data.db', cache_size=1024, ttl=30):
+        self.prices = PriceQueries(db_name)
+        self.forums = ForumQueries(forum_db)
+        self.versions = {'prices': DataVersion(db_name), 'forums': DataVersion(forum_db)}
+        self.cache = ResponseCache(cache_size, ttl)
+        self.routes = [
+            (re.compile(r'/api/products'), 'prices', lambda params: self.prices.products(params)),
+            (re.compile(r'/api/products/(\d+)'), 'prices',
+             lambda params, product_id: self.prices.product(int(product_id), params)),
+            (re.compile(r'/api/products/(\d+)/history'), 'prices',
+             lambda params, product_id: self.prices.history(int(product_id), params)),
+            (re.compile(r'/api/compare'), 'prices', lambda params: self.prices.compare(params)),
+            (re.compile(r'/api/forum/search'), 'forums', lambda params: self.forums.search(params)),
+            (re.compile(r'/api/forum/stats'), 'forums', lambda params: self.forums.stats(params)),
+            (re.compile(r'/api/health'), None, lambda params: self.health()),
+        ]
+
+    def health(self):
+        return {'status': 'ok', 'cache': self.cache.stats()}
+
+    def handle(self, target):
+        """Intoarce (status, corp JSON serializat, din_cache)"""
+        url = urlparse(target)
+        for pattern, db, handler in self.routes:
+            match = pattern.fullmatch(url.path.rstrip('/'))
+            if match:
+                break
+        else:
+            return 404, self.encode({'error': f"Ruta necunoscuta: {url.path}"}), False
+
+        try:
+            version = self.versions[db].current() if db else None
+        except sqlite3.Error as e:
+            return 503, self.encode({'error': f"Baza de date indisponibila: {e}"}), False
+        if db:
+            body = self.cache.get(target, version)
+            if body is not None:
+                return 200, body, True
+
+        try:
+            result = handler(parse_qs(url.query), *match.groups())
+        except ApiError as e:
+            return e.status, self.encode({'error': str(e)}), False
+        except sqlite3.Error as e:
+            return 503, self.encode({'error': f"Eroare la citirea bazei de date: {e}"}), False
+
+        body = self.encode(result)
+        if db:
+            self.cache.put(target, version, body)
+        return 200, body, False
+
+    def encode(self, value):
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """
+    Cererile ruleaza pe un numar fix de thread-uri: fiecare thread isi pastreaza
+    conexiunea read-only (Storage tine o conexiune pe thread), deci pool-ul de
+    thread-uri e si pool-ul de conexiuni.
+    """
+    def __init__(self, address, handler, workers=8):
+        super().__init__(address, handler)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_server(service, host='127.0.0.1', port=8080, workers=8, verbose=False):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, body, cached = service.handle(self.path)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('X-Cache', 'HIT' if cached else 'MISS')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return PooledHTTPServer((host, port), Handler, workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='prices.db')
+    parser.add_argument('--forum-db', default='scraper_data.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=8, help='thread-uri (si conexiuni read-only) ale serverului')
+    parser.add_argument('--cache-size', type=int, default=1024, help='raspunsuri tinute in cache')
+    parser.add_argument('--ttl', type=float, default=30, help='secunde cat e valabil un raspuns din cache')
+    parser.add_argument('--verbose', action='store_true', help='afiseaza fiecare cerere')
+    args = parser.parse_args(argv)
+
+    service = QueryService(args.db, args.forum_db, args.cache_size, args.ttl)
+    server = make_server(service, args.host, args.port, args.workers, args.verbose)
+    print(f"API pornit pe http://{args.host}:{server.server_address[1]}/api/health")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nOpresc serverul...")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
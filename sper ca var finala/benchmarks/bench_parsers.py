@@ -0,0 +1,122 @@
+"""
+Compara backend-urile de parsare pe un corpus de pagini salvate.
+
+    python benchmarks/bench_parsers.py --corpus pagini/ --repeat 5
+
+Corpusul e un director cu fisiere .html; selectorul se ia din manifest.json
+(ca in benchmarks/fixtures), din selectors.json (nume_fisier -> selector) sau
+dupa prefixul numelui (emag_*.html, cel_*.html). Fara --corpus se genereaza o
+pagina sintetica de ~500KB.
+"""
+import argparse
+import json
+import os
+import time
+
+from harness import load_manifest
+
+from html_parsing import UnsupportedSelector, make_soup, select_first
+
+DEFAULT_SELECTORS = {
+    'emag': '.product-new-price',
+    'cel': '.pret_n',
+    'altex': '.Price-current',
+    'pcgarage': '.price_num',
+}
+
+
+def synthetic_page(size_kb=500):
+    filler = '<div class="item"><a href="/p/{0}">Produs {0}</a><span class="old">{0} lei</span></div>\n'
+    body = []
+    length = 0
+    i = 0
+    while length < size_kb * 1024 // 2:
+        row = filler.format(i)
+        body.append(row)
+        length += len(row)
+        i += 1
+    half = ''.join(body)
+    return (
+        '<html><head><title>Telefon</title></head><body><h1 class="page-title">Telefon de test</h1>'
+        + half + '<p class="product-new-price">1.299<sup>99</sup> Lei</p>' + half
+        + '</body></html>'
+    ).encode('utf-8')
+
+
+def load_corpus(directory):
+    selectors = {}
+    mapping = os.path.join(directory, 'selectors.json')
+    if os.path.exists(mapping):
+        with open(mapping, encoding='utf-8') as f:
+            selectors = json.load(f)
+    if os.path.exists(os.path.join(directory, 'manifest.json')):
+        # Primul selector CSS al fiecarei pagini de produs; paginile de forum nu au pret
+        for page in load_manifest(directory)['pages']:
+            css = [selector for selector in page.get('selectors', ()) if not selector.startswith('@')]
+            if css:
+                selectors.setdefault(page['file'], css[0])
+
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.html'):
+            continue
+        selector = selectors.get(name) or DEFAULT_SELECTORS.get(name.split('_')[0])
+        if not selector:
+            print(f"Sar peste {name}: nu am selector")
+            continue
+        with open(os.path.join(directory, name), 'rb') as f:
+            pages.append((name, f.read(), selector))
+    return pages
+
+
+def targeted(content, selector):
+    # Ca in extract_price_from_content: selectorii compusi cad pe arborele complet
+    try:
+        return select_first(content, selector)
+    except UnsupportedSelector:
+        return make_soup(content).select_one(selector)
+
+
+def backends():
+    result = [('html.parser', lambda content, sel: make_soup(content, 'html.parser').select_one(sel))]
+    try:
+        import lxml  # noqa: F401
+        result.append(('lxml', lambda content, sel: make_soup(content, 'lxml').select_one(sel)))
+    except ImportError:
+        print("lxml nu este instalat, il sar")
+    result.append(('targeted', targeted))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='director cu pagini .html salvate')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.corpus:
+        pages = load_corpus(args.corpus)
+    else:
+        pages = [('sintetic_emag.html', synthetic_page(), '.product-new-price')]
+
+    if not pages:
+        print("Corpus gol")
+        return
+
+    total_kb = sum(len(content) for _, content, _ in pages) / 1024
+    print(f"{len(pages)} pagini, {total_kb:.0f} KB, {args.repeat} repetari")
+    print("-" * 60)
+
+    baseline = None
+    for name, run in backends():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for _, content, selector in pages:
+                run(content, selector)
+        per_page = (time.perf_counter() - start) / (args.repeat * len(pages)) * 1000
+        baseline = baseline or per_page
+        print(f"{name:<12} | {per_page:8.2f} ms/pagina | x{baseline / per_page:5.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Masoara interogarile de raportare pe o baza de date sintetica mare,
+generata pe schema v1 (un rand per scrape) si adusa apoi la zi prin migrari
+(indecsi, istoric comprimat in serii de preturi egale).
+
+    python benchmarks/bench_queries.py --products 2000 --prices 2000000
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from harness import generate_prices
+
+from migrations import PRICE_MIGRATIONS, migrate
+from storage import Storage
+
+
+def timed(label, func, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    print(f"  {label:<28} | median {durations[len(durations) // 2] * 1000:9.1f} ms")
+
+
+def run_queries(scraper, repeat):
+    timed('get_price_history', lambda: scraper.get_price_history('Galaxy'), repeat)
+    timed('compare_prices', lambda: scraper.compare_prices('Pixel'), repeat)
+    timed('list_products', scraper.list_products, repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--prices', type=int, default=2000000)
+    parser.add_argument('--change-rate', type=float, default=0.05, help='probabilitatea unei schimbari de pret')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from scraper_online import SmartPriceScraper
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_name = os.path.join(directory, 'bench_prices.db')
+        storage = Storage(db_name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate(storage, PRICE_MIGRATIONS[:1])
+
+        start = time.perf_counter()
+        generate_prices(storage, args.products, args.prices, args.change_rate)
+        print(f"Generat {args.products} produse / {args.prices} preturi in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate(storage, PRICE_MIGRATIONS)
+        rows = storage.query_one('SELECT COUNT(*) FROM prices')[0]
+        print(f"Migrare la ultima versiune: {time.perf_counter() - start:.1f}s, {rows} randuri in prices")
+
+        scraper = SmartPriceScraper.__new__(SmartPriceScraper)
+        scraper.db_name = db_name
+        scraper.storage = storage
+
+        print("Schema curenta:")
+        run_queries(scraper, args.repeat)
+        storage.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+"""
+Piesele comune ale benchmark-urilor: corpusul de pagini salvate din fixtures/,
+un server HTTP local care il serveste, generatoarele de baze de date sintetice
+(prices.db, scraper_data.db) si masurarea - debit, percentile de latenta,
+memorie maxima - intr-un rezultat JSON comparabil intre commit-uri.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+FIXTURES = os.path.join(BENCH_DIR, 'fixtures')
+
+sys.path.insert(0, ROOT)
+
+from migrations import PRICE_MIGRATIONS, migrate  # noqa: E402
+from storage import Storage  # noqa: E402
+
+SITES = ['eMAG', 'Altex', 'PC Garage', 'Flanco', 'CEL.ro']
+MODELS = ['iPhone 15', 'Galaxy S24', 'Pixel 8', 'Redmi Note 13', 'OnePlus 12', 'Xperia 5']
+TOPICS = ['review', 'battery drain', 'custom rom', 'root guide', 'phone recommendation',
+          'camera comparison', 'android update', 'charging test', 'screen issues', 'specs']
+AUTHORS = ['mihai_t', 'andreea.p', 'TechReviewer2024', 'DevMaster', 'budgetfan', 'radu88']
+
+# Umplutura neutra: nu se potriveste cu niciun selector de pret sau de forum
+FILLER_ROW = '<li class="nav-item"><a href="/c/{0}">Categoria {0}</a><span class="badge">{0} produse</span></li>\n'
+
+
+# --- corpus ---
+
+def load_manifest(directory=FIXTURES):
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def inflate(content, size_kb):
+    """Umfla pagina pana la ~size_kb cu meniuri, jumatate inainte si jumatate dupa continut"""
+    missing = size_kb * 1024 - len(content)
+    if missing <= 0:
+        return content
+    rows, length, i = [], 0, 0
+    while length < missing // 2:
+        row = FILLER_ROW.format(i)
+        rows.append(row)
+        length += len(row)
+        i += 1
+    block = ('<ul class="megamenu">\n' + ''.join(rows) + '</ul>\n').encode('utf-8')
+    body = content.find(b'>', content.find(b'<body')) + 1
+    end = content.rfind(b'</body>')
+    return content[:body] + block + content[body:end] + block + content[end:]
+
+
+def load_fixtures(directory=FIXTURES, inflate_kb=0):
+    """
+    Paginile din manifest, cu continutul (bytes) in 'content'. Se umfla doar
+    paginile de produs; cele de forum au deja dimensiunea unei listari reale.
+    """
+    manifest = load_manifest(directory)
+    pages = []
+    for page in manifest['pages']:
+        with open(os.path.join(directory, page['file']), 'rb') as f:
+            content = f.read()
+        if inflate_kb and page['kind'] == 'product':
+            content = inflate(content, inflate_kb)
+        pages.append(dict(page, content=content))
+    return pages, manifest.get('price_texts', [])
+
+
+# --- server local ---
+
+class StubServer:
+    """
+    Server HTTP local, intr-un thread separat, care serveste pagini dintr-un dict
+    cale -> bytes. Query string-ul se ignora; raspunde cu ETag si 304 la
+    If-None-Match, ca sa se poata masura si calea cu cache.
+    """
+    def __init__(self, pages, host='127.0.0.1', port=0, latency=0.0):
+        self.pages = {path: (content, '"%s"' % hashlib.sha1(content).hexdigest()) for path, content in pages.items()}
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                page = stub.pages.get(self.path.split('?', 1)[0])
+                if page is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                content, etag = page
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def url(self, path):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}{path}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# --- baze de date sintetice ---
+
+def generate_prices(storage, products, prices, change_rate=0.05, seed=42):
+    """Produse pe mai multe site-uri si un scrape la 6 ore; pretul se schimba rar (schema v1)"""
+    rng = random.Random(seed)
+    start = datetime(2022, 1, 1)
+
+    with storage.transaction() as cursor:
+        cursor.executemany('''
+            INSERT INTO products (name, url, selector, site_name, auto_detected)
+            VALUES (?, ?, ?, ?, 1)
+        ''', [
+            (f"Telefon {rng.choice(MODELS)} {i}", f"https://example.ro/p/{i}", '.price', SITES[i % len(SITES)])
+            for i in range(products)
+        ])
+
+    per_product = max(1, prices // products)
+    batch = []
+    for product_id in range(1, products + 1):
+        base = rng.uniform(300, 9000)
+        price = round(base, 2)
+        for day in range(per_product):
+            if rng.random() < change_rate:
+                price = round(base * rng.uniform(0.9, 1.1), 2)
+            batch.append((product_id, price, (start + timedelta(hours=day * 6)).isoformat()))
+        if len(batch) >= 100000:
+            storage.executemany('INSERT INTO prices (product_id, price, date_scraped) VALUES (?, ?, ?)', batch)
+            batch = []
+    storage.executemany('INSERT INTO prices (product_id, price, date_scraped) VALUES (?, ?, ?)', batch)
+
+
+def build_prices_db(db_name, products, prices, change_rate=0.05, seed=42):
+    """prices.db sintetic: generat pe schema v1, apoi adus la zi prin toate migrarile"""
+    storage = Storage(db_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(storage, PRICE_MIGRATIONS[:1])
+        generate_prices(storage, products, prices, change_rate, seed)
+        migrate(storage, PRICE_MIGRATIONS)
+    return storage
+
+
+def generate_posts(scraper, posts, seed=42, batch_size=5000):
+    """Postari sintetice pe forumurile predefinite, inserate pe loturi prin insert_posts"""
+    rng = random.Random(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraper.setup_predefined_forums()
+    forums = scraper.storage.query('SELECT id, keywords FROM phone_forums ORDER BY id')
+    start = datetime(2023, 1, 1)
+    now = datetime.now().isoformat()
+
+    inserted = 0
+    for offset in range(0, posts, batch_size):
+        rows = []
+        for i in range(offset, min(posts, offset + batch_size)):
+            forum_id, keywords = forums[i % len(forums)]
+            model, topic = rng.choice(MODELS), rng.choice(TOPICS)
+            tags = [k for k in keywords.split(',') if rng.random() < 0.3]
+            rows.append((
+                forum_id, f"{model} - {topic} #{i}", rng.choice(AUTHORS),
+                f"Discutie despre {model}: {topic}. Am testat telefonul cateva saptamani si revin cu detalii.",
+                (start + timedelta(minutes=i * 7)).strftime('%Y-%m-%d'), ','.join(tags), now
+            ))
+        with scraper.storage.transaction() as cursor:
+            inserted += scraper.insert_posts(cursor, rows)
+    return inserted
+
+
+# --- masurare ---
+
+def percentile(values, q):
+    """Percentila q (0-100) dintr-o lista sortata, cu interpolare liniara"""
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def measure(func, items, repeat=3, unit='pagini', size=None, check=None, setup=None, memory=True):
+    """
+    Ruleaza func(item) pe toate elementele, de repeat ori, si intoarce debitul
+    (unitati/s), percentilele latentei pe element si memoria maxima alocata.
+
+    size(item) = cate unitati proceseaza un apel (implicit 1); check(item, rezultat)
+    numara rezultatele corecte; setup() se apeleaza inaintea fiecarei treceri, in
+    afara cronometrului. Memoria se masoara cu tracemalloc intr-o trecere separata
+    (care serveste si ca incalzire), ca sa nu incetineasca trecerile cronometrate.
+    """
+    size = size or (lambda item: 1)
+    result = {'unit': unit, 'items': len(items), 'repeat': repeat, 'peak_kb': None}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if memory:
+            if setup:
+                setup()
+            tracemalloc.start()
+            try:
+                outputs = [func(item) for item in items]
+                result['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            finally:
+                tracemalloc.stop()
+            if check:
+                result['correct'] = sum(bool(check(item, output)) for item, output in zip(items, outputs))
+                result['total'] = len(items)
+
+        latencies = []
+        units = 0
+        total = 0.0
+        for attempt in range(repeat):
+            if setup:
+                setup()
+            outputs = []
+            for item in items:
+                start = time.perf_counter()
+                outputs.append(func(item))
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed)
+                total += elapsed
+                units += size(item)
+            if check and attempt == 0 and 'total' not in result:
+                result['correct'] = sum(bool(check(item, output)) for item, output in zip(items, outputs))
+                result['total'] = len(items)
+
+    latencies.sort()
+    result.update({
+        'throughput': round(units / total, 2) if total else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+    })
+    return result
+
+
+def environment(**params):
+    """Metadatele rularii, ca rezultatele sa poata fi puse langa commit-ul masurat"""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True,
+                                  timeout=10).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    from html_parsing import PARSER_BACKEND
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parser_backend': PARSER_BACKEND,
+        'numpy': numpy_version,
+        'params': params,
+    }
+
+
+def print_results(cases):
+    print(f"{'Caz':<30} | {'Debit':>22} | {'p50 ms':>9} | {'p90 ms':>9} | {'p99 ms':>9} | {'Mem KB':>9} | {'Corect':>7}")
+    print("-" * 112)
+    for name, case in cases.items():
+        throughput = f"{case['throughput']:,.1f} {case['unit']}/s" if case['throughput'] else '-'
+        peak = f"{case['peak_kb']:,.0f}" if case['peak_kb'] is not None else '-'
+        correct = f"{case['correct']}/{case['total']}" if 'total' in case else '-'
+        print(f"{name[:30]:<30} | {throughput:>22} | {case['p50_ms']:9.3f} | {case['p90_ms']:9.3f} | "
+              f"{case['p99_ms']:9.3f} | {peak:>9} | {correct:>7}")
+
+
+def save_results(path, meta, cases):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'cases': cases}, f, indent=2, sort_keys=True)
+
+
+def compare_results(path, cases):
+    """Diferentele fata de un rezultat salvat anterior (debit si p50), caz cu caz"""
+    with open(path, encoding='utf-8') as f:
+        base = json.load(f)
+    meta = base.get('meta', {})
+    print(f"\nComparatie cu {path} (commit {meta.get('commit') or '?'}, {meta.get('date', '?')}):")
+    print(f"{'Caz':<30} | {'Debit inainte':>14} | {'Debit acum':>14} | {'Delta':>8} | {'p50 delta':>9}")
+    print("-" * 88)
+    for name, case in cases.items():
+        before = base.get('cases', {}).get(name)
+        if not before or not before.get('throughput') or not case['throughput']:
+            print(f"{name[:30]:<30} | {'-':>14} | {case['throughput'] or 0:14,.1f} | {'nou':>8} | {'-':>9}")
+            continue
+        delta = (case['throughput'] / before['throughput'] - 1) * 100
+        p50 = (case['p50_ms'] / before['p50_ms'] - 1) * 100 if before.get('p50_ms') else 0.0
+        print(f"{name[:30]:<30} | {before['throughput']:14,.1f} | {case['throughput']:14,.1f} | "
+              f"{delta:+7.1f}% | {p50:+8.1f}%")
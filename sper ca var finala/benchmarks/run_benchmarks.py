@@ -0,0 +1,275 @@
+"""
+Suita de benchmark-uri offline: extragerea preturilor si a postarilor pe
+corpusul din fixtures/, fetch + crawl printr-un server HTTP local si
+interogarile pe baze de date sintetice. Nu face niciun request in afara.
+
+    python benchmarks/run_benchmarks.py                          # toata suita
+    python benchmarks/run_benchmarks.py --groups extraction --inflate-kb 300
+    python benchmarks/run_benchmarks.py --json inainte.json
+    python benchmarks/run_benchmarks.py --compare inainte.json   # delta fata de alt commit
+
+Pentru fiecare caz: debitul (pagini/s, randuri/s), latenta p50/p90/p99 pe
+apel, memoria maxima alocata (tracemalloc) si, unde corpusul are valoarea
+asteptata, cate rezultate sunt corecte.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+
+from harness import (StubServer, build_prices_db, compare_results, environment, generate_posts,
+                     load_fixtures, measure, print_results, save_results)
+
+from forum_crawler import ForumCrawler
+from forumuri_scraper import PhoneForumScraper
+from html_parsing import make_soup
+from http_client import HttpClient
+from job_queue import open_queue
+from pipeline import ScrapePipeline
+from price_parser import PriceParser
+from scrape_worker import QueueWorker
+from scraper_online import SmartPriceScraper
+from structured_data import extract_gtin
+
+GROUPS = ('extraction', 'network', 'db')
+
+
+def quiet(factory, *args, **kwargs):
+    """Constructorii scraper-elor afiseaza mesaje de migrare; aici nu ne intereseaza"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return factory(*args, **kwargs)
+
+
+def same_price(expected):
+    return lambda item, price: (price is None if expected(item) is None
+                                else price is not None and abs(price - expected(item)) < 0.005)
+
+
+def bench_extraction(cases, scraper, forum_scraper, pages, price_texts, args):
+    products = [page for page in pages if page['kind'] == 'product']
+    forums = [page for page in pages if page['kind'] == 'forum']
+    for page in pages:
+        page['soup'] = make_soup(page['content'])
+    repeat = args.repeat
+
+    cases['make_soup'] = measure(lambda page: make_soup(page['content']), pages, repeat)
+    cases['extract_price'] = measure(
+        lambda item: scraper.extract_price(item[0]), price_texts, repeat * 100, unit='texte',
+        check=same_price(lambda item: item[1])
+    )
+    # Fara cache: costul real al primei parsari a unui text
+    uncached = PriceParser(cache_size=0)
+    cases['parse_price_uncached'] = measure(
+        lambda item: uncached.parse(item[0]), price_texts, repeat * 100, unit='texte',
+        check=same_price(lambda item: item[1])
+    )
+
+    split = [(page, page['soup'].select_one(selector)) for page in products
+             for selector in page['selectors'] if selector in scraper.split_price_selectors]
+    cases['extract_emag_price'] = measure(
+        lambda item: scraper.extract_emag_price(item[1]), split, repeat * 100, unit='elemente',
+        check=same_price(lambda item: item[0]['price'])
+    )
+
+    cases['detect_product_name'] = measure(
+        lambda page: scraper.detect_product_name(page['soup'], 'https://example.ro' + page['path']),
+        products, repeat, check=lambda page, name: name == page['name'][:100]
+    )
+    cases['detect_price_selector'] = measure(
+        lambda page: scraper.detect_price_selector(page['soup'])[1], products, repeat,
+        check=same_price(lambda page: page['price'])
+    )
+    cases['detect_price'] = measure(
+        lambda page: scraper.detect_price(page['content'], page['soup'], page['site'])[1], products, repeat,
+        check=same_price(lambda page: page['price'])
+    )
+
+    targeted = [(page, selector) for page in products for selector in page['selectors']]
+    cases['extract_price_from_content'] = measure(
+        lambda item: scraper.extract_price_from_content(item[0]['content'], item[1]), targeted, repeat,
+        check=same_price(lambda item: item[0]['price'])
+    )
+    cases['extract_gtin'] = measure(
+        lambda page: extract_gtin(page['content']), products, repeat,
+        check=lambda page, gtin: gtin == page['gtin']
+    )
+
+    crawler = ForumCrawler(forum_scraper)
+    config = {forum['name']: forum for forum in forum_scraper.predefined_forums}
+    cases['forum_extract_posts'] = measure(
+        lambda page: crawler.extract_posts(config[page['forum']], make_soup(page['content'])), forums, repeat,
+        check=lambda page, posts: len(posts) == page['posts']
+    )
+
+
+def bench_network(cases, directory, pages, args):
+    copies = range(args.copies)
+    with StubServer({page['path']: page['content'] for page in pages}, latency=args.latency_ms / 1000) as stub:
+        client = HttpClient(retries=0, pool_maxsize=args.workers)
+        products = [(stub.url(f"{page['path']}?copie={i}"), page) for i in copies
+                    for page in pages if page['kind'] == 'product']
+        check = same_price(lambda item: item[1]['price'])
+
+        # Fluxul real: produsul se adauga dupa URL, apoi se scrapeaza cu selectorul invatat
+        db_name = os.path.join(directory, 'fetch.db')
+        cold = quiet(SmartPriceScraper, db_name, http_client=client, use_cache=False)
+        cases['analyze_product'] = measure(
+            lambda item: (cold.analyze_product(item[0], verbose=False) or {}).get('price'), products, args.repeat,
+            check=check
+        )
+        quiet(cold.save_products, [product for product in map(lambda item: cold.analyze_product(item[0], verbose=False),
+                                                                 products) if product])
+        selectors = {}
+
+        def load_selectors():
+            # Ca in scrape_all_products: selectorul se citeste din products la fiecare rulare
+            selectors.update(cold.storage.query('SELECT url, selector FROM products'))
+
+        cases['fetch_price_cold'] = measure(
+            lambda item: cold.fetch_price(item[0], selectors.get(item[0]))[0], products, args.repeat,
+            check=check, setup=load_selectors
+        )
+        # Prima trecere (cea cu tracemalloc) populeaza cache-ul; restul primesc 304
+        cached = quiet(SmartPriceScraper, db_name, http_client=client)
+        cases['fetch_price_cached'] = measure(
+            lambda item: cached.fetch_price(item[0], selectors.get(item[0]))[0], products, args.repeat,
+            check=check, setup=load_selectors
+        )
+
+        # Tot fluxul de scrape, inclusiv pornirea proceselor de parsare (memoria lor nu o vede tracemalloc)
+        cases['scrape_pipeline'] = measure(
+            lambda _: ScrapePipeline(cold, parse_workers=args.parse_workers, per_site=args.workers, delay=0).run(),
+            [None], args.repeat, size=lambda _: len(products), memory=False,
+            check=lambda _, summary: summary['prices'] == len(products)
+        )
+
+        # Un worker pe coada din aceeasi baza: costul claim/complete pe langa scrape
+        job_queue = open_queue('sqlite', db_name)
+        worker = QueueWorker(cold, job_queue, threads=args.workers, per_site=args.workers, delay=0,
+                             batch_size=len(products))
+        cases['queue_worker'] = measure(
+            lambda _: quiet(worker.run, once=True), [None], args.repeat, size=lambda _: len(products), memory=False,
+            setup=lambda: job_queue.storage.execute('UPDATE scrape_jobs SET due_at = 0'),
+            check=lambda _, summary: summary['jobs'] == len(products)
+        )
+
+        forum_scraper = quiet(PhoneForumScraper, os.path.join(directory, 'crawl.db'))
+        config = {forum['name']: forum for forum in forum_scraper.predefined_forums}
+        forums = []
+        for i in copies:
+            for page in pages:
+                if page['kind'] != 'forum':
+                    continue
+                name = f"{page['forum']} #{i}"
+                forum_scraper.storage.execute(
+                    'INSERT INTO phone_forums (name, url, keywords) VALUES (?, ?, ?)',
+                    (name, stub.url(page['path']), ','.join(config[page['forum']]['keywords']))
+                )
+                forum_id = forum_scraper.storage.query_one('SELECT id FROM phone_forums WHERE name = ?', (name,))[0]
+                forums.append(dict(config[page['forum']], id=forum_id, name=name, url=stub.url(page['path']),
+                                   last_post_date=None, last_page_url=None))
+        expected_posts = sum(page['posts'] for page in pages if page['kind'] == 'forum') * args.copies
+
+        def reset():
+            forum_scraper.storage.execute('DELETE FROM post_keywords')
+            forum_scraper.storage.execute('DELETE FROM phone_posts')
+
+        crawler = ForumCrawler(forum_scraper, http_client=client, max_workers=args.workers,
+                               per_host=args.workers, delay=0, max_pages=1)
+        cases['forum_crawl'] = measure(
+            lambda batch: crawler.crawl([dict(forum) for forum in batch]), [forums], args.repeat,
+            size=len, setup=reset, check=lambda batch, summary: summary['posts'] == expected_posts
+        )
+        client.close()
+
+
+def bench_db(cases, directory, args):
+    repeat = args.repeat
+    db_name = os.path.join(directory, 'bench_prices.db')
+
+    def build(_):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_name + suffix):
+                os.remove(db_name + suffix)
+        build_prices_db(db_name, args.products, args.prices).close()
+
+    cases['build_prices_db'] = measure(build, [None], 1, unit='randuri', size=lambda _: args.prices, memory=False)
+
+    scraper = quiet(SmartPriceScraper, db_name, use_cache=False)
+    scraper.load_latest_prices()
+    now = '2030-01-01T00:00:00'
+    rows = [(product_id, price, now) for product_id, (_, price) in sorted(scraper.latest_prices.items())]
+    batches = [rows[i:i + 500] for i in range(0, len(rows), 500)]
+    cases['record_prices'] = measure(scraper.record_prices, batches, repeat, unit='randuri', size=len)
+
+    for name, query in (
+        ('get_price_history', lambda _: scraper.get_price_history('Galaxy')),
+        ('compare_prices', lambda _: scraper.compare_prices('Pixel')),
+        ('list_products', lambda _: scraper.list_products()),
+    ):
+        cases[name] = measure(query, [None], repeat, unit='interogari')
+
+    forum_scraper = quiet(PhoneForumScraper, os.path.join(directory, 'bench_forum.db'))
+    cases['generate_posts'] = measure(
+        lambda _: generate_posts(forum_scraper, args.posts), [None], 1, unit='randuri',
+        size=lambda _: args.posts, memory=False
+    )
+    for name, query in (
+        ('search_phone_discussions', lambda _: forum_scraper.search_phone_discussions('root')),
+        ('get_phone_recommendations', lambda _: forum_scraper.get_phone_recommendations()),
+        ('get_phone_reviews', lambda _: forum_scraper.get_phone_reviews()),
+        ('get_forum_stats', lambda _: forum_scraper.get_forum_stats()),
+    ):
+        cases[name] = measure(query, [None], repeat, unit='interogari')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groups', default=','.join(GROUPS), help='grupele rulate: ' + ', '.join(GROUPS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--inflate-kb', type=int, default=150,
+                        help='umfla paginile de produs pana la dimensiunea unei pagini reale (0 = ca in fixtures)')
+    parser.add_argument('--copies', type=int, default=10, help='copii ale fiecarei pagini servite de serverul local')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count(), help='procese de parsare in pipeline')
+    parser.add_argument('--latency-ms', type=float, default=0, help='intarziere simulata a serverului local')
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--prices', type=int, default=500000)
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--quick', action='store_true', help='dimensiuni mici, pentru o verificare rapida')
+    parser.add_argument('--json', help='salveaza rezultatele in acest fisier')
+    parser.add_argument('--compare', help='rezultate salvate anterior, pentru comparatie')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.repeat, args.copies = min(args.repeat, 2), min(args.copies, 2)
+        args.products, args.prices, args.posts = 200, 20000, 5000
+    groups = [group.strip() for group in args.groups.split(',') if group.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"grupe necunoscute: {', '.join(sorted(unknown))}")
+
+    pages, price_texts = load_fixtures(inflate_kb=args.inflate_kb)
+
+    cases = {}
+    with tempfile.TemporaryDirectory() as directory:
+        if 'extraction' in groups:
+            scraper = quiet(SmartPriceScraper, os.path.join(directory, 'extraction.db'), use_cache=False)
+            forum_scraper = quiet(PhoneForumScraper, os.path.join(directory, 'extraction_forum.db'))
+            bench_extraction(cases, scraper, forum_scraper, pages, price_texts, args)
+        if 'network' in groups:
+            bench_network(cases, directory, pages, args)
+        if 'db' in groups:
+            bench_db(cases, directory, args)
+
+    print_results(cases)
+    if args.json:
+        save_results(args.json, environment(**{k: v for k, v in vars(args).items() if k not in ('json', 'compare')}), cases)
+        print(f"\nRezultate salvate in {args.json}")
+    if args.compare:
+        compare_results(args.compare, cases)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Import in masa de produse dintr-un fisier de URL-uri.
+
+    python bulk_import.py urls.csv
+    python bulk_import.py produse.jsonl --workers 32 --per-site 4
+    cat urls.txt | python bulk_import.py - --format txt
+
+CSV: coloana "url" (sau prima coloana). JSONL: un obiect {"url": ...} pe linie.
+TXT: un URL pe linie.
+"""
+import argparse
+import csv
+import json
+import queue
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from http_client import DomainRateLimiter
+from scraper_online import SmartPriceScraper
+
+
+def detect_format(path):
+    if path.endswith('.jsonl') or path.endswith('.ndjson'):
+        return 'jsonl'
+    if path.endswith('.csv'):
+        return 'csv'
+    return 'txt'
+
+
+def read_urls(stream, fmt):
+    """Citeste URL-urile din CSV/JSONL/TXT, ignorand liniile goale si comentariile"""
+    if fmt == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"Atentie: linia {number} nu e JSON valid, ignorata")
+                continue
+            url = record.get('url') if isinstance(record, dict) else None
+            # "url": 123, null sau un obiect nu e un URL
+            if not isinstance(url, str):
+                print(f"Atentie: linia {number} nu are un camp \"url\" text, ignorata")
+                continue
+            if url.strip():
+                yield url.strip()
+    elif fmt == 'csv':
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        if 'url' in [column.strip().lower() for column in header]:
+            column = [c.strip().lower() for c in header].index('url')
+        else:
+            column = 0
+            if header and header[0].strip().startswith('http'):
+                yield header[0].strip()
+        for row in reader:
+            if len(row) > column and row[column].strip():
+                yield row[column].strip()
+    else:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+class BulkImporter:
+    """Detecteaza produsele concurent (limitat pe site) si le scrie in tranzactii pe loturi"""
+    def __init__(self, scraper, max_workers=16, per_site=4, delay=0.5, batch_size=200):
+        self.scraper = scraper
+        self.max_workers = max_workers
+        self.per_site = per_site
+        self.delay = delay
+        self.batch_size = batch_size
+
+    def import_urls(self, urls):
+        """Importa URL-urile; metricile importului se salveaza in scrape_runs"""
+        with metrics.run('bulk_import', self.scraper.storage) as run_metrics:
+            summary = self._import(urls)
+        summary['metrics'] = run_metrics
+        return summary
+
+    def _import(self, urls):
+        start = time.perf_counter()
+        summary = {
+            'read': 0,
+            'duplicates': 0,
+            'existing': 0,
+            'added': 0,
+            'failed': 0,
+            'failed_urls': []
+        }
+
+        existing = self.scraper.existing_urls()
+        seen = set()
+        by_site = defaultdict(list)
+        for url in urls:
+            summary['read'] += 1
+            if url in seen:
+                summary['duplicates'] += 1
+                continue
+            seen.add(url)
+            if url in existing:
+                summary['existing'] += 1
+                continue
+            by_site[self.scraper.detect_site_name(url)].append(url)
+
+        # Fiecare site e impartit in cateva "benzi"; limiter-ul pastreaza ritmul pe site
+        lanes = []
+        for site_key, site_urls in by_site.items():
+            for lane in range(self.per_site):
+                if site_urls[lane::self.per_site]:
+                    lanes.append((site_key, site_urls[lane::self.per_site]))
+
+        total = sum(len(site_urls) for site_urls in by_site.values())
+        print(f"Import: {total} URL-uri noi de pe {len(by_site)} site-uri")
+
+        limiter = DomainRateLimiter(self.delay)
+        results = queue.Queue()
+
+        def analyze_lane(site_key, lane_urls):
+            for url in lane_urls:
+                product = None
+                try:
+                    limiter.wait(site_key)
+                    product = self.scraper.analyze_product(url, verbose=False)
+                except Exception as e:
+                    metrics.current().incr('errors', site_key, stage='analyze')
+                    print(f"Eroare la {url}: {e}")
+                finally:
+                    results.put((url, product))
+
+        batch = []
+        if lanes:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(lanes)))) as executor:
+                for site_key, lane_urls in lanes:
+                    executor.submit(metrics.bind(analyze_lane), site_key, lane_urls)
+
+                for done in range(1, total + 1):
+                    url, product = results.get()
+                    if product:
+                        batch.append(product)
+                    else:
+                        summary['failed'] += 1
+                        summary['failed_urls'].append(url)
+
+                    if len(batch) >= self.batch_size:
+                        summary['added'] += self.scraper.save_products(batch)
+                        batch = []
+                    if done % 100 == 0:
+                        print(f"  {done}/{total} procesate...")
+
+        summary['added'] += self.scraper.save_products(batch)
+        summary['elapsed'] = time.perf_counter() - start
+        return summary
+
+
+def print_summary(summary):
+    print("\nRezumat import:")
+    print("-" * 40)
+    print(f"Citite:              {summary['read']}")
+    print(f"Duplicate in fisier: {summary['duplicates']}")
+    print(f"Deja monitorizate:   {summary['existing']}")
+    print(f"Adaugate:            {summary['added']}")
+    print(f"Esuate:              {summary['failed']}")
+    print(f"Durata:              {summary['elapsed']:.1f}s")
+    for url in summary['failed_urls'][:20]:
+        print(f"  - {url}")
+    if len(summary['failed_urls']) > 20:
+        print(f"  ... si inca {len(summary['failed_urls']) - 20}")
+    if summary.get('metrics'):
+        metrics.print_summary(summary['metrics'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='fisierul cu URL-uri sau - pentru stdin')
+    parser.add_argument('--format', choices=['csv', 'jsonl', 'txt'])
+    parser.add_argument('--db', default='prices.db')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--per-site', type=int, default=4, help='request-uri simultane pe acelasi site')
+    parser.add_argument('--delay', type=float, default=0.5, help='pauza minima intre request-uri pe acelasi site')
+    parser.add_argument('--batch', type=int, default=200, help='produse per tranzactie')
+    args = parser.parse_args(argv)
+
+    scraper = SmartPriceScraper(args.db)
+    importer = BulkImporter(scraper, args.workers, args.per_site, args.delay, args.batch)
+
+    if args.source == '-':
+        summary = importer.import_urls(read_urls(sys.stdin, args.format or 'txt'))
+    else:
+        with open(args.source, encoding='utf-8', newline='') as f:
+            summary = importer.import_urls(read_urls(f, args.format or detect_format(args.source)))
+
+    print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+
+import metrics
+from forumuri_scraper import post_hash
+from html_parsing import make_soup
+from http_client import DomainRateLimiter, get_default_client
+from keyword_matcher import KeywordMatcher
+
+
+DEFAULT_NEXT_SELECTOR = 'a[rel="next"], link[rel="next"], .pageNav-jump--next, a.next'
+
+
+class ForumCrawler:
+    """
+    Crawl real pe forumuri, cu selectorii din predefined_forums:
+    fetch -> parsare -> potrivire keywords -> inserare pe loturi.
+    Forumurile se parcurg in paralel; paginile unui forum urmeaza paginarea in ordine.
+
+    Crawl-ul e incremental: pe forumurile cu cele mai noi postari primele (implicit)
+    paginarea se opreste la prima pagina cu postari deja salvate sau mai vechi decat
+    last_post_date; forumurile cu 'order': 'oldest_first' se reiau de la last_page_url.
+    """
+    def __init__(self, scraper, http_client=None, max_workers=8, per_host=2,
+                 delay=1.0, max_pages=5, batch_size=100, queue_size=1000):
+        self.scraper = scraper
+        self.http = http_client or get_default_client()
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.delay = delay
+        self.max_pages = max_pages
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+
+        self.limiter = DomainRateLimiter(delay)
+        self.host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self.host_lock = threading.Lock()
+
+    def configured_forums(self):
+        """Forumurile active din baza de date, completate cu selectorii din configuratie"""
+        config = {forum['name']: forum for forum in self.scraper.predefined_forums}
+        forums = []
+        for forum_id, name, url, keywords, last_post_date, last_page_url in self.scraper.storage.query('''
+            SELECT id, name, url, keywords, last_post_date, last_page_url
+            FROM phone_forums WHERE active = 1
+        '''):
+            if name not in config:
+                print(f"Sar peste {name}: nu are selectori configurati")
+                continue
+            forum = dict(config[name])
+            forum.update({
+                'id': forum_id,
+                'url': url,
+                'keywords': [k.strip() for k in (keywords or '').split(',') if k.strip()],
+                'last_post_date': last_post_date,
+                'last_page_url': last_page_url
+            })
+            forums.append(forum)
+        return forums
+
+    def _host_slot(self, url):
+        with self.host_lock:
+            return self.host_slots[urlparse(url).netloc]
+
+    def fetch(self, url):
+        host = urlparse(url).netloc
+        with self._host_slot(url):
+            self.limiter.wait(host)
+            return self.http.get(url).content
+
+    def extract_posts(self, forum, soup):
+        posts = []
+        for element in soup.select(forum['post_selector']):
+            title_element = element.select_one(forum['title_selector'])
+            author_element = element.select_one(forum['author_selector'])
+            date_element = element.select_one('time[datetime]')
+
+            title = title_element.get_text(strip=True) if title_element else ''
+            content = element.get_text(' ', strip=True)
+            if not title and not content:
+                continue
+
+            posts.append({
+                'title': title,
+                'author': author_element.get_text(strip=True) if author_element else '',
+                'content': content,
+                'date': date_element['datetime'][:10] if date_element else datetime.now().strftime('%Y-%m-%d')
+            })
+        return posts
+
+    def match_keywords(self, forum, post):
+        # Un singur matcher compilat per forum, refolosit pentru toate postarile
+        if 'matcher' not in forum:
+            forum['matcher'] = KeywordMatcher(forum['keywords'])
+        return forum['matcher'].match(f"{post['title']}\n{post['content']}")
+
+    def next_page(self, forum, soup, page_url):
+        link = soup.select_one(forum.get('next_selector', DEFAULT_NEXT_SELECTOR))
+        if link and link.get('href'):
+            return urljoin(page_url, link['href'])
+        return None
+
+    def crawl_forum(self, forum, output):
+        oldest_first = forum.get('order') == 'oldest_first'
+        page_url = (forum.get('last_page_url') if oldest_first else None) or forum['url']
+        high_water = forum.get('last_post_date') or ''
+        visited = set()
+        pages = 0
+        last_page = None
+        newest = None
+        try:
+            while page_url and page_url not in visited and pages < self.max_pages:
+                visited.add(page_url)
+                try:
+                    content = self.fetch(page_url)
+                except Exception as e:
+                    print(f"Eroare la {page_url}: {e}")
+                    break
+                pages += 1
+                last_page = page_url
+
+                collector = metrics.current()
+                host = urlparse(page_url).hostname
+                with collector.timer('parse', host):
+                    soup = make_soup(content)
+                with collector.timer('select', host):
+                    posts = self.extract_posts(forum, soup)
+                for post in posts:
+                    post['hash'] = post_hash(post['title'], post['author'], post['content'])
+                    if newest is None or post['date'] > newest['date']:
+                        newest = post
+                known = self.scraper.known_post_hashes(forum['id'], [post['hash'] for post in posts])
+
+                rows = []
+                now = datetime.now().isoformat()
+                for post in posts:
+                    if post['hash'] in known:
+                        continue
+                    rows.append((
+                        forum['id'], post['title'], post['author'], post['content'],
+                        post['date'], ','.join(self.match_keywords(forum, post)), now
+                    ))
+                if rows:
+                    output.put(('posts', forum, rows))
+
+                # Restul paginilor contin doar postari colectate la rularile anterioare
+                if not oldest_first and (known or any(post['date'] < high_water for post in posts)):
+                    break
+
+                page_url = self.next_page(forum, soup, page_url)
+        finally:
+            output.put(('done', forum, {'pages': pages, 'last_page_url': last_page, 'newest': newest}))
+
+    def save_high_water_mark(self, forum, progress):
+        now = datetime.now().isoformat()
+        newest = progress['newest']
+        if newest is None:
+            self.scraper.storage.execute(
+                'UPDATE phone_forums SET last_check = ? WHERE id = ?', (now, forum['id'])
+            )
+            return
+        self.scraper.storage.execute('''
+            UPDATE phone_forums SET
+                last_check = ?,
+                last_page_url = COALESCE(?, last_page_url),
+                last_post_hash = CASE WHEN ? >= COALESCE(last_post_date, '') THEN ? ELSE last_post_hash END,
+                last_post_date = MAX(COALESCE(last_post_date, ''), ?)
+            WHERE id = ?
+        ''', (now, progress['last_page_url'], newest['date'], newest['hash'], newest['date'], forum['id']))
+
+    def crawl(self, forums=None):
+        """Ruleaza crawl-ul; scrierile in baza de date se fac doar din thread-ul apelant"""
+        forums = forums if forums is not None else self.configured_forums()
+        if not forums:
+            print("Nu exista forumuri configurate pentru crawl")
+            return {'forums': 0, 'pages': 0, 'posts': 0}
+
+        # Coada limitata: daca scrierea ramane in urma, fetch-urile asteapta
+        output = queue.Queue(maxsize=self.queue_size)
+        summary = {'forums': len(forums), 'pages': 0, 'posts': 0}
+        batch = []
+
+        def flush():
+            if batch:
+                with metrics.current().timer('db_write'), self.scraper.storage.transaction() as cursor:
+                    summary['posts'] += self.scraper.insert_posts(cursor, batch)
+                batch.clear()
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(forums)))) as executor:
+            for forum in forums:
+                executor.submit(metrics.bind(self.crawl_forum), forum, output)
+
+            remaining = len(forums)
+            while remaining:
+                kind, forum, payload = output.get()
+                if kind == 'posts':
+                    batch.extend(payload)
+                    if len(batch) >= self.batch_size:
+                        flush()
+                else:
+                    remaining -= 1
+                    summary['pages'] += payload['pages']
+                    flush()
+                    self.save_high_water_mark(forum, payload)
+                    print(f"  {forum['name']}: {payload['pages']} pagini")
+
+        flush()
+        return summary
@@ -1,14 +1,46 @@
 import requests
 from bs4 import BeautifulSoup
-import sqlite3
+import hashlib
 from datetime import datetime
 import time
 import re
 from urllib.parse import urljoin, urlparse
 
+import metrics
+from keyword_matcher import KeywordMatcher
+from migrations import FORUM_MIGRATIONS, migrate
+from storage import get_storage
+
+def post_hash(title, author, content):
+    """Identificator stabil al unei postari, independent de spatii si majuscule"""
+    normalized = '\n'.join(' '.join((part or '').lower().split()) for part in (title, author, content))
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+FTS_TOKEN_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def to_fts_query(text):
+    """
+    Transforma textul cautat intr-o expresie FTS5 sigura: "fraze" raman fraze,
+    termenii terminati in * devin prefixe, restul se cauta ca termeni (AND).
+    """
+    terms = []
+    for phrase, word in FTS_TOKEN_RE.findall(text):
+        if phrase:
+            terms.append('"' + phrase.replace('"', '') + '"')
+            continue
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '')
+        if word:
+            terms.append('"' + word + '"' + ('*' if prefix else ''))
+    return ' '.join(terms) or '""'
+
+
 class PhoneForumScraper:
     def __init__(self, db_name="scraper_data.db"):
         self.db_name = db_name
+        self.storage = get_storage(db_name)
         self.init_forum_database()
         
         # Forumuri predefinite legate de telefoane
@@ -99,55 +131,24 @@ class PhoneForumScraper:
         }
     
     def init_forum_database(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS phone_forums (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                url TEXT NOT NULL,
-                keywords TEXT,
-                last_check TEXT,
-                active INTEGER DEFAULT 1
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS phone_posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                forum_id INTEGER,
-                title TEXT,
-                author TEXT,
-                content TEXT,
-                post_date TEXT,
-                keywords_found TEXT,
-                scraped_date TEXT,
-                FOREIGN KEY (forum_id) REFERENCES phone_forums (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        migrate(self.storage, FORUM_MIGRATIONS)
+        self.fts_enabled = self.storage.query_one(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'phone_posts_fts'"
+        ) is not None
     
     def setup_predefined_forums(self):
-        """Adauga forumurile predefinite in baza de date"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        # sterge forumurile existente pentru a evita duplicate
-        cursor.execute('DELETE FROM phone_forums')
-        cursor.execute('DELETE FROM phone_posts')
-        
-        for forum in self.predefined_forums:
-            keywords_str = ','.join(forum['keywords'])
-            cursor.execute('''
+        """Adauga sau actualizeaza forumurile predefinite; postarile deja colectate raman"""
+        with self.storage.transaction() as cursor:
+            cursor.executemany('''
                 INSERT INTO phone_forums (name, url, keywords, last_check)
                 VALUES (?, ?, ?, ?)
-            ''', (forum['name'], forum['url'], keywords_str, datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+                ON CONFLICT(name) DO UPDATE SET
+                    url = excluded.url,
+                    keywords = excluded.keywords
+            ''', [
+                (forum['name'], forum['url'], ','.join(forum['keywords']), datetime.now().isoformat())
+                for forum in self.predefined_forums
+            ])
         
         print("Forumuri predefinite adaugate cu succes!")
         print("Forumuri disponibile:")
@@ -156,68 +157,119 @@ class PhoneForumScraper:
     
     def simulate_forum_scraping(self):
         """Simuleaza scraping-ul forumurilor cu date demo"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
         # Obtine ID-urile forumurilor
-        cursor.execute('SELECT id, name FROM phone_forums')
-        forums = cursor.fetchall()
+        forums = self.storage.query('SELECT id, name, keywords FROM phone_forums')
         
         if not forums:
             print("Nu exista forumuri! Ruleaza mai intai setup_predefined_forums()")
-            conn.close()
             return
         
         print("Simulez scraping-ul forumurilor de telefoane...")
         
         total_new_posts = 0
         
-        for forum_id, forum_name in forums:
+        for forum_id, forum_name, keywords in forums:
             print(f"\nScrapez: {forum_name}")
             
             # Obtine postarile demo pentru acest forum
             demo_posts = self.demo_posts.get(forum_name, [])
+            # Etichetele vin din acelasi matcher ca la crawl-ul real; cele alese de mana
+            # pentru demo raman in fata, ca rezultatele demo-ului sa nu se schimbe
+            matcher = KeywordMatcher((keywords or '').split(','))
             
+            rows = []
             for post in demo_posts:
-                keywords_str = ','.join(post['keywords_found'])
-                
-                cursor.execute('''
-                    INSERT INTO phone_posts 
-                    (forum_id, title, author, content, post_date, keywords_found, scraped_date)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                found = list(post['keywords_found'])
+                found += [k for k in matcher.match(f"{post['title']}\n{post['content']}") if k not in found]
+                keywords_str = ','.join(found)
+                rows.append((
                     forum_id, post['title'], post['author'], post['content'], 
                     post['date'], keywords_str, datetime.now().isoformat()
                 ))
-                
-                total_new_posts += 1
                 print(f"  + {post['title'][:50]}...")
             
-            # Actualizeaza ultima verificare
-            cursor.execute('UPDATE phone_forums SET last_check = ? WHERE id = ?', 
-                          (datetime.now().isoformat(), forum_id))
+            with self.storage.transaction() as cursor:
+                total_new_posts += self.insert_posts(cursor, rows)
+                # Actualizeaza ultima verificare
+                cursor.execute('UPDATE phone_forums SET last_check = ? WHERE id = ?', 
+                              (datetime.now().isoformat(), forum_id))
             
             time.sleep(1)  
         
-        conn.commit()
-        conn.close()
-        
         print(f"\nScraping terminat! Adaugate {total_new_posts} postari noi.")
     
-    def search_phone_discussions(self, keyword):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT f.name, p.title, p.author, p.content, p.post_date, p.keywords_found
-            FROM phone_posts p
-            JOIN phone_forums f ON p.forum_id = f.id
-            WHERE p.title LIKE ? OR p.content LIKE ? OR p.keywords_found LIKE ?
-            ORDER BY p.post_date DESC
-            LIMIT 10
-        ''', (f'%{keyword}%', f'%{keyword}%', f'%{keyword}%'))
-        
-        results = cursor.fetchall()
+    def crawl_forums(self, **options):
+        """Scraping real al forumurilor configurate (vezi ForumCrawler)"""
+        from forum_crawler import ForumCrawler
+        
+        print("Scrapez forumurile de telefoane...")
+        with metrics.run('forum_crawl', self.storage) as run_metrics:
+            summary = ForumCrawler(self, **options).crawl()
+        metrics.print_summary(run_metrics)
+        print(f"\nScraping terminat! {summary['pages']} pagini, {summary['posts']} postari noi.")
+        return summary
+    
+    def insert_posts(self, cursor, rows):
+        """
+        Inserare pe lot: (forum_id, title, author, content, post_date, keywords_found, scraped_date).
+        Postarile deja salvate (acelasi hash pe acelasi forum) se ignora; intoarce cate s-au adaugat.
+        """
+        cursor.executemany('''
+            INSERT OR IGNORE INTO phone_posts 
+            (forum_id, title, author, content, post_date, keywords_found, scraped_date, post_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [row + (post_hash(row[1], row[2], row[3]),) for row in rows])
+        inserted = max(cursor.rowcount, 0)
+        
+        # Etichetele merg si in tabela normalizata post_keywords
+        links = []
+        for row in rows:
+            for keyword in (row[5] or '').split(','):
+                if keyword.strip():
+                    links.append((keyword.strip(), row[0], post_hash(row[1], row[2], row[3])))
+        if links:
+            cursor.executemany('INSERT OR IGNORE INTO keywords (keyword) VALUES (?)',
+                               [(link[0],) for link in links])
+            cursor.executemany('''
+                INSERT OR IGNORE INTO post_keywords (post_id, keyword_id)
+                SELECT p.id, k.id FROM keywords k, phone_posts p
+                WHERE k.keyword = ? AND p.forum_id = ? AND p.post_hash = ?
+            ''', links)
+        return inserted
+    
+    def known_post_hashes(self, forum_id, hashes):
+        if not hashes:
+            return set()
+        placeholders = ','.join('?' * len(hashes))
+        rows = self.storage.query(f'''
+            SELECT post_hash FROM phone_posts
+            WHERE forum_id = ? AND post_hash IN ({placeholders})
+        ''', (forum_id, *hashes))
+        return {row[0] for row in rows}
+    
+    def search_phone_discussions(self, keyword, limit=10):
+        """Cautare full-text (bm25): cuvinte, "fraze exacte" si prefixe (sams*)"""
+        if self.fts_enabled:
+            results = self.storage.query('''
+                SELECT f.name, p.title, p.author,
+                       snippet(phone_posts_fts, 1, '[', ']', '...', 24),
+                       p.post_date, p.keywords_found
+                FROM phone_posts_fts
+                JOIN phone_posts p ON p.id = phone_posts_fts.rowid
+                JOIN phone_forums f ON p.forum_id = f.id
+                WHERE phone_posts_fts MATCH ?
+                ORDER BY bm25(phone_posts_fts, 10.0, 1.0, 5.0)
+                LIMIT ?
+            ''', (to_fts_query(keyword), limit))
+        else:
+            results = self.storage.query('''
+                SELECT f.name, p.title, p.author, substr(p.content, 1, 150) || '...', p.post_date, p.keywords_found
+                FROM phone_posts p
+                JOIN phone_forums f ON p.forum_id = f.id
+                WHERE p.title LIKE ? OR p.content LIKE ? OR p.keywords_found LIKE ?
+                ORDER BY p.post_date DESC
+                LIMIT ?
+            ''', (f'%{keyword}%', f'%{keyword}%', f'%{keyword}%', limit))
         
         if results:
             print(f"\nRezultate pentru '{keyword}':")
@@ -228,29 +280,43 @@ class PhoneForumScraper:
                 print(f"Titlu: {title}")
                 print(f"Autor: {author} | Data: {post_date}")
                 print(f"Keywords: {keywords}")
-                print(f"Preview: {content[:150]}...")
+                print(f"Preview: {content}")
                 print("-" * 80)
         else:
             print(f"Nu am gasit discutii despre '{keyword}'")
-        
-        conn.close()
     
-    def get_phone_recommendations(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+    def tagged_posts(self, keyword, title_fts=None, title_like=()):
+        """
+        Postarile etichetate cu keyword (join pe post_keywords), plus cele al caror
+        titlu se potriveste (FTS5 daca e disponibil, altfel LIKE); cele mai noi primele.
+        """
+        subqueries = ['''
+            SELECT pk.post_id FROM post_keywords pk
+            JOIN keywords k ON k.id = pk.keyword_id
+            WHERE k.keyword = ?
+        ''']
+        params = [keyword]
+        if self.fts_enabled and title_fts:
+            subqueries.append('SELECT rowid FROM phone_posts_fts WHERE phone_posts_fts MATCH ?')
+            params.append(f'title : ({title_fts})')
+        elif title_like:
+            subqueries.append('SELECT id FROM phone_posts WHERE ' + ' OR '.join(['title LIKE ?'] * len(title_like)))
+            params.extend(title_like)
+        
+        return self.storage.query(f'''
             SELECT f.name, p.title, p.author, p.content, p.post_date
             FROM phone_posts p
             JOIN phone_forums f ON p.forum_id = f.id
-            WHERE p.keywords_found LIKE '%phone recommendation%' 
-            OR p.title LIKE '%recommendation%'
-            OR p.title LIKE '%should I buy%'
-            OR p.title LIKE '%best phone%'
+            WHERE p.id IN ({' UNION '.join(subqueries)})
             ORDER BY p.post_date DESC
-        ''')
-        
-        results = cursor.fetchall()
+        ''', params)
+    
+    def get_phone_recommendations(self):
+        results = self.tagged_posts(
+            'phone recommendation',
+            title_fts='recommendation* OR "should i buy" OR "best phone"',
+            title_like=('%recommendation%', '%should I buy%', '%best phone%')
+        )
         
         if results:
             print("\nRecomandari de telefoane din forumuri:")
@@ -264,24 +330,13 @@ class PhoneForumScraper:
                 print("-" * 80)
         else:
             print("Nu am gasit recomandari de telefoane")
-        
-        conn.close()
     
     def get_phone_reviews(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT f.name, p.title, p.author, p.content, p.post_date
-            FROM phone_posts p
-            JOIN phone_forums f ON p.forum_id = f.id
-            WHERE p.keywords_found LIKE '%review%'
-            OR p.title LIKE '%review%'
-            OR p.title LIKE '%analysis%'
-            ORDER BY p.post_date DESC
-        ''')
-        
-        results = cursor.fetchall()
+        results = self.tagged_posts(
+            'review',
+            title_fts='review* OR analysis*',
+            title_like=('%review%', '%analysis%')
+        )
         
         if results:
             print("\nReview-uri de telefoane:")
@@ -295,14 +350,9 @@ class PhoneForumScraper:
                 print("-" * 80)
         else:
             print("Nu am gasit review-uri")
-        
-        conn.close()
     
     def get_forum_stats(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        results = self.storage.query('''
             SELECT f.name, COUNT(p.id) as posts_count,
                    MAX(p.post_date) as latest_post
             FROM phone_forums f
@@ -311,8 +361,6 @@ class PhoneForumScraper:
             ORDER BY posts_count DESC
         ''')
         
-        results = cursor.fetchall()
-        
         if results:
             print("\nStatistici forumuri telefoane:")
             print("=" * 60)
@@ -325,15 +373,9 @@ class PhoneForumScraper:
             
             print("=" * 60)
             print(f"Total postari colectate: {total_posts}")
-        
-        conn.close()
     
     def list_forums(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT name, url, keywords FROM phone_forums')
-        forums = cursor.fetchall()
+        forums = self.storage.query('SELECT name, url, keywords FROM phone_forums')
         
         if forums:
             print("\nForumuri telefoane configurate:")
@@ -345,8 +387,6 @@ class PhoneForumScraper:
                 print("-" * 80)
         else:
             print("Nu sunt forumuri configurate")
-        
-        conn.close()
 
 
 def show_forum_menu():
@@ -359,6 +399,7 @@ def show_forum_menu():
     print("5. Gaseste review-uri telefoane")
     print("6. Vezi statistici forumuri")
     print("7. Listeaza forumuri configurate")
+    print("8. Scrapeaza forumurile (real)")
     print("0. Iesire")
     print("="*50)
 
@@ -400,6 +441,10 @@ def main_phone_forums():
             scraper.list_forums()
             show_forum_menu()
         
+        elif choice == '8':
+            scraper.crawl_forums()
+            show_forum_menu()
+        
         elif choice == '0':
             break
         
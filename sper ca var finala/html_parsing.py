@@ -0,0 +1,240 @@
+import html
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    PARSER_BACKEND = 'lxml'
+except ImportError:
+    PARSER_BACKEND = 'html.parser'
+
+
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+
+# Elemente cu tag de inchidere optional: ce tag-uri de start le inchid implicit
+_CLOSES_P = {
+    'address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'header', 'hgroup', 'hr', 'main', 'menu', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'ul'
+}
+IMPLIED_END = {
+    'p': _CLOSES_P,
+    'li': {'li'},
+    'dt': {'dt', 'dd'},
+    'dd': {'dt', 'dd'},
+    'option': {'option', 'optgroup'},
+    'optgroup': {'optgroup'},
+    'tr': {'tr', 'tbody', 'tfoot'},
+    'td': {'td', 'th', 'tr', 'tbody', 'tfoot'},
+    'th': {'td', 'th', 'tr', 'tbody', 'tfoot'},
+    'thead': {'tbody', 'tfoot'},
+    'tbody': {'tbody', 'tfoot'},
+    'rt': {'rt', 'rp'},
+    'rp': {'rt', 'rp'},
+}
+
+# Elemente al caror continut nu e markup
+RAW_TEXT_TAGS = ('script', 'style', 'textarea', 'title')
+# Comentariile si elementele de mai sus, cu tot cu continut (pe textul cu litere mici)
+RAW_SPAN_RE = re.compile(r'<!--.*?(?:-->|\Z)|<(%s)\b.*?(?:</\1|\Z)' % '|'.join(RAW_TEXT_TAGS), re.S)
+
+# tag, .clasa, [attr], [attr="val"], [attr*="val"] si combinatii ale lor fara spatii
+SIMPLE_SELECTOR_RE = re.compile(r'^[a-zA-Z][\w-]*|\.[\w-]+|\[[^\]]+\]')
+ATTR_RE = re.compile(r'^\[\s*([\w:-]+)\s*(?:(\*?=)\s*["\']?([^"\'\]]*)["\']?\s*)?\]$')
+
+
+def make_soup(content, backend=None):
+    """Construieste arborele BeautifulSoup cu cel mai rapid parser disponibil"""
+    return BeautifulSoup(content, backend or PARSER_BACKEND)
+
+
+def parse_simple_selector(selector):
+    """Descompune un selector simplu in (tag, clase, conditii pe atribute); None daca nu e simplu"""
+    selector = selector.strip()
+    parts = SIMPLE_SELECTOR_RE.findall(selector)
+    if not parts or ''.join(parts) != selector:
+        return None
+
+    tag = None
+    classes = []
+    attrs = []
+    for part in parts:
+        if part.startswith('.'):
+            classes.append(part[1:])
+        elif part.startswith('['):
+            match = ATTR_RE.match(part)
+            if not match:
+                return None
+            name, operator, value = match.groups()
+            attrs.append((name.lower(), operator, value))
+        else:
+            tag = part.lower()
+    return tag, classes, attrs
+
+
+class UnsupportedSelector(ValueError):
+    """Selectorul are combinatori sau pseudo-clase si necesita arborele complet"""
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _TargetedParser(HTMLParser):
+    def __init__(self, tag, classes, attrs):
+        super().__init__(convert_charrefs=True)
+        self.tag = tag
+        self.classes = classes
+        self.attr_conditions = attrs
+        self.open = []
+        self.found = False
+        self.fragment = []
+
+    def _matches(self, tag, attrs):
+        if self.tag and tag != self.tag:
+            return False
+        attr_map = dict(attrs)
+        if self.classes:
+            element_classes = (attr_map.get('class') or '').split()
+            if not all(c in element_classes for c in self.classes):
+                return False
+        for name, operator, value in self.attr_conditions:
+            if name not in attr_map:
+                return False
+            actual = attr_map[name] or ''
+            if operator == '=' and actual != value:
+                return False
+            if operator == '*=' and value not in actual:
+                return False
+        return True
+
+    def handle_starttag(self, tag, attrs):
+        if not self.found:
+            if not self._matches(tag, attrs):
+                return
+            self.found = True
+            self.fragment.append(self.get_starttag_text())
+            if tag in VOID_TAGS:
+                raise _StopParsing()
+            self.open.append(tag)
+            return
+
+        # <li>, <p>, <td> etc. se inchid si fara tag de inchidere
+        while self.open and tag in IMPLIED_END.get(self.open[-1], ()):
+            self.fragment.append(f'</{self.open.pop()}>')
+        if not self.open:
+            raise _StopParsing()
+        self.fragment.append(self.get_starttag_text())
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.found:
+            if self._matches(tag, attrs):
+                self.found = True
+                self.fragment.append(self.get_starttag_text())
+                raise _StopParsing()
+        else:
+            self.fragment.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if not self.found or tag in VOID_TAGS:
+            return
+        # Inchiderea unui parinte al elementului il inchide si pe el
+        if tag not in self.open:
+            raise _StopParsing()
+        while True:
+            closed = self.open.pop()
+            self.fragment.append(f'</{closed}>')
+            if closed == tag:
+                break
+        if not self.open:
+            raise _StopParsing()
+
+    def handle_data(self, data):
+        if self.found:
+            self.fragment.append(html.escape(data, quote=False))
+
+
+def _inside_tag(content, start):
+    """Daca '<' de la start e intr-o valoare de atribut a unui tag deschis inainte"""
+    # Un tag deschis dupa ultimul '>' inseamna ca suntem intr-o valoare de atribut
+    closed = content.rfind('>', 0, start)
+    position = start
+    while True:
+        position = content.rfind('<', closed + 1, position)
+        if position < 0:
+            return False
+        if content[position + 1:position + 2].isalpha():
+            return True
+
+
+def _candidate_offset(content, tag, classes, attrs):
+    """
+    Inceputul tag-ului de la care poate porni parsarea: '<'-ul dinaintea primei
+    aparitii a textului cautat. Aparitiile din comentarii, script/style sau valori
+    de atribute se sar, ca parsarea sa porneasca de la o granita reala de tag.
+    Comentariile si script/style se parcurg o singura data, in paralel cu aparitiile.
+    """
+    lowered = content.lower()
+    if classes:
+        needle, haystack = classes[0], content
+    elif attrs:
+        needle, haystack = attrs[0][0].lower(), lowered
+    else:
+        needle, haystack = '<' + tag, lowered
+
+    spans = RAW_SPAN_RE.finditer(lowered)
+    span = next(spans, None)
+    position = haystack.find(needle)
+    while position >= 0:
+        start = content.rfind('<', 0, position + 1)
+        while span is not None and span.end() <= start:
+            span = next(spans, None)
+        if span is not None and span.start() < start:
+            # Tot ce e in comentariu/script e sarit dintr-o data
+            position = haystack.find(needle, max(position + 1, span.end()))
+            continue
+        if start >= 0 and not _inside_tag(content, start):
+            return start
+        position = haystack.find(needle, position + 1)
+    return -1
+
+
+def select_first(content, selector, chunk_size=16384):
+    """
+    Gaseste primul element care se potriveste cu selectorul fara sa construiasca tot arborele:
+    parsarea porneste de la primul tag candidat si se opreste imediat ce elementul s-a inchis.
+    Returneaza elementul (ca Tag BeautifulSoup, construit doar din fragmentul lui) sau None.
+    Arunca UnsupportedSelector pentru selectori compusi (trebuie folosit make_soup).
+    """
+    parsed = parse_simple_selector(selector)
+    if parsed is None:
+        raise UnsupportedSelector(selector)
+
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+
+    # Sare direct la primul tag care poate contine selectorul
+    start = _candidate_offset(content, *parsed)
+    if start < 0:
+        return None
+    content = content[start:]
+
+    parser = _TargetedParser(*parsed)
+    try:
+        for start in range(0, len(content), chunk_size):
+            parser.feed(content[start:start + chunk_size])
+        parser.close()
+    except _StopParsing:
+        pass
+
+    if not parser.found:
+        return None
+    fragment = BeautifulSoup(''.join(parser.fragment), 'html.parser')
+    return fragment.find(True)
@@ -0,0 +1,90 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+from migrations import CACHE_MIGRATIONS, migrate
+from storage import get_storage
+
+
+def cache_path_for(db_name):
+    """Fisierul de cache sta langa baza de date principala (prices.db -> prices_http_cache.db)"""
+    base, _ = os.path.splitext(db_name)
+    return f"{base}_http_cache.db"
+
+
+def body_hash(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+class HttpCache:
+    """Cache HTTP pe disc: ETag, Last-Modified si hash-ul continutului per URL"""
+    def __init__(self, db_name, max_entries=50000, max_age_days=30):
+        self.db_name = db_name
+        self.storage = get_storage(db_name)
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.init_cache()
+
+    def init_cache(self):
+        migrate(self.storage, CACHE_MIGRATIONS)
+
+    def lookup(self, url):
+        row = self.storage.query_one('''
+            SELECT etag, last_modified, body_hash, selector, price
+            FROM http_cache WHERE url = ?
+        ''', (url,))
+
+        if not row:
+            return None
+        etag, last_modified, content_hash, selector, price = row
+        return {
+            'etag': etag,
+            'last_modified': last_modified,
+            'body_hash': content_hash,
+            'selector': selector,
+            'price': price
+        }
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response, content_hash, selector, price):
+        now = datetime.now().isoformat()
+        self.storage.execute('''
+            INSERT OR REPLACE INTO http_cache
+            (url, etag, last_modified, body_hash, selector, price, fetched_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+            content_hash, selector, price, now, now
+        ))
+
+    def touch(self, url):
+        self.storage.execute('UPDATE http_cache SET last_used = ? WHERE url = ?',
+                             (datetime.now().isoformat(), url))
+
+    def evict(self):
+        """Sterge intrarile mai vechi de max_age_days si pastreaza cel mult max_entries"""
+        removed = 0
+        with self.storage.transaction() as cursor:
+            if self.max_age_days is not None:
+                cutoff = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+                cursor.execute('DELETE FROM http_cache WHERE last_used < ?', (cutoff,))
+                removed += cursor.rowcount
+
+            if self.max_entries is not None:
+                cursor.execute('''
+                    DELETE FROM http_cache WHERE url IN (
+                        SELECT url FROM http_cache
+                        ORDER BY last_used DESC
+                        LIMIT -1 OFFSET ?
+                    )
+                ''', (self.max_entries,))
+                removed += cursor.rowcount
+        return removed
@@ -0,0 +1,160 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import metrics
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'ro-RO,ro;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        # requests nu expune separat DNS/connect; aici se masoara deschiderea unei
+        # conexiuni noi (rezolvare DNS + TCP), o singura data per conexiune keep-alive
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            metrics.current().observe('connect', time.perf_counter() - start, self.host)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # Pentru HTTPS include si handshake-ul TLS
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            metrics.current().observe('connect', time.perf_counter() - start, self.host)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+class HttpClient:
+    """Sesiune HTTP comuna, cu pool de conexiuni pe host si retry cu backoff"""
+    def __init__(self, timeout=15, retries=3, backoff_factor=1.0,
+                 pool_connections=20, pool_maxsize=10, headers=None):
+        # timeout poate fi un numar sau un tuplu (connect, read)
+        self.timeout = timeout
+        self.headers = dict(DEFAULT_HEADERS)
+        if headers:
+            self.headers.update(headers)
+
+        self.retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.session = self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        session.headers.update(self.headers)
+        # pool_connections = cate host-uri tinem in cache,
+        # pool_maxsize = cate conexiuni keep-alive pastram per host
+        adapter = TimedHTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.retry
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, url, headers=None, timeout=None):
+        domain = urlparse(url).hostname or ''
+        collector = metrics.current()
+        start = time.perf_counter()
+        try:
+            # stream=True: get() revine dupa header-e, corpul se descarca separat
+            response = self.session.get(url, headers=headers, timeout=timeout or self.timeout, stream=True)
+            headers_received = time.perf_counter()
+            content = response.content
+        except Exception:
+            collector.incr('errors', domain, stage='fetch')
+            raise
+        finished = time.perf_counter()
+
+        collector.observe('ttfb', headers_received - start, domain)
+        collector.observe('download', finished - headers_received, domain)
+        collector.incr('requests', domain)
+        collector.incr('bytes', domain, len(content))
+        collector.incr('http_responses', domain, status=response.status_code)
+        if response.status_code >= 400:
+            collector.incr('errors', domain, stage='http')
+
+        response.raise_for_status()
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+class DomainRateLimiter:
+    """Pastreaza pauza dintre request-uri separat pentru fiecare site"""
+    def __init__(self, delay=3):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next_allowed = {}
+
+    def reserve(self, domain):
+        """Rezerva urmatorul slot liber pentru domeniu; intoarce cat mai trebuie asteptat"""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_allowed.get(domain, now))
+            self.next_allowed[domain] = slot + self.delay
+        return max(0.0, slot - time.monotonic())
+
+    def wait(self, domain):
+        # Asteptarea se face in afara lock-ului; codul asyncio foloseste reserve() direct
+        pause = self.reserve(domain)
+        if pause > 0:
+            time.sleep(pause)
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_default_client():
+    """Clientul HTTP partajat de toate scraper-ele din proces"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
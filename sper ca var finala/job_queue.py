@@ -0,0 +1,299 @@
+"""
+Coada de joburi de scraping, partajata de mai multi workeri (procese sau masini).
+
+Fiecare produs are un singur job, cu momentul la care devine scadent. Un worker
+revendica (claim) joburi scadente pentru lease_seconds; cat timp lease-ul e
+valabil, nimeni altcineva nu le primeste. Daca worker-ul se opreste, lease-ul
+expira si jobul poate fi revendicat din nou. Fiecare claim da jobului un token
+nou, iar complete/fail trec doar cu tokenul curent: un worker care si-a pierdut
+lease-ul nu mai poate scrie peste rezultatul celui care a preluat jobul.
+
+Backend-uri: 'sqlite' (tabela scrape_jobs, implicit in baza cu preturile) si
+'memory' (in proces, pentru teste si benchmark-uri). Un backend nou (de ex. un
+serviciu Redis) implementeaza JobQueue si se adauga in BACKENDS.
+
+Momentele (due_at, lease_expires) sunt timestamp-uri Unix ale masinii care scrie,
+deci ceasurile workerilor trebuie sincronizate (NTP).
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from migrations import PRICE_MIGRATIONS, QUEUE_MIGRATIONS, migrate
+from storage import get_storage
+
+
+Job = namedtuple('Job', 'product_id token attempts')
+
+
+def create_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scrape_jobs (
+            product_id INTEGER PRIMARY KEY,
+            due_at REAL NOT NULL,
+            worker TEXT,
+            lease_expires REAL,
+            token INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scrape_jobs_due ON scrape_jobs (due_at)')
+
+
+class LeaseLost(Exception):
+    """Jobul a fost preluat de alt worker intre timp; rezultatul nu se mai scrie"""
+
+
+class JobQueue(ABC):
+    """Operatiile comune tuturor backend-urilor"""
+    # Storage-ul SQLite al cozii, daca are unul: cand e acelasi cu al preturilor,
+    # terminarea jobului intra in aceeasi tranzactie cu scrierea pretului
+    storage = None
+
+    @abstractmethod
+    def enqueue(self, items):
+        """(product_id, due_at) pentru produsele care nu au inca job; intoarce cate s-au adaugat"""
+
+    @abstractmethod
+    def claim(self, worker_id, limit=10, lease_seconds=300):
+        """Pana la limit joburi scadente, libere sau cu lease expirat, cele mai vechi primele"""
+
+    @abstractmethod
+    def extend(self, jobs, lease_seconds):
+        """Prelungeste lease-ul; intoarce joburile care inca apartin worker-ului"""
+
+    @abstractmethod
+    def complete(self, job, next_due, cursor=None):
+        """Elibereaza jobul si il programeaza la next_due; False daca lease-ul s-a pierdut"""
+
+    @abstractmethod
+    def fail(self, job, retry_at, error=None, cursor=None):
+        """Elibereaza jobul fara rezultat, de reincercat la retry_at; attempts ramane"""
+
+    @abstractmethod
+    def remove(self, product_ids):
+        """Sterge joburile produselor date; intoarce cate au fost"""
+
+    @abstractmethod
+    def requeue_expired(self):
+        """Elibereaza explicit lease-urile expirate; intoarce cate au fost"""
+
+    @abstractmethod
+    def stats(self):
+        """total, ready, scheduled, leased, expired, failing si joburile tinute de fiecare worker"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """Coada in tabela scrape_jobs; claim-ul e un singur UPDATE, deci atomic intre procese"""
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.storage = get_storage(db_name)
+        self.init_queue()
+
+    def init_queue(self):
+        # In baza cu preturile tabela vine din PRICE_MIGRATIONS; un fisier separat
+        # pentru coada (sqlite:/date/jobs.db) are propria lista de migrari
+        if self.storage.query_one("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'"):
+            migrate(self.storage, PRICE_MIGRATIONS)
+        else:
+            migrate(self.storage, QUEUE_MIGRATIONS)
+
+    def _execute(self, sql, params, cursor=None):
+        if cursor is not None:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+        return self.storage.execute(sql, params)
+
+    def enqueue(self, items):
+        now = datetime.now().isoformat()
+        return self.storage.executemany('''
+            INSERT OR IGNORE INTO scrape_jobs (product_id, due_at, updated) VALUES (?, ?, ?)
+        ''', [(product_id, due_at, now) for product_id, due_at in items])
+
+    def claim(self, worker_id, limit=10, lease_seconds=300):
+        now = time.time()
+        # Scrierea incepe odata cu instructiunea, deci doi workeri nu pot alege aceleasi randuri
+        with self.storage.transaction() as cursor:
+            cursor.execute('''
+                UPDATE scrape_jobs
+                SET worker = ?, lease_expires = ?, token = token + 1, attempts = attempts + 1, updated = ?
+                WHERE product_id IN (
+                    SELECT product_id FROM scrape_jobs
+                    WHERE due_at <= ? AND (worker IS NULL OR lease_expires <= ?)
+                    ORDER BY due_at LIMIT ?
+                )
+                RETURNING product_id, token, attempts
+            ''', (worker_id, now + lease_seconds, datetime.now().isoformat(), now, now, limit))
+            return [Job(*row) for row in cursor.fetchall()]
+
+    def extend(self, jobs, lease_seconds):
+        expires = time.time() + lease_seconds
+        held = []
+        with self.storage.transaction() as cursor:
+            for job in jobs:
+                cursor.execute('''
+                    UPDATE scrape_jobs SET lease_expires = ?
+                    WHERE product_id = ? AND token = ? AND worker IS NOT NULL
+                ''', (expires, job.product_id, job.token))
+                if cursor.rowcount:
+                    held.append(job)
+        return held
+
+    def complete(self, job, next_due, cursor=None):
+        return self._execute('''
+            UPDATE scrape_jobs
+            SET worker = NULL, lease_expires = NULL, due_at = ?, attempts = 0, last_error = NULL, updated = ?
+            WHERE product_id = ? AND token = ? AND worker IS NOT NULL
+        ''', (next_due, datetime.now().isoformat(), job.product_id, job.token), cursor) > 0
+
+    def fail(self, job, retry_at, error=None, cursor=None):
+        return self._execute('''
+            UPDATE scrape_jobs
+            SET worker = NULL, lease_expires = NULL, due_at = ?, last_error = ?, updated = ?
+            WHERE product_id = ? AND token = ? AND worker IS NOT NULL
+        ''', (retry_at, error, datetime.now().isoformat(), job.product_id, job.token), cursor) > 0
+
+    def remove(self, product_ids):
+        return self.storage.executemany('DELETE FROM scrape_jobs WHERE product_id = ?',
+                                        [(product_id,) for product_id in product_ids])
+
+    def requeue_expired(self):
+        return self.storage.execute('''
+            UPDATE scrape_jobs SET worker = NULL, lease_expires = NULL, last_error = 'lease expirat', updated = ?
+            WHERE worker IS NOT NULL AND lease_expires <= ?
+        ''', (datetime.now().isoformat(), time.time()))
+
+    def stats(self):
+        now = time.time()
+        total, ready, scheduled, leased, expired, failing = self.storage.query_one('''
+            SELECT COUNT(*),
+                   COALESCE(SUM(worker IS NULL AND due_at <= ?), 0),
+                   COALESCE(SUM(worker IS NULL AND due_at > ?), 0),
+                   COALESCE(SUM(worker IS NOT NULL AND lease_expires > ?), 0),
+                   COALESCE(SUM(worker IS NOT NULL AND lease_expires <= ?), 0),
+                   COALESCE(SUM(last_error IS NOT NULL), 0)
+            FROM scrape_jobs
+        ''', (now, now, now, now))
+        workers = dict(self.storage.query('''
+            SELECT worker, COUNT(*) FROM scrape_jobs
+            WHERE worker IS NOT NULL AND lease_expires > ? GROUP BY worker
+        ''', (now,)))
+        return {'total': total, 'ready': ready, 'scheduled': scheduled, 'leased': leased,
+                'expired': expired, 'failing': failing, 'workers': workers}
+
+
+class MemoryJobQueue(JobQueue):
+    """
+    Aceleasi reguli, in memoria procesului: inlocuieste un serviciu extern
+    (Redis si altele) la teste si benchmark-uri cu mai multe thread-uri.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.lock = threading.Lock()
+        # product_id -> [due_at, worker, lease_expires, token, attempts, last_error]
+        self.jobs = {}
+
+    def enqueue(self, items):
+        added = 0
+        with self.lock:
+            for product_id, due_at in items:
+                if product_id not in self.jobs:
+                    self.jobs[product_id] = [due_at, None, None, 0, 0, None]
+                    added += 1
+        return added
+
+    def _held(self, job):
+        entry = self.jobs.get(job.product_id)
+        return entry is not None and entry[3] == job.token and entry[1] is not None
+
+    def claim(self, worker_id, limit=10, lease_seconds=300):
+        now = time.time()
+        with self.lock:
+            available = sorted(
+                (entry[0], product_id) for product_id, entry in self.jobs.items()
+                if entry[0] <= now and (entry[1] is None or entry[2] <= now)
+            )
+            claimed = []
+            for _, product_id in available[:limit]:
+                entry = self.jobs[product_id]
+                entry[1], entry[2] = worker_id, now + lease_seconds
+                entry[3] += 1
+                entry[4] += 1
+                claimed.append(Job(product_id, entry[3], entry[4]))
+            return claimed
+
+    def extend(self, jobs, lease_seconds):
+        expires = time.time() + lease_seconds
+        held = []
+        with self.lock:
+            for job in jobs:
+                if self._held(job):
+                    self.jobs[job.product_id][2] = expires
+                    held.append(job)
+        return held
+
+    def complete(self, job, next_due, cursor=None):
+        with self.lock:
+            if not self._held(job):
+                return False
+            entry = self.jobs[job.product_id]
+            entry[0], entry[1], entry[2], entry[4], entry[5] = next_due, None, None, 0, None
+            return True
+
+    def fail(self, job, retry_at, error=None, cursor=None):
+        with self.lock:
+            if not self._held(job):
+                return False
+            entry = self.jobs[job.product_id]
+            entry[0], entry[1], entry[2], entry[5] = retry_at, None, None, error
+            return True
+
+    def remove(self, product_ids):
+        with self.lock:
+            return sum(self.jobs.pop(product_id, None) is not None for product_id in product_ids)
+
+    def requeue_expired(self):
+        now = time.time()
+        requeued = 0
+        with self.lock:
+            for entry in self.jobs.values():
+                if entry[1] is not None and entry[2] <= now:
+                    entry[1], entry[2], entry[5] = None, None, 'lease expirat'
+                    requeued += 1
+        return requeued
+
+    def stats(self):
+        now = time.time()
+        with self.lock:
+            entries = list(self.jobs.values())
+        leased = [entry for entry in entries if entry[1] is not None and entry[2] > now]
+        return {
+            'total': len(entries),
+            'ready': sum(entry[1] is None and entry[0] <= now for entry in entries),
+            'scheduled': sum(entry[1] is None and entry[0] > now for entry in entries),
+            'leased': len(leased),
+            'expired': sum(entry[1] is not None and entry[2] <= now for entry in entries),
+            'failing': sum(entry[5] is not None for entry in entries),
+            'workers': dict(Counter(entry[1] for entry in leased))
+        }
+
+
+BACKENDS = {
+    'sqlite': SQLiteJobQueue,
+    'memory': MemoryJobQueue,
+}
+
+
+def open_queue(spec='sqlite', db_name='prices.db'):
+    """
+    'sqlite' -> scrape_jobs in db_name, 'sqlite:/date/jobs.db' -> alt fisier,
+    'memory' -> coada in proces. Partea de dupa ':' ajunge la constructorul backend-ului.
+    """
+    backend, _, target = spec.partition(':')
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend necunoscut pentru coada: {backend} (disponibile: {', '.join(BACKENDS)})")
+    return BACKENDS[backend](target or db_name)
@@ -0,0 +1,49 @@
+import re
+
+
+class KeywordMatcher:
+    """
+    Eticheteaza un text cu toate keyword-urile lui intr-o singura trecere:
+    un singur regex compilat (alternative ordonate descrescator dupa lungime),
+    fara diferente de majuscule si doar pe cuvinte intregi.
+    """
+    def __init__(self, keywords):
+        self.keywords = {}
+        for keyword in keywords:
+            keyword = ' '.join(keyword.split())
+            if keyword:
+                self.keywords.setdefault(keyword.casefold(), keyword)
+
+        folded = sorted(self.keywords, key=len, reverse=True)
+        self.regex = None
+        if folded:
+            alternatives = '|'.join(re.escape(k).replace(r'\ ', r'\s+') for k in folded)
+            # Lookahead: gaseste potriviri la fiecare pozitie, inclusiv suprapuse
+            self.regex = re.compile(r'(?<!\w)(?=(' + alternatives + r')(?!\w))')
+
+        # La aceeasi pozitie regex-ul alege keyword-ul cel mai lung; cele continute
+        # in el ("phone" in "phone recommendation") se adauga din tabela asta
+        self.implied = {}
+        for keyword in folded:
+            inner = [
+                other for other in folded
+                if other != keyword and re.search(r'(?<!\w)' + re.escape(other) + r'(?!\w)', keyword)
+            ]
+            if inner:
+                self.implied[keyword] = inner
+
+    def match(self, text):
+        """Keyword-urile gasite in text, in forma originala, in ordinea primei aparitii"""
+        if not self.regex or not text:
+            return []
+
+        found = {}
+        for match in self.regex.finditer(text.casefold()):
+            keyword = ' '.join(match.group(1).split())
+            found.setdefault(keyword, None)
+            for inner in self.implied.get(keyword, ()):
+                found.setdefault(inner, None)
+        return [self.keywords[keyword] for keyword in found]
+
+    def match_many(self, texts):
+        return [self.match(text) for text in texts]
@@ -0,0 +1,334 @@
+"""
+Metrici pentru fiecare etapa a scraping-ului, agregate pe domeniu si pe rulare.
+
+Etape (secunde): connect (DNS + TCP + TLS la o conexiune noua), ttfb (pana la
+header-ele raspunsului), download, parse, select, db_write. Contoare: requests,
+bytes, http_responses{status}, errors, cache_hits{kind}, cache_misses, relearned.
+
+    with metrics.run('scrape_all', storage):     # rularea se salveaza in scrape_runs
+        with metrics.current().timer('parse', 'emag.ro'):
+            ...
+        executor.submit(metrics.bind(scrape_site), ...)   # thread-urile scriu tot in rulare
+
+Rularea activa tine de context (thread sau task asyncio), deci doua rulari
+simultane in acelasi proces nu isi amesteca metricile.
+
+    python metrics.py --db prices.db                 # ultimele rulari
+    python metrics.py --db prices.db --format prometheus --run 12
+"""
+import argparse
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from storage import get_storage
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGES = ('connect', 'ttfb', 'download', 'parse', 'select', 'db_write')
+
+
+class StageStats:
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': round(self.total, 6),
+            'avg': round(self.total / self.count, 6) if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'buckets': list(self.buckets),
+        }
+
+
+class Metrics:
+    """Colectorul unei rulari (sau al procesului); sigur de folosit din mai multe thread-uri"""
+    def __init__(self, kind='process'):
+        self.kind = kind
+        self.started = datetime.now()
+        self.finished = None
+        self.lock = threading.Lock()
+        self.stages = defaultdict(StageStats)   # (etapa, domeniu) -> StageStats
+        self.counters = defaultdict(int)        # (nume, domeniu, etichete) -> valoare
+
+    def __getstate__(self):
+        # Metricile unui proces din pool ajung in procesul principal serializate, fara lock
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds, domain=''):
+        with self.lock:
+            self.stages[(stage, domain or '')].add(seconds)
+
+    def incr(self, name, domain='', amount=1, **labels):
+        key = (name, domain or '', tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += amount
+
+    @contextmanager
+    def timer(self, stage, domain=''):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, domain)
+
+    def merge(self, other):
+        with other.lock:
+            stages = list(other.stages.items())
+            counters = list(other.counters.items())
+        with self.lock:
+            for key, stats in stages:
+                self.stages[key].merge(stats)
+            for key, value in counters:
+                self.counters[key] += value
+
+    def counter(self, name, domain=None):
+        """Suma unui contor, pe un domeniu sau pe toate"""
+        with self.lock:
+            return sum(value for (counter_name, counter_domain, _), value in self.counters.items()
+                       if counter_name == name and (domain is None or counter_domain == domain))
+
+    def snapshot(self):
+        """Toate metricile ca dict serializabil JSON, grupate pe domeniu"""
+        domains = defaultdict(lambda: {'stages': {}, 'counters': {}})
+        with self.lock:
+            for (stage, domain), stats in self.stages.items():
+                domains[domain]['stages'][stage] = stats.as_dict()
+            for (name, domain, labels), value in self.counters.items():
+                if labels:
+                    name += '{' + ','.join(f'{k}={v}' for k, v in labels) + '}'
+                domains[domain]['counters'][name] = value
+        finished = self.finished or datetime.now()
+        return {
+            'kind': self.kind,
+            'started': self.started.isoformat(),
+            'finished': finished.isoformat(),
+            'duration': round((finished - self.started).total_seconds(), 3),
+            'domains': dict(domains),
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix='scraper'):
+        """Formatul text Prometheus: histograme pe etape si contoare, cu eticheta domain"""
+        lines = [
+            f'# HELP {prefix}_stage_seconds Durata fiecarei etape de scraping',
+            f'# TYPE {prefix}_stage_seconds histogram',
+        ]
+        with self.lock:
+            stages = sorted(self.stages.items())
+            counters = sorted(self.counters.items())
+
+        for (stage, domain), stats in stages:
+            labels = f'stage="{stage}",domain="{_escape(domain)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{{labels}}} {stats.total:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{{labels}}} {stats.count}')
+
+        declared = set()
+        for (name, domain, extra), value in counters:
+            metric = f'{prefix}_{name}_total'
+            if metric not in declared:
+                lines.append(f'# TYPE {metric} counter')
+                declared.add(metric)
+            labels = ','.join([f'domain="{_escape(domain)}"'] + [f'{k}="{_escape(v)}"' for k, v in extra])
+            lines.append(f'{metric}{{{labels}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# --- colectorul curent ---
+
+_process_metrics = Metrics()
+_active_run = contextvars.ContextVar('metrics_active_run', default=None)
+
+
+def current():
+    """Colectorul in care scriu toate componentele: rularea activa sau, fara ea, procesul"""
+    return _active_run.get() or _process_metrics
+
+
+def bind(fn):
+    """
+    fn legata de rularea activa acum. Thread-urile din pool (si run_in_executor)
+    nu mostenesc contextul, deci functiile trimise lor se leaga la submit.
+    """
+    collector = _active_run.get()
+
+    def bound(*args, **kwargs):
+        token = _active_run.set(collector)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _active_run.reset(token)
+    return bound
+
+
+def process_metrics():
+    """Metricile cumulate ale procesului, inclusiv rularile terminate"""
+    return _process_metrics
+
+
+@contextmanager
+def run(kind, storage=None):
+    """
+    Colecteaza separat metricile unei rulari (scrape_all, bulk_import, ...).
+    La final rularea se adauga la metricile procesului si, daca e dat un
+    storage, se salveaza in tabela scrape_runs.
+    """
+    metrics = Metrics(kind)
+    previous = _active_run.get()
+    token = _active_run.set(metrics)
+    try:
+        yield metrics
+    finally:
+        metrics.finished = datetime.now()
+        _active_run.reset(token)
+        # O rulare imbricata ajunge in proces odata cu rularea care o contine
+        (previous or _process_metrics).merge(metrics)
+        if storage is not None:
+            save_run(storage, metrics)
+
+
+def save_run(storage, metrics):
+    snapshot = metrics.snapshot()
+    storage.execute('''
+        INSERT INTO scrape_runs (kind, started, finished, duration, requests, errors, bytes, cache_hits, metrics)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        metrics.kind, snapshot['started'], snapshot['finished'], snapshot['duration'],
+        metrics.counter('requests'), metrics.counter('errors'), metrics.counter('bytes'),
+        metrics.counter('cache_hits'), json.dumps(snapshot['domains'], sort_keys=True)
+    ))
+
+
+def load_run(storage, run_id=None):
+    """O rulare salvata, reconstruita ca Metrics (ultima daca run_id lipseste)"""
+    row = storage.query_one(f'''
+        SELECT kind, started, finished, metrics FROM scrape_runs
+        {'WHERE id = ?' if run_id else ''} ORDER BY id DESC LIMIT 1
+    ''', (run_id,) if run_id else ())
+    if not row:
+        return None
+
+    kind, started, finished, data = row
+    metrics = Metrics(kind)
+    metrics.started = datetime.fromisoformat(started)
+    metrics.finished = datetime.fromisoformat(finished) if finished else None
+    for domain, values in json.loads(data or '{}').items():
+        for stage, stats in values.get('stages', {}).items():
+            restored = metrics.stages[(stage, domain)]
+            restored.count, restored.total = stats['count'], stats['total']
+            restored.min, restored.max = stats['min'], stats['max']
+            restored.buckets = list(stats.get('buckets') or restored.buckets)
+        for name, value in values.get('counters', {}).items():
+            labels = ()
+            if '{' in name:
+                name, raw = name[:-1].split('{', 1)
+                labels = tuple(tuple(pair.split('=', 1)) for pair in raw.split(','))
+            metrics.counters[(name, domain, labels)] = value
+    return metrics
+
+
+def print_summary(metrics):
+    """Tabel pe domeniu cu timpii medii pe etapa, ca sa se vada unde se pierde timpul"""
+    snapshot = metrics.snapshot()
+    print(f"\n Metrici {snapshot['kind']} ({snapshot['duration']:.1f}s):")
+    print("-" * 100)
+    print(f"{'Domeniu':<24} | {'Req':>5} | {'Err':>4} | {'Cache':>5} | "
+          + ' | '.join(f'{stage[:8]:>8}' for stage in STAGES))
+    print("-" * 100)
+    for domain in sorted(snapshot['domains'], key=lambda d: (d == '', d)):
+        values = snapshot['domains'][domain]
+        counters = values['counters']
+        errors = sum(v for k, v in counters.items() if k.split('{')[0] == 'errors')
+        cache_hits = sum(v for k, v in counters.items() if k.split('{')[0] == 'cache_hits')
+        averages = []
+        for stage in STAGES:
+            stats = values['stages'].get(stage)
+            averages.append(f"{stats['avg'] * 1000:6.1f}ms" if stats and stats['avg'] is not None else f"{'-':>8}")
+        print(f"{(domain or '(local)')[:24]:<24} | {counters.get('requests', 0):5d} | "
+              f"{errors:4d} | {cache_hits:5d} | " + ' | '.join(averages))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='prices.db')
+    parser.add_argument('--run', type=int, help='id-ul rularii (implicit ultima)')
+    parser.add_argument('--format', choices=['table', 'json', 'prometheus'], default='table')
+    parser.add_argument('--last', type=int, default=10, help='cate rulari se listeaza')
+    args = parser.parse_args(argv)
+
+    storage = get_storage(args.db)
+    if not storage.query_one("SELECT 1 FROM sqlite_master WHERE name = 'scrape_runs'"):
+        print("Nu exista rulari salvate")
+        return
+
+    if args.format == 'table' and not args.run:
+        print(f"{'Id':>5} | {'Tip':<14} | {'Pornita':<19} | {'Durata':>8} | {'Req':>6} | {'Err':>5} | {'Cache':>6} | {'MB':>7}")
+        print("-" * 90)
+        for run_id, kind, started, duration, requests, errors, size, cache_hits in storage.query('''
+            SELECT id, kind, started, duration, requests, errors, bytes, cache_hits
+            FROM scrape_runs ORDER BY id DESC LIMIT ?
+        ''', (args.last,)):
+            print(f"{run_id:5d} | {kind:<14} | {started[:19]:<19} | {duration:7.1f}s | {requests:6d} | "
+                  f"{errors:5d} | {cache_hits:6d} | {size / 1e6:7.2f}")
+        return
+
+    metrics = load_run(storage, args.run)
+    if metrics is None:
+        print("Nu exista rulari salvate")
+    elif args.format == 'json':
+        print(metrics.to_json())
+    elif args.format == 'prometheus':
+        print(metrics.to_prometheus(), end='')
+    else:
+        print_summary(metrics)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+"""
+Migrari de schema versionate pentru prices.db, scraper_data.db, cache-ul HTTP
+(prices_http_cache.db) si coada de joburi tinuta intr-un fisier separat.
+
+Versiunea curenta a fiecarei baze de date e tinuta in PRAGMA user_version.
+O migrare noua se adauga la finalul listei cu numarul urmator; migrarile
+existente nu se modifica, ca bazele de date vechi sa fie aduse la zi pas cu pas.
+"""
+
+
+def migrate(storage, migrations):
+    """Aplica migrarile mai noi decat user_version, fiecare in tranzactia ei"""
+    conn = storage.connection()
+    applied = []
+
+    for version, description, apply in migrations:
+        if version <= conn.execute('PRAGMA user_version').fetchone()[0]:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Alt proces poate sa fi aplicat migrarea intre timp
+            if version <= conn.execute('PRAGMA user_version').fetchone()[0]:
+                conn.rollback()
+                continue
+            apply(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+
+    for version, description in applied:
+        print(f"Migrare {storage.db_name} -> v{version}: {description}")
+    return applied
+
+
+def schema_version(storage):
+    return storage.query_one('PRAGMA user_version')[0]
+
+
+def _scrape_runs_table(cursor):
+    # O rulare (scrape_all, bulk_import, forum_crawl...) cu totalurile ei;
+    # metricile pe domeniu si etapa sunt in coloana metrics, ca JSON
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scrape_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            started TEXT NOT NULL,
+            finished TEXT,
+            duration REAL,
+            requests INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            bytes INTEGER DEFAULT 0,
+            cache_hits INTEGER DEFAULT 0,
+            metrics TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scrape_runs_kind_started ON scrape_runs (kind, started)')
+
+
+# --- prices.db ---
+
+def _prices_v1_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL,
+            selector TEXT NOT NULL,
+            site_name TEXT NOT NULL,
+            auto_detected INTEGER DEFAULT 1
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            price REAL,
+            date_scraped TEXT,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+
+
+def _prices_v2_indexes(cursor):
+    # Produsele duplicate (acelasi URL) se unesc in cel mai vechi rand
+    cursor.execute('SELECT url, MIN(id) FROM products GROUP BY url HAVING COUNT(*) > 1')
+    for url, keep_id in cursor.fetchall():
+        cursor.execute('''
+            UPDATE prices SET product_id = ?
+            WHERE product_id IN (SELECT id FROM products WHERE url = ? AND id != ?)
+        ''', (keep_id, url, keep_id))
+        cursor.execute('DELETE FROM products WHERE url = ? AND id != ?', (url, keep_id))
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_products_url ON products (url)')
+
+    # Acopera istoricul, comparatia si listarea: cautare pe produs, ordonare pe data, pretul inclus
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_prices_product_date
+        ON prices (product_id, date_scraped, price)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prices_date ON prices (date_scraped)')
+    cursor.execute('ANALYZE')
+
+
+def _prices_v3_schedule(cursor):
+    # Intervalul de reimprospatare e adaptiv (secunde); next_due e data urmatorului scrape
+    cursor.execute('ALTER TABLE products ADD COLUMN refresh_interval INTEGER DEFAULT 21600')
+    cursor.execute('ALTER TABLE products ADD COLUMN next_due TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_products_next_due ON products (next_due)')
+
+
+def _prices_v4_runs(cursor):
+    # Un rand din prices devine o serie de observari cu acelasi pret:
+    # date_scraped = prima observare, last_seen = ultima, samples = cate observari
+    cursor.execute('ALTER TABLE prices ADD COLUMN last_seen TEXT')
+    cursor.execute('ALTER TABLE prices ADD COLUMN samples INTEGER NOT NULL DEFAULT 1')
+    cursor.execute('UPDATE prices SET last_seen = date_scraped')
+
+    # Observarile consecutive cu acelasi pret se comaseaza in primul rand al seriei
+    runs, obsolete = [], []
+    current = None
+    for row_id, product_id, price, date_scraped in cursor.connection.execute('''
+        SELECT id, product_id, price, date_scraped FROM prices
+        ORDER BY product_id, date_scraped, id
+    '''):
+        if current and current[1] == product_id and current[2] == price:
+            current[3] = date_scraped
+            current[4] += 1
+            obsolete.append((row_id,))
+            continue
+        if current and current[4] > 1:
+            runs.append((current[3], current[4], current[0]))
+        current = [row_id, product_id, price, date_scraped, 1]
+    if current and current[4] > 1:
+        runs.append((current[3], current[4], current[0]))
+
+    cursor.executemany('UPDATE prices SET last_seen = ?, samples = ? WHERE id = ?', runs)
+    cursor.executemany('DELETE FROM prices WHERE id = ?', obsolete)
+
+    # Indexul de acoperire include acum si coloanele seriei
+    cursor.execute('DROP INDEX IF EXISTS idx_prices_product_date')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_prices_product_date
+        ON prices (product_id, date_scraped, price, last_seen, samples)
+    ''')
+    cursor.execute('ANALYZE')
+
+
+def _prices_v5_canonical(cursor):
+    from product_matching import ProductMatcher, cluster_products
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS canonical_products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            gtin TEXT UNIQUE,
+            storage_gb INTEGER
+        )
+    ''')
+    # Indexul inversat token -> produs canonic, pentru cautarea din compare_prices
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS canonical_tokens (
+            token TEXT NOT NULL,
+            canonical_id INTEGER NOT NULL,
+            PRIMARY KEY (token, canonical_id),
+            FOREIGN KEY (canonical_id) REFERENCES canonical_products (id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('ALTER TABLE products ADD COLUMN canonical_id INTEGER REFERENCES canonical_products (id)')
+    cursor.execute('ALTER TABLE products ADD COLUMN gtin TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_products_canonical ON products (canonical_id, site_name)')
+
+    # Produsele existente se grupeaza dupa titlu (GTIN-ul apare doar la produsele noi)
+    cluster_products(cursor, ProductMatcher())
+
+
+def _prices_v7_summary(cursor):
+    import price_summary
+
+    # Rezumatul per produs, actualizat de insert_prices; aici se calculeaza o data din istoric
+    price_summary.create_table(cursor)
+    price_summary.rebuild(cursor)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_product_summary_last_seen ON product_summary (last_seen)')
+
+
+def _prices_v8_watches(cursor):
+    import price_watch
+
+    price_watch.create_table(cursor)
+
+
+def _prices_v9_selector_misses(cursor):
+    # Ratarile consecutive ale selectorului salvat; abia dupa cateva se inlocuieste
+    cursor.execute('ALTER TABLE products ADD COLUMN selector_misses INTEGER NOT NULL DEFAULT 0')
+
+
+def _prices_v10_watch_state(cursor):
+    import price_watch
+
+    price_watch.create_state_table(cursor)
+    # Ultima alerta a regulilor below/drop devine starea produsului respectiv
+    cursor.execute('''
+        INSERT OR IGNORE INTO price_watch_state (watch_id, product_id, last_price, last_triggered)
+        SELECT id, last_product_id, last_price, last_triggered FROM price_watches
+        WHERE kind != 'cheapest' AND last_product_id IS NOT NULL
+    ''')
+
+
+def _prices_v11_selector_registry(cursor):
+    import selector_registry
+
+    # Bazele mai vechi au deja tabela, creata de SelectorRegistry inainte de migrari
+    selector_registry.create_table(cursor)
+
+
+def _prices_v12_scrape_jobs(cursor):
+    import job_queue
+
+    # Coada comuna a workerilor (backend-ul 'sqlite'); bazele in care un worker a
+    # pornit deja au tabela, creata de SQLiteJobQueue inainte de migrari
+    job_queue.create_table(cursor)
+
+
+PRICE_MIGRATIONS = [
+    (1, 'tabelele products si prices', _prices_v1_tables),
+    (2, 'indecsi pe prices si URL unic pe products', _prices_v2_indexes),
+    (3, 'interval de reimprospatare per produs', _prices_v3_schedule),
+    (4, 'istoric comprimat: un rand per serie de preturi egale', _prices_v4_runs),
+    (5, 'produse canonice comune intre site-uri', _prices_v5_canonical),
+    (6, 'tabela scrape_runs cu metricile fiecarei rulari', _scrape_runs_table),
+    (7, 'rezumat per produs: ultimul pret, min, max, medie', _prices_v7_summary),
+    (8, 'reguli de urmarire a preturilor', _prices_v8_watches),
+    (9, 'ratari consecutive ale selectorului de pret', _prices_v9_selector_misses),
+    (10, 'ultimul pret anuntat pe regula si produs', _prices_v10_watch_state),
+    (11, 'selectorii de pret invatati pe fiecare site', _prices_v11_selector_registry),
+    (12, 'coada de joburi scrape_jobs', _prices_v12_scrape_jobs),
+]
+
+
+# --- scraper_data.db ---
+
+def _forums_v1_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS phone_forums (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL,
+            keywords TEXT,
+            last_check TEXT,
+            active INTEGER DEFAULT 1
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS phone_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            forum_id INTEGER,
+            title TEXT,
+            author TEXT,
+            content TEXT,
+            post_date TEXT,
+            keywords_found TEXT,
+            scraped_date TEXT,
+            FOREIGN KEY (forum_id) REFERENCES phone_forums (id)
+        )
+    ''')
+
+
+def _forums_v2_indexes(cursor):
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_phone_posts_forum_date
+        ON phone_posts (forum_id, post_date)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_phone_posts_date ON phone_posts (post_date)')
+    cursor.execute('ANALYZE')
+
+
+def fts5_available(cursor):
+    try:
+        cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+        cursor.execute('DROP TABLE temp.fts5_probe')
+        return True
+    except Exception:
+        return False
+
+
+def _forums_v3_fulltext(cursor):
+    # SQLite compilat fara FTS5: cautarea ramane pe LIKE
+    if not fts5_available(cursor):
+        return
+
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS phone_posts_fts USING fts5(
+            title, content, keywords_found,
+            content='phone_posts', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+
+    # Indexul full-text e tinut sincron de triggere, indiferent de cine scrie in phone_posts
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS phone_posts_fts_insert AFTER INSERT ON phone_posts BEGIN
+            INSERT INTO phone_posts_fts (rowid, title, content, keywords_found)
+            VALUES (new.id, new.title, new.content, new.keywords_found);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS phone_posts_fts_delete AFTER DELETE ON phone_posts BEGIN
+            INSERT INTO phone_posts_fts (phone_posts_fts, rowid, title, content, keywords_found)
+            VALUES ('delete', old.id, old.title, old.content, old.keywords_found);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS phone_posts_fts_update AFTER UPDATE ON phone_posts BEGIN
+            INSERT INTO phone_posts_fts (phone_posts_fts, rowid, title, content, keywords_found)
+            VALUES ('delete', old.id, old.title, old.content, old.keywords_found);
+            INSERT INTO phone_posts_fts (rowid, title, content, keywords_found)
+            VALUES (new.id, new.title, new.content, new.keywords_found);
+        END
+    ''')
+
+    cursor.execute("INSERT INTO phone_posts_fts (phone_posts_fts) VALUES ('rebuild')")
+
+
+def _forums_v4_incremental(cursor):
+    from forumuri_scraper import post_hash
+
+    # Marcajul "high-water" al fiecarui forum, pe langa last_check
+    cursor.execute('ALTER TABLE phone_forums ADD COLUMN last_post_date TEXT')
+    cursor.execute('ALTER TABLE phone_forums ADD COLUMN last_post_hash TEXT')
+    cursor.execute('ALTER TABLE phone_forums ADD COLUMN last_page_url TEXT')
+
+    cursor.execute('SELECT name, MIN(id) FROM phone_forums GROUP BY name HAVING COUNT(*) > 1')
+    for name, keep_id in cursor.fetchall():
+        cursor.execute('''
+            UPDATE phone_posts SET forum_id = ?
+            WHERE forum_id IN (SELECT id FROM phone_forums WHERE name = ? AND id != ?)
+        ''', (keep_id, name, keep_id))
+        cursor.execute('DELETE FROM phone_forums WHERE name = ? AND id != ?', (name, keep_id))
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_phone_forums_name ON phone_forums (name)')
+
+    # Fiecare postare primeste un hash stabil; duplicatele existente se sterg
+    cursor.execute('ALTER TABLE phone_posts ADD COLUMN post_hash TEXT')
+    cursor.connection.create_function('post_hash', 3, post_hash, deterministic=True)
+    cursor.execute('UPDATE phone_posts SET post_hash = post_hash(title, author, content)')
+    cursor.execute('''
+        DELETE FROM phone_posts WHERE id NOT IN (
+            SELECT MIN(id) FROM phone_posts GROUP BY forum_id, post_hash
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_phone_posts_hash ON phone_posts (forum_id, post_hash)')
+    cursor.execute('''
+        UPDATE phone_forums SET last_post_date = (
+            SELECT MAX(post_date) FROM phone_posts WHERE forum_id = phone_forums.id
+        )
+    ''')
+
+
+def _forums_v5_post_keywords(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS keywords (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword TEXT NOT NULL UNIQUE COLLATE NOCASE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS post_keywords (
+            post_id INTEGER NOT NULL,
+            keyword_id INTEGER NOT NULL,
+            PRIMARY KEY (post_id, keyword_id),
+            FOREIGN KEY (post_id) REFERENCES phone_posts (id),
+            FOREIGN KEY (keyword_id) REFERENCES keywords (id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_post_keywords_keyword ON post_keywords (keyword_id, post_id)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS phone_posts_keywords_delete AFTER DELETE ON phone_posts BEGIN
+            DELETE FROM post_keywords WHERE post_id = old.id;
+        END
+    ''')
+
+    # Etichetele existente (CSV in keywords_found) trec in tabela normalizata
+    cursor.execute("SELECT id, keywords_found FROM phone_posts WHERE keywords_found IS NOT NULL AND keywords_found != ''")
+    links = []
+    for post_id, keywords_found in cursor.fetchall():
+        for keyword in keywords_found.split(','):
+            if keyword.strip():
+                links.append((post_id, keyword.strip()))
+    cursor.executemany('INSERT OR IGNORE INTO keywords (keyword) VALUES (?)', [(k,) for _, k in links])
+    cursor.executemany('''
+        INSERT OR IGNORE INTO post_keywords (post_id, keyword_id)
+        SELECT ?, id FROM keywords WHERE keyword = ?
+    ''', links)
+
+
+FORUM_MIGRATIONS = [
+    (1, 'tabelele phone_forums si phone_posts', _forums_v1_tables),
+    (2, 'indecsi pe phone_posts', _forums_v2_indexes),
+    (3, 'index full-text FTS5 pe phone_posts', _forums_v3_fulltext),
+    (4, 'crawl incremental: high-water mark pe forum si hash unic pe postari', _forums_v4_incremental),
+    (5, 'tabela normalizata post_keywords', _forums_v5_post_keywords),
+    (6, 'tabela scrape_runs cu metricile fiecarei rulari', _scrape_runs_table),
+]
+
+
+# --- *_http_cache.db ---
+
+def _cache_v1_tables(cursor):
+    # Cache-urile create inainte de migrari au deja tabela; IF NOT EXISTS le lasa neatinse
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash TEXT,
+            selector TEXT,
+            price REAL,
+            fetched_at TEXT,
+            last_used TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_http_cache_last_used ON http_cache (last_used)')
+
+
+CACHE_MIGRATIONS = [
+    (1, 'tabela http_cache cu index pe last_used', _cache_v1_tables),
+]
+
+
+# --- coada de joburi intr-un fisier separat (scrape_worker.py --queue sqlite:/date/jobs.db) ---
+
+def _queue_v1_tables(cursor):
+    import job_queue
+
+    job_queue.create_table(cursor)
+
+
+QUEUE_MIGRATIONS = [
+    (1, 'coada de joburi scrape_jobs', _queue_v1_tables),
+]
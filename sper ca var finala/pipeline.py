@@ -0,0 +1,248 @@
+"""
+Scrape in pipeline: descarcarea (I/O) si parsarea (CPU) sunt etape separate.
+
+    fetch asincron (limitat pe site)
+        -> coada limitata -> pool de procese: parsare + extragerea pretului
+        -> coada limitata -> un singur writer care scrie preturile pe loturi
+
+Parsarea si cascada de selectori ruleaza in procese separate, deci nu mai sunt
+serializate de GIL; cozile limitate franeaza descarcarea cand parsarea sau
+scrierea raman in urma. Cache-ul HTTP, pauza pe site si metricile sunt aceleasi
+ca la scrape_all_products.
+
+    python pipeline.py --db prices.db --parse-workers 16 --fetch-concurrency 64
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+import metrics
+from http_cache import body_hash
+from http_client import DomainRateLimiter
+from scraper_online import ScrapeResult, SmartPriceScraper
+
+
+# Extractorul fiecarui proces din pool: conexiune read-only, fara HTTP si fara scrieri
+_worker = None
+
+
+def _init_worker(db_name):
+    global _worker
+    _worker = SmartPriceScraper(db_name, use_cache=False, read_only=True)
+
+
+def parse_page(url, content, selector):
+    """
+    Ruleaza intr-un proces din pool: pretul cu selectorul salvat sau, daca acesta
+    nu mai gaseste nimic, detectia completa. Intoarce (ScrapeResult, metrici);
+    rezultatele pentru registry le scrie _write, in procesul principal.
+    """
+    with metrics.run('parse') as job_metrics:
+        result = _worker.extract_result(url, content, selector)
+    return result, job_metrics
+
+
+class ScrapePipeline:
+    """
+    Descarcarile ruleaza din asyncio pe un pool de thread-uri (clientul HTTP
+    comun, cu pool de conexiuni si retry), cate per_site simultan pe acelasi
+    site. Paginile merg la parse_workers procese; rezultatele ajung la un
+    singur thread de scriere, care le grupeaza in tranzactii de batch_size.
+    """
+    def __init__(self, scraper, parse_workers=None, fetch_concurrency=32, per_site=2, delay=3,
+                 queue_size=None, batch_size=200):
+        self.scraper = scraper
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.fetch_concurrency = fetch_concurrency
+        self.per_site = per_site
+        self.limiter = DomainRateLimiter(delay)
+        # Destul cat procesele sa nu astepte dupa retea, fara sa tina toate paginile in memorie
+        self.queue_size = queue_size or self.parse_workers * 4
+        self.batch_size = batch_size
+
+    def run(self, products=None):
+        """Scrapeaza produsele date (implicit toate); rularea se salveaza in scrape_runs"""
+        if products is None:
+            products = self.scraper.storage.query('SELECT id, name, url, selector, site_name FROM products')
+        summary = {'products': len(products), 'prices': 0, 'unchanged': 0, 'relearned': 0,
+                   'failed': 0, 'failed_urls': []}
+        if not products:
+            print("Nu exista produse de monitorizat!")
+            return summary
+
+        start = time.perf_counter()
+        self.scraper.load_latest_prices()
+        with metrics.run('pipeline', self.scraper.storage) as run_metrics:
+            asyncio.run(self._run(products, summary, run_metrics))
+        if self.scraper.cache:
+            self.scraper.cache.evict()
+        summary['elapsed'] = time.perf_counter() - start
+        summary['metrics'] = run_metrics
+        return summary
+
+    async def _run(self, products, summary, run_metrics):
+        loop = asyncio.get_running_loop()
+        fetched = asyncio.Queue(maxsize=self.queue_size)
+        results = asyncio.Queue(maxsize=self.queue_size)
+
+        by_site = defaultdict(list)
+        for product in products:
+            by_site[self.scraper.detect_site_name(product[2])].append(product)
+        lanes = [(site_key, site_products[lane::self.per_site])
+                 for site_key, site_products in by_site.items()
+                 for lane in range(self.per_site) if site_products[lane::self.per_site]]
+        print(f"Pipeline: {len(products)} produse de pe {len(by_site)} site-uri, "
+              f"{self.parse_workers} procese de parsare")
+
+        # Thread-urile din pool nu mostenesc contextul; descarcarile si scrierea raman in rularea pipeline
+        fetch_page = metrics.bind(self.scraper.fetch_page)
+        write_batch = metrics.bind(self._write)
+        io_pool = ThreadPoolExecutor(max_workers=self.fetch_concurrency)
+        write_pool = ThreadPoolExecutor(max_workers=1)
+        # spawn: procesele nu mostenesc conexiunile SQLite deschise in procesul principal
+        parse_pool = ProcessPoolExecutor(
+            max_workers=self.parse_workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(self.scraper.db_name,)
+        )
+
+        async def fetch_lane(site_key, lane_products):
+            for product in lane_products:
+                await asyncio.sleep(self.limiter.reserve(site_key))
+                try:
+                    cached_price, response = await loop.run_in_executor(
+                        io_pool, fetch_page, product[2], product[3]
+                    )
+                except Exception as e:
+                    print(f"Eroare la scraping {product[2]}: {e}")
+                    await results.put((product, ScrapeResult(None, False, False, product[3], []), None))
+                    continue
+                if response is None:
+                    await results.put((product, ScrapeResult(cached_price, True, False, product[3], []), None))
+                else:
+                    await fetched.put((product, site_key, response))
+
+        async def produce():
+            await asyncio.gather(*(fetch_lane(site_key, lane) for site_key, lane in lanes))
+            for _ in parsers:
+                await fetched.put(None)
+
+        async def parse():
+            nonlocal remaining
+            while True:
+                job = await fetched.get()
+                if job is None:
+                    break
+                product, site_key, response = job
+                result = ScrapeResult(None, False, False, product[3], [])
+                try:
+                    result, job_metrics = await loop.run_in_executor(
+                        parse_pool, parse_page, product[2], response.content, product[3]
+                    )
+                    run_metrics.merge(job_metrics)
+                except Exception as e:
+                    run_metrics.incr('errors', urlparse(product[2]).hostname, stage='parse')
+                    print(f"Eroare la parsarea {product[2]}: {e}")
+                await results.put((product, result, response))
+            remaining -= 1
+            if not remaining:
+                await results.put(None)
+
+        async def write():
+            batch = []
+            done = 0
+            while True:
+                item = await results.get()
+                if item is not None:
+                    batch.append(item)
+                    done += 1
+                    if done % 100 == 0:
+                        print(f"  {done}/{len(products)} procesate...")
+                if batch and (item is None or len(batch) >= self.batch_size):
+                    await loop.run_in_executor(write_pool, write_batch, batch, summary)
+                    batch = []
+                if item is None:
+                    break
+
+        # Un proces e tinut ocupat cat timp rezultatul precedent se intoarce
+        parsers = [asyncio.create_task(parse()) for _ in range(self.parse_workers * 2)]
+        remaining = len(parsers)
+        tasks = [asyncio.create_task(produce()), asyncio.create_task(write())] + parsers
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            io_pool.shutdown(cancel_futures=True)
+            parse_pool.shutdown(cancel_futures=True)
+            write_pool.shutdown()
+
+    def _write(self, batch, summary):
+        """
+        Singurul loc din pipeline care scrie in baza de date (thread-ul write_pool):
+        preturile lotului si ce au aflat procesele despre selectori, intr-o tranzactie
+        """
+        now = datetime.now().isoformat()
+        rows = []
+        for product, result, response in batch:
+            product_id, name, url, selector, site_name = product
+            if not result.price:
+                summary['failed'] += 1
+                summary['failed_urls'].append(url)
+                continue
+            if result.unchanged:
+                summary['unchanged'] += 1
+            elif self.scraper.cache:
+                self.scraper.cache.store(url, response, body_hash(response.content), result.selector, result.price)
+            rows.append((product_id, result.price, now))
+
+        with metrics.current().timer('db_write'), self.scraper.price_transaction() as cursor:
+            self.scraper.insert_prices(cursor, rows)
+            for product, result, response in batch:
+                if result.missed or result.price:
+                    summary['relearned'] += bool(self.scraper.record_selector(cursor, product[0], product[3], result))
+        summary['prices'] += len(rows)
+
+
+def print_summary(summary):
+    print("\nRezumat pipeline:")
+    print("-" * 40)
+    print(f"Produse:              {summary['products']}")
+    print(f"Preturi scrise:       {summary['prices']}")
+    print(f"Neschimbate (cache):  {summary['unchanged']}")
+    print(f"Selectori reinvatati: {summary['relearned']}")
+    print(f"Esuate:               {summary['failed']}")
+    if 'elapsed' in summary:
+        print(f"Durata:               {summary['elapsed']:.1f}s")
+    for url in summary['failed_urls'][:20]:
+        print(f"  - {url}")
+    if len(summary['failed_urls']) > 20:
+        print(f"  ... si inca {len(summary['failed_urls']) - 20}")
+    if summary.get('metrics'):
+        metrics.print_summary(summary['metrics'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='prices.db')
+    parser.add_argument('--parse-workers', type=int, help='procese de parsare (implicit numarul de core-uri)')
+    parser.add_argument('--fetch-concurrency', type=int, default=32, help='descarcari simultane in total')
+    parser.add_argument('--per-site', type=int, default=2, help='descarcari simultane pe acelasi site')
+    parser.add_argument('--delay', type=float, default=3, help='pauza minima intre request-uri pe acelasi site')
+    parser.add_argument('--queue-size', type=int, help='pagini tinute in asteptare intre etape')
+    parser.add_argument('--batch', type=int, default=200, help='preturi per tranzactie')
+    args = parser.parse_args(argv)
+
+    scraper = SmartPriceScraper(args.db)
+    pipeline = ScrapePipeline(scraper, args.parse_workers, args.fetch_concurrency, args.per_site,
+                              args.delay, args.queue_size, args.batch)
+    print_summary(pipeline.run())
+
+
+if __name__ == '__main__':
+    main()
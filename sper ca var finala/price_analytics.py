@@ -0,0 +1,502 @@
+"""
+Export columnar al istoricului de preturi si analize vectorizate peste el.
+
+    python price_analytics.py export --db prices.db --out export/
+    python price_analytics.py report export/ --window 7 --site eMAG --site Altex
+
+Exportul citeste in flux join-ul prices/products si scrie cate un fisier pe
+partitie luna/site (export/month=2024-05/site=eMAG/part-0.parquet). Cu pyarrow
+instalat fisierele sunt Parquet, altfel CSV comprimat cu gzip. Analizele
+folosesc numpy cand e instalat si o varianta in Python pur altfel; rapoartele
+citesc doar fisierele exportate, fara sa atinga baza de date.
+
+Un rand exportat e o serie de preturi egale (vezi migrarea v4 din prices.db),
+asezata in luna in care a inceput seria. Cu --since se rescriu complet doar
+partitiile care au serii vazute de la acea luna incoace, inclusiv seriile
+incepute mai demult si prelungite intre timp.
+"""
+import argparse
+import csv
+import gzip
+import os
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from urllib.parse import quote, unquote
+
+from storage import get_storage
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:
+    np = None
+
+
+COLUMNS = ['product_id', 'canonical_id', 'product_name', 'site_name', 'price', 'first_seen', 'last_seen', 'samples']
+INT_COLUMNS = {'product_id', 'samples'}
+# Listarile negrupate inca (vezi product_matching.py) nu au produs canonic
+NULLABLE_INT_COLUMNS = {'canonical_id'}
+FLOAT_COLUMNS = {'price'}
+
+if pa is not None:
+    SCHEMA = pa.schema([
+        ('product_id', pa.int64()),
+        ('canonical_id', pa.int64()),
+        ('product_name', pa.string()),
+        ('site_name', pa.string()),
+        ('price', pa.float64()),
+        ('first_seen', pa.string()),
+        ('last_seen', pa.string()),
+        ('samples', pa.int64()),
+    ])
+else:
+    SCHEMA = None
+
+
+# --- export ---
+
+def default_format():
+    return 'parquet' if pq is not None else 'csv'
+
+
+def partition_dir(out_dir, month, site_name):
+    # Numele site-ului poate contine spatii sau '/', deci se codeaza ca in URL
+    return os.path.join(out_dir, f'month={month}', f'site={quote(site_name, safe="")}')
+
+
+class PartitionWriter:
+    """Scrie o partitie pe bucati: row group-uri Parquet sau randuri CSV gzip"""
+    def __init__(self, directory, fmt):
+        os.makedirs(directory, exist_ok=True)
+        # Exportul rescrie partitia complet, inclusiv daca s-a schimbat formatul
+        for name in os.listdir(directory):
+            if name.startswith('part-'):
+                os.remove(os.path.join(directory, name))
+
+        self.fmt = fmt
+        if fmt == 'parquet':
+            self.path = os.path.join(directory, 'part-0.parquet')
+            self.writer = pq.ParquetWriter(self.path, SCHEMA, compression='zstd')
+        else:
+            self.path = os.path.join(directory, 'part-0.csv.gz')
+            self.file = gzip.open(self.path, 'wt', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        if self.fmt == 'parquet':
+            columns = list(zip(*rows))
+            self.writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, SCHEMA)],
+                schema=SCHEMA
+            ))
+        else:
+            self.writer.writerows(rows)
+
+    def close(self):
+        if self.fmt == 'parquet':
+            self.writer.close()
+        else:
+            self.file.close()
+
+
+def export_history(db_name, out_dir, fmt=None, since=None, chunk_size=50000):
+    """
+    Exporta istoricul in out_dir, partitionat pe luna si site.
+    Interogarea e ordonata pe partitie, deci e deschis un singur fisier odata.
+
+    Cu since se exporta doar partitiile atinse de la inceputul lunii lui since:
+    cele cu serii vazute (last_seen) de atunci, rescrise cu toate seriile lor,
+    pentru ca PartitionWriter inlocuieste fisierele partitiei.
+    """
+    fmt = fmt or default_format()
+    if fmt == 'parquet' and pq is None:
+        raise RuntimeError("Exportul Parquet necesita pyarrow (pip install pyarrow)")
+
+    where, params = '', ()
+    if since:
+        where = '''
+            WHERE (substr(pr.date_scraped, 1, 7), p.site_name) IN (
+                SELECT DISTINCT substr(t.date_scraped, 1, 7), tp.site_name
+                FROM prices t
+                JOIN products tp ON tp.id = t.product_id
+                WHERE COALESCE(t.last_seen, t.date_scraped) >= ?
+            )
+        '''
+        params = (since[:7] + '-01',)
+
+    storage = get_storage(db_name)
+    summary = {'rows': 0, 'partitions': 0, 'format': fmt}
+    writer = None
+    current = None
+
+    try:
+        for chunk in storage.iterate(f'''
+            SELECT substr(pr.date_scraped, 1, 7) AS month, p.site_name,
+                   pr.product_id, p.canonical_id, p.name, p.site_name, pr.price,
+                   pr.date_scraped, COALESCE(pr.last_seen, pr.date_scraped), pr.samples
+            FROM prices pr
+            JOIN products p ON p.id = pr.product_id
+            {where}
+            ORDER BY month, p.site_name, pr.product_id, pr.date_scraped
+        ''', params, chunk_size):
+            pending = []
+            for row in chunk:
+                if row[:2] != current:
+                    if pending:
+                        writer.write(pending)
+                        pending = []
+                    if writer:
+                        writer.close()
+                    current = row[:2]
+                    writer = PartitionWriter(partition_dir(out_dir, *current), fmt)
+                    summary['partitions'] += 1
+                pending.append(row[2:])
+            if pending:
+                writer.write(pending)
+            summary['rows'] += len(chunk)
+    finally:
+        if writer:
+            writer.close()
+
+    return summary
+
+
+# --- citire ---
+
+def partition_files(directory, sites=None, until=None):
+    """Fisierele exportate, sarind peste partitiile excluse de filtre"""
+    for month_dir in sorted(os.listdir(directory)):
+        if not month_dir.startswith('month='):
+            continue
+        # Seriile sunt asezate in luna in care incep: o luna de dinainte de `since`
+        # poate acoperi zile de dupa, deci se poate sari doar peste lunile de dupa `until`
+        if until and month_dir[len('month='):] > until[:7]:
+            continue
+        month_path = os.path.join(directory, month_dir)
+        for site_dir in sorted(os.listdir(month_path)):
+            if not site_dir.startswith('site='):
+                continue
+            if sites and unquote(site_dir[len('site='):]) not in sites:
+                continue
+            site_path = os.path.join(month_path, site_dir)
+            for name in sorted(os.listdir(site_path)):
+                if name.startswith('part-'):
+                    yield os.path.join(site_path, name)
+
+
+def read_partition(path):
+    """
+    Coloanele unui fisier exportat, ca dict nume -> lista de valori. Coloanele
+    lipsa din exporturile mai vechi (canonical_id) se completeaza cu None.
+    """
+    if path.endswith('.parquet'):
+        if pq is None:
+            raise RuntimeError(f"{path} e Parquet; citirea necesita pyarrow")
+        present = set(pq.read_schema(path).names)
+        columns = pq.read_table(path, columns=[name for name in COLUMNS if name in present]).to_pydict()
+    else:
+        columns = {}
+        with gzip.open(path, 'rt', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, COLUMNS)
+            for name in header:
+                columns[name] = []
+            for row in reader:
+                for name, value in zip(header, row):
+                    if name in INT_COLUMNS:
+                        value = int(value)
+                    elif name in NULLABLE_INT_COLUMNS:
+                        value = int(value) if value else None
+                    elif name in FLOAT_COLUMNS:
+                        value = float(value)
+                    columns[name].append(value)
+
+    rows = len(next(iter(columns.values()), []))
+    for name in COLUMNS:
+        columns.setdefault(name, [None] * rows)
+    return columns
+
+
+def load_history(directory, sites=None, until=None):
+    """Toate seriile exportate, coloana cu coloana (array-uri numpy daca e instalat)"""
+    history = {name: [] for name in COLUMNS}
+    for path in partition_files(directory, sites, until):
+        for name, values in read_partition(path).items():
+            history[name].extend(values)
+
+    if np is not None:
+        for name in COLUMNS:
+            if name in INT_COLUMNS:
+                history[name] = np.asarray(history[name], dtype=np.int64)
+            elif name in FLOAT_COLUMNS:
+                history[name] = np.asarray(history[name], dtype=np.float64)
+            else:
+                history[name] = np.asarray(history[name], dtype=object)
+    return history
+
+
+# --- analize ---
+
+def daily_prices(history, since=None, until=None):
+    """
+    Extinde seriile intr-un pret pe zi pentru fiecare produs: fiecare serie tine
+    pana in ziua dinaintea urmatoarei serii a produsului (ultima, pana la last_seen).
+    Rezultatul e ordonat pe produs, apoi pe zi, fara goluri intre zile.
+    """
+    if np is None:
+        return _daily_prices_py(history, since, until)
+
+    n = len(history['price'])
+    if not n:
+        return {name: np.asarray([], dtype=dtype) for name, dtype in (
+            ('product_id', np.int64), ('canonical_id', object), ('product_name', object), ('site_name', object),
+            ('day', 'datetime64[D]'), ('price', np.float64))}
+
+    # 'U10' pastreaza doar data din timestamp-ul ISO
+    start = np.asarray(history['first_seen'], dtype='U10').astype('datetime64[D]').astype(np.int64)
+    last = np.asarray(history['last_seen'], dtype='U10').astype('datetime64[D]').astype(np.int64)
+    product_id = history['product_id']
+    order = np.lexsort((start, product_id))
+    product_id, start, last = product_id[order], start[order], last[order]
+
+    same_product_next = np.zeros(n, dtype=bool)
+    same_product_next[:-1] = product_id[1:] == product_id[:-1]
+    end = np.where(same_product_next, np.roll(start, -1) - 1, last)
+    # O serie inlocuita in aceeasi zi de urmatoarea nu mai are nicio zi a ei
+    lengths = np.maximum(end - start + 1, 0)
+
+    index = np.repeat(np.arange(n), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    day = start[index] + offsets
+
+    keep = np.ones(len(day), dtype=bool)
+    if since:
+        keep &= day >= np.datetime64(since[:10], 'D').astype(np.int64)
+    if until:
+        keep &= day <= np.datetime64(until[:10], 'D').astype(np.int64)
+    index, day = index[keep], day[keep]
+    rows = order[index]
+
+    return {
+        'product_id': history['product_id'][rows],
+        'canonical_id': history['canonical_id'][rows],
+        'product_name': history['product_name'][rows],
+        'site_name': history['site_name'][rows],
+        'day': day.astype('datetime64[D]'),
+        'price': history['price'][rows],
+    }
+
+
+def rolling_stats(daily, window=7):
+    """Minimul si media pe ultimele `window` zile ale fiecarui produs (NaN pana se umple fereastra)"""
+    if np is None:
+        return _rolling_stats_py(daily, window)
+
+    price = daily['price']
+    n = len(price)
+    rolling_min = np.full(n, np.nan)
+    rolling_avg = np.full(n, np.nan)
+    if n >= window:
+        rolling_min[window - 1:] = sliding_window_view(price, window).min(axis=1)
+        sums = np.cumsum(np.concatenate(([0.0], price)))
+        rolling_avg[window - 1:] = (sums[window:] - sums[:-window]) / window
+
+        # Ferestrele care incep pe alt produs nu sunt valide
+        position = np.arange(n)
+        first_row = np.concatenate(([True], daily['product_id'][1:] != daily['product_id'][:-1]))
+        series_start = np.maximum.accumulate(np.where(first_row, position, 0))
+        incomplete = position - series_start < window - 1
+        rolling_min[incomplete] = np.nan
+        rolling_avg[incomplete] = np.nan
+    return {'rolling_min': rolling_min, 'rolling_avg': rolling_avg}
+
+
+def percent_change(daily, periods=1):
+    """Variatia procentuala fata de pretul de acum `periods` zile al aceluiasi produs"""
+    if np is None:
+        return _percent_change_py(daily, periods)
+
+    price = daily['price']
+    change = np.full(len(price), np.nan)
+    if len(price) > periods:
+        same_product = daily['product_id'][periods:] == daily['product_id'][:-periods]
+        change[periods:] = np.where(same_product, (price[periods:] / price[:-periods] - 1) * 100, np.nan)
+    return change
+
+
+def cheapest_site_over_time(daily):
+    """
+    Pentru fiecare zi si produs canonic: site-ul cu pretul cel mai mic. Listarile
+    fara produs canonic se grupeaza dupa nume, ca inainte de potrivire.
+    """
+    if np is None:
+        return _cheapest_site_py(daily)
+
+    if not len(daily['price']):
+        return {name: values[:0] for name, values in daily.items() if name != 'product_id'}
+    _, name_codes = np.unique(daily['product_name'].astype(str), return_inverse=True)
+    # Id-urile canonice sunt pozitive; grupurile dupa nume primesc coduri negative
+    unmatched = np.equal(daily['canonical_id'], None)
+    canonical = np.where(unmatched, 0, daily['canonical_id']).astype(np.int64)
+    group = np.where(unmatched, -1 - name_codes, canonical)
+    day = daily['day'].astype(np.int64)
+    # Ordonat pe zi, produs, pret: primul rand din fiecare grup e cel mai ieftin
+    order = np.lexsort((daily['price'], group, day))
+    day, group = day[order], group[order]
+    first = np.concatenate(([True], (day[1:] != day[:-1]) | (group[1:] != group[:-1])))
+    rows = order[first]
+    return {
+        'day': daily['day'][rows],
+        'canonical_id': daily['canonical_id'][rows],
+        'product_name': daily['product_name'][rows],
+        'site_name': daily['site_name'][rows],
+        'price': daily['price'][rows],
+    }
+
+
+def cheapest_site_share(cheapest):
+    """Cate zile-produs a fost fiecare site cel mai ieftin"""
+    return Counter(str(site) for site in cheapest['site_name']).most_common()
+
+
+# --- variantele fara numpy ---
+
+def _day(value):
+    return date.fromisoformat(str(value)[:10])
+
+
+def _daily_prices_py(history, since, until):
+    daily = {name: [] for name in ('product_id', 'canonical_id', 'product_name', 'site_name', 'day', 'price')}
+    since = _day(since) if since else None
+    until = _day(until) if until else None
+
+    runs = defaultdict(list)
+    for i, product_id in enumerate(history['product_id']):
+        runs[product_id].append((_day(history['first_seen'][i]), i))
+
+    for product_id in sorted(runs):
+        product_runs = sorted(runs[product_id])
+        for position, (start, i) in enumerate(product_runs):
+            if position + 1 < len(product_runs):
+                end = product_runs[position + 1][0] - timedelta(days=1)
+            else:
+                end = _day(history['last_seen'][i])
+            day = start
+            while day <= end:
+                if (since is None or day >= since) and (until is None or day <= until):
+                    daily['product_id'].append(product_id)
+                    daily['canonical_id'].append(history['canonical_id'][i])
+                    daily['product_name'].append(history['product_name'][i])
+                    daily['site_name'].append(history['site_name'][i])
+                    daily['day'].append(day)
+                    daily['price'].append(history['price'][i])
+                day += timedelta(days=1)
+    return daily
+
+
+def _rolling_stats_py(daily, window):
+    price, product_id = daily['price'], daily['product_id']
+    rolling_min, rolling_avg = [], []
+    series_start = 0
+    for i in range(len(price)):
+        if i and product_id[i] != product_id[i - 1]:
+            series_start = i
+        if i - series_start < window - 1:
+            rolling_min.append(float('nan'))
+            rolling_avg.append(float('nan'))
+            continue
+        values = price[i - window + 1:i + 1]
+        rolling_min.append(min(values))
+        rolling_avg.append(sum(values) / window)
+    return {'rolling_min': rolling_min, 'rolling_avg': rolling_avg}
+
+
+def _percent_change_py(daily, periods):
+    price, product_id = daily['price'], daily['product_id']
+    return [
+        (price[i] / price[i - periods] - 1) * 100
+        if i >= periods and product_id[i] == product_id[i - periods] else float('nan')
+        for i in range(len(price))
+    ]
+
+
+def _cheapest_site_py(daily):
+    best = {}
+    for i in range(len(daily['price'])):
+        canonical_id = daily['canonical_id'][i]
+        key = (daily['day'][i], ('c', canonical_id) if canonical_id is not None else ('n', daily['product_name'][i]))
+        if key not in best or daily['price'][i] < daily['price'][best[key]]:
+            best[key] = i
+    rows = [best[key] for key in sorted(best)]
+    return {name: [daily[name][i] for i in rows] for name in ('day', 'canonical_id', 'product_name', 'site_name', 'price')}
+
+
+# --- linie de comanda ---
+
+def print_report(directory, sites=None, since=None, until=None, window=7, top=10):
+    history = load_history(directory, sites, until)
+    daily = daily_prices(history, since, until)
+    if not len(daily['price']):
+        print("Nu exista date exportate pentru filtrele date")
+        return
+
+    print(f"{len(history['price'])} serii de preturi -> {len(daily['price'])} zile-produs "
+          f"({'numpy' if np is not None else 'Python pur'})")
+
+    print("\nSite-ul cel mai ieftin (zile-produs):")
+    print("-" * 40)
+    for site, days in cheapest_site_share(cheapest_site_over_time(daily)):
+        print(f"{site:<20} | {days}")
+
+    # Ultima zi a fiecarui produs, cu minimul/media pe fereastra si variatia pe aceeasi perioada
+    stats = rolling_stats(daily, window)
+    change = percent_change(daily, window)
+    product_id = daily['product_id']
+    latest = [i for i in range(len(product_id)) if i + 1 == len(product_id) or product_id[i + 1] != product_id[i]]
+    latest = [i for i in latest if change[i] == change[i]]
+    latest.sort(key=lambda i: change[i])
+
+    print(f"\nCele mai mari scaderi in ultimele {window} zile:")
+    print("-" * 90)
+    print(f"{'Produs':<40} | {'Site':<12} | {'Pret':>8} | {'Min':>8} | {'Mediu':>8} | {'Var %':>6}")
+    for i in latest[:top]:
+        print(f"{str(daily['product_name'][i])[:40]:<40} | {str(daily['site_name'][i])[:12]:<12} | "
+              f"{daily['price'][i]:8.2f} | {stats['rolling_min'][i]:8.2f} | "
+              f"{stats['rolling_avg'][i]:8.2f} | {change[i]:6.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='exporta istoricul in fisiere columnare')
+    export.add_argument('--db', default='prices.db')
+    export.add_argument('--out', default='export')
+    export.add_argument('--format', choices=['parquet', 'csv'])
+    export.add_argument('--since', help='doar seriile incepute de la aceasta data (YYYY-MM-DD)')
+
+    report = commands.add_parser('report', help='analize peste un export existent')
+    report.add_argument('directory')
+    report.add_argument('--site', action='append', dest='sites')
+    report.add_argument('--since')
+    report.add_argument('--until')
+    report.add_argument('--window', type=int, default=7, help='zile pentru minim/medie/variatie')
+    report.add_argument('--top', type=int, default=10)
+
+    args = parser.parse_args(argv)
+    if args.command == 'export':
+        summary = export_history(args.db, args.out, args.format, args.since)
+        print(f"Exportate {summary['rows']} serii in {summary['partitions']} partitii ({summary['format']})")
+    else:
+        print_report(args.directory, args.sites, args.since, args.until, args.window, args.top)
+
+
+if __name__ == '__main__':
+    main()
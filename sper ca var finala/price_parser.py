@@ -0,0 +1,109 @@
+import re
+from functools import lru_cache
+
+
+# Un numar cu separatori de mii/zecimale; spatiul conteaza doar inaintea unui grup de 3 cifre
+NUMBER_RE = re.compile(r'\d[\d.,]*(?:[ \xa0\u202f]\d{3}(?!\d)[\d.,]*)*')
+# Moneda lipita de numar, separata doar de spatii si punctuatie: "1.299,99 lei", "€ 1,299.00", "99 RON"
+CURRENCY_AFTER_RE = re.compile(r'[\s\xa0\u202f:.]*(?:(?:lei|ron|euro?|usd)(?![^\W\d_])|[€$£])', re.IGNORECASE)
+CURRENCY_BEFORE_RE = re.compile(r'(?:(?<![^\W\d_])(?:lei|ron|euro?|usd)|[€$£])[\s\xa0\u202f:.]*$', re.IGNORECASE)
+# Cazurile cele mai des intalnite, fara analiza separatorilor: "1299.99" (atribute content,
+# preturi sup reconstruite) si formatul romanesc "1.299,99"
+PLAIN_RE = re.compile(r'\s*(\d+(?:\.\d{1,2})?)\s*')
+RO_NUMBER_RE = re.compile(r'([1-9]\d{0,2}(?:\.\d{3})+|\d+)(?:,(\d{1,2}))?')
+SPACE_RE = re.compile(r'[\s\xa0\u202f]')
+
+
+def parse_number(token):
+    """
+    "1.299,99" / "1,299.99" / "1 299,99" / "4.199" / "99,90" -> float, fara sa
+    ghiceasca: cand apar ambii separatori, ultimul e cel zecimal; un singur
+    separator urmat de exact 3 cifre e de mii (conventia site-urilor romanesti).
+    """
+    token = token.rstrip('.,')
+    if token.isdigit():
+        return float(token)
+    ro = RO_NUMBER_RE.fullmatch(token)
+    if ro:
+        integer, fraction = ro.groups()
+        return float(integer.replace('.', '') + ('.' + fraction if fraction else ''))
+
+    token = SPACE_RE.sub('', token)
+    dots, commas = token.count('.'), token.count(',')
+    if not dots and not commas:
+        return float(token)
+
+    if dots and commas:
+        decimal = '.' if token.rfind('.') > token.rfind(',') else ','
+        thousands = ',' if decimal == '.' else '.'
+        if token.count(decimal) > 1:
+            return None
+        integer, fraction = token.split(decimal)
+        groups = integer.split(thousands)
+    else:
+        separator = '.' if dots else ','
+        groups = token.split(separator)
+        if len(groups) == 2 and (len(groups[1]) != 3 or groups[0] == '0'):
+            # "99,90", "1299.99", "0.299": separator zecimal
+            integer, fraction = groups
+            groups = [integer]
+        else:
+            fraction = ''
+
+    if len(groups[0]) > 3 and len(groups) > 1 or any(len(group) != 3 for group in groups[1:]):
+        # "12.34.567" nu e o grupare valida pe mii
+        return None
+    if len(fraction) > 2:
+        return None
+    return float(''.join(groups) + ('.' + fraction if fraction else ''))
+
+
+class PriceParser:
+    """
+    Pretul dintr-un text afisat pe pagina, intr-o singura trecere prin text cu
+    regex-uri compilate o data. Se alege primul numar din interval langa o
+    moneda (lei/RON/EUR/€), altfel primul numar din interval.
+    Rezultatele se tin intr-un cache LRU: acelasi text revine la fiecare scrape.
+    """
+    def __init__(self, min_price=1.0, max_price=1000000.0, cache_size=4096):
+        self.min_price = min_price
+        self.max_price = max_price
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    def in_range(self, price):
+        return price is not None and self.min_price <= price <= self.max_price
+
+    def _parse(self, text):
+        if not text:
+            return None
+
+        plain = PLAIN_RE.fullmatch(text)
+        if plain:
+            price = float(plain.group(1))
+            return price if self.in_range(price) else None
+
+        fallback = None
+        for match in NUMBER_RE.finditer(text):
+            start, end = match.span()
+            if start and text[start - 1].isalpha():
+                # Cifrele lipite de litere ("S24", "iPhone15") tin de numele produsului
+                continue
+            price = parse_number(match.group())
+            if not self.in_range(price):
+                continue
+            if CURRENCY_AFTER_RE.match(text, end) or CURRENCY_BEFORE_RE.search(text, max(0, start - 12), start):
+                return price
+            if fallback is None:
+                fallback = price
+        return fallback
+
+    def parse_many(self, texts):
+        return [self.parse(text) for text in texts]
+
+
+_default_parser = PriceParser()
+
+
+def parse_price(text):
+    """Pretul din text cu intervalul implicit (1 - 1.000.000)"""
+    return _default_parser.parse(text)
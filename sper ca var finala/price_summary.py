@@ -0,0 +1,115 @@
+"""
+Rezumatul istoricului fiecarui produs, tinut la zi la fiecare pret salvat.
+
+product_summary are un rand per produs: ultimul pret (si randul lui din prices),
+minimul, maximul, suma si numarul observarilor, prima si ultima observare.
+list_products, compare_prices si load_latest_prices citesc de aici, deci costul
+lor depinde de numarul de produse, nu de lungimea istoricului.
+
+    python price_summary.py --db prices.db            # reconstruieste din prices
+    python price_summary.py --db prices.db --check    # doar compara cu prices
+"""
+import argparse
+
+
+# Acelasi upsert pentru o serie noua si pentru o observare adaugata la ultima serie:
+# o observare mai veche decat last_seen nu schimba ultimul pret
+UPSERT_SQL = '''
+    INSERT INTO product_summary
+    (product_id, latest_id, latest_price, min_price, max_price, price_sum, samples, first_seen, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)
+    ON CONFLICT (product_id) DO UPDATE SET
+        latest_id = CASE WHEN excluded.last_seen >= last_seen THEN excluded.latest_id ELSE latest_id END,
+        latest_price = CASE WHEN excluded.last_seen >= last_seen THEN excluded.latest_price ELSE latest_price END,
+        min_price = MIN(min_price, excluded.min_price),
+        max_price = MAX(max_price, excluded.max_price),
+        price_sum = price_sum + excluded.price_sum,
+        samples = samples + 1,
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen)
+'''
+
+REBUILD_SQL = '''
+    SELECT pr.product_id,
+           (SELECT l.id FROM prices l WHERE l.product_id = pr.product_id
+            ORDER BY l.date_scraped DESC, l.id DESC LIMIT 1),
+           (SELECT l.price FROM prices l WHERE l.product_id = pr.product_id
+            ORDER BY l.date_scraped DESC, l.id DESC LIMIT 1),
+           MIN(pr.price), MAX(pr.price), SUM(pr.price * pr.samples), SUM(pr.samples),
+           MIN(pr.date_scraped), MAX(COALESCE(pr.last_seen, pr.date_scraped))
+    FROM prices pr
+    GROUP BY pr.product_id
+'''
+
+COLUMNS = ('latest_id', 'latest_price', 'min_price', 'max_price', 'price_sum', 'samples', 'first_seen', 'last_seen')
+
+
+def create_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_summary (
+            product_id INTEGER PRIMARY KEY,
+            latest_id INTEGER,
+            latest_price REAL,
+            min_price REAL,
+            max_price REAL,
+            price_sum REAL NOT NULL DEFAULT 0,
+            samples INTEGER NOT NULL DEFAULT 0,
+            first_seen TEXT,
+            last_seen TEXT,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+
+
+def record(cursor, product_id, row_id, price, date_scraped):
+    """O observare noua a pretului, salvata in randul row_id din prices"""
+    cursor.execute(UPSERT_SQL, (product_id, row_id, price, price, price, price, date_scraped, date_scraped))
+
+
+def rebuild(cursor):
+    """Recalculeaza tot rezumatul din prices; intoarce cate produse are"""
+    cursor.execute('DELETE FROM product_summary')
+    cursor.execute(f'''
+        INSERT INTO product_summary (product_id, {', '.join(COLUMNS)})
+        {REBUILD_SQL}
+    ''')
+    return cursor.rowcount
+
+
+def check(storage):
+    """Produsele al caror rezumat difera de cel calculat din prices"""
+    stored = {row[0]: row[1:] for row in storage.query(f'SELECT product_id, {", ".join(COLUMNS)} FROM product_summary')}
+    mismatched = []
+    for row in storage.query(REBUILD_SQL):
+        current = stored.pop(row[0], None)
+        # Suma se aduna in alta ordine decat la reconstructie; diferentele de rotunjire nu conteaza
+        if current is None or current[:4] != row[1:5] or abs(current[4] - row[5]) > 0.01 or current[5:] != row[6:]:
+            mismatched.append(row[0])
+    return mismatched + list(stored)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='prices.db')
+    parser.add_argument('--check', action='store_true', help='doar verifica, fara sa rescrie tabela')
+    args = parser.parse_args(argv)
+
+    # Migrarile aduc baza la schema care contine product_summary
+    from scraper_online import SmartPriceScraper
+    storage = SmartPriceScraper(args.db, use_cache=False).storage
+
+    if args.check:
+        mismatched = check(storage)
+        if mismatched:
+            print(f"{len(mismatched)} produse cu rezumat diferit de prices, de ex. {mismatched[:10]}")
+        else:
+            print("Rezumatul corespunde cu prices")
+        return
+
+    with storage.transaction() as cursor:
+        count = rebuild(cursor)
+    print(f"Rezumat reconstruit pentru {count} produse")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,470 @@
+"""
+Reguli de urmarire a preturilor, evaluate la fiecare pret salvat.
+
+    python price_watch.py add --below 3500 --product 12
+    python price_watch.py add --drop 10 --window 30 --canonical 5 --notifier file:alerte.jsonl
+    python price_watch.py add --cheapest --canonical 5 --notifier webhook:http://localhost:8000/alerte
+    python price_watch.py list
+    python price_watch.py remove 3
+
+Tipuri de reguli:
+  below     pretul produsului e cel mult threshold RON
+  drop      pretul e cu cel putin threshold% sub minimul ultimelor window_days zile
+  cheapest  oferta cea mai ieftina a produsului canonic s-a schimbat (alt site sau alt pret)
+
+O regula se aplica unui produs (--product), tuturor listarilor unui produs
+canonic (--canonical) sau, fara niciuna, tuturor produselor (doar below/drop).
+Regulile stau in memorie, indexate pe produs si pe produsul canonic, deci un
+pret fara reguli costa doar o cautare in dictionar. Aceeasi regula nu anunta
+de doua ori acelasi produs la acelasi pret: ultimul pret anuntat se tine pe
+(regula, produs) in price_watch_state; la cheapest, pe regula.
+
+Notificatori: 'stdout', 'file:CALE' (JSON pe linie) si 'webhook:URL' (POST cu
+lista de evenimente). Un notificator nou implementeaza send() si se adauga in NOTIFIERS.
+"""
+import argparse
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+import requests
+
+
+KINDS = ('below', 'drop', 'cheapest')
+
+
+# --- notificatori ---
+
+class Notifier(ABC):
+    @abstractmethod
+    def send(self, events):
+        """Trimite un lot de evenimente (dictionare, vezi PriceWatcher._fire)"""
+
+
+class StdoutNotifier(Notifier):
+    def __init__(self, target=None):
+        pass
+
+    def send(self, events):
+        for event in events:
+            print(f" ALERTA [{event['kind']}] {event['product_name'][:40]} ({event['site_name']}): "
+                  f"{event['price']} RON - {event['message']}")
+
+
+class FileNotifier(Notifier):
+    """Adauga evenimentele intr-un fisier JSONL (util si la teste)"""
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, events):
+        with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+
+class WebhookNotifier(Notifier):
+    """POST cu lista de evenimente; o eroare de retea nu opreste scraping-ul"""
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, events):
+        try:
+            requests.post(self.url, json=events, timeout=self.timeout).raise_for_status()
+        except requests.RequestException as e:
+            print(f"Eroare la trimiterea alertelor catre {self.url}: {e}")
+
+
+NOTIFIERS = {
+    'stdout': StdoutNotifier,
+    'file': FileNotifier,
+    'webhook': WebhookNotifier,
+}
+
+
+def open_notifier(spec):
+    """'stdout', 'file:alerte.jsonl', 'webhook:https://...'"""
+    kind, _, target = spec.partition(':')
+    if kind not in NOTIFIERS:
+        raise ValueError(f"Notificator necunoscut: {kind} (disponibili: {', '.join(NOTIFIERS)})")
+    return NOTIFIERS[kind](target or None)
+
+
+# --- reguli ---
+
+def create_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_watches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            product_id INTEGER REFERENCES products (id),
+            canonical_id INTEGER REFERENCES canonical_products (id),
+            threshold REAL,
+            window_days INTEGER NOT NULL DEFAULT 30,
+            notifier TEXT,
+            active INTEGER NOT NULL DEFAULT 1,
+            created TEXT,
+            last_product_id INTEGER,
+            last_price REAL,
+            last_triggered TEXT
+        )
+    ''')
+
+
+def create_state_table(cursor):
+    """Ultimul pret anuntat de fiecare regula below/drop pentru fiecare produs"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_watch_state (
+            watch_id INTEGER NOT NULL REFERENCES price_watches (id),
+            product_id INTEGER NOT NULL REFERENCES products (id),
+            last_price REAL,
+            last_triggered TEXT,
+            PRIMARY KEY (watch_id, product_id)
+        )
+    ''')
+
+
+def add_watch(storage, kind, threshold=None, product_id=None, canonical_id=None, window_days=30, notifier=None):
+    if kind not in KINDS:
+        raise ValueError(f"Tip de regula necunoscut: {kind}")
+    if kind == 'cheapest' and canonical_id is None:
+        raise ValueError("Regula cheapest cere un produs canonic")
+    if kind != 'cheapest' and threshold is None:
+        raise ValueError(f"Regula {kind} cere un prag")
+    if notifier:
+        open_notifier(notifier)
+    with storage.transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO price_watches (kind, product_id, canonical_id, threshold, window_days, notifier, created)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (kind, product_id, canonical_id, threshold, window_days, notifier, datetime.now().isoformat()))
+        return cursor.lastrowid
+
+
+def remove_watch(storage, watch_id):
+    with storage.transaction() as cursor:
+        cursor.execute('DELETE FROM price_watch_state WHERE watch_id = ?', (watch_id,))
+        cursor.execute('DELETE FROM price_watches WHERE id = ?', (watch_id,))
+        return cursor.rowcount
+
+
+class PriceWatcher:
+    """
+    Evalueaza regulile pentru fiecare pret scris de insert_prices, in tranzactia
+    lui. Evenimentele se tin pana la commit: flush() le trimite, discard() le
+    arunca daca tranzactia s-a anulat. Regulile se reincarca la reload_every secunde.
+
+    Acelasi watcher e folosit din mai multe thread-uri (lane-urile worker-ului,
+    thread-ul de scriere din pipeline): dictionarele din memorie se citesc si se
+    modifica doar sub self.lock, care nu e tinut niciodata in timpul unei interogari.
+    """
+    def __init__(self, storage, default_notifier='stdout', reload_every=60):
+        self.storage = storage
+        self.default_notifier = default_notifier
+        self.reload_every = reload_every
+        self.notifiers = {}
+        self.canonical_of = {}
+        # (watch_id, product_id) -> ultimul pret anuntat, in fata tabelei price_watch_state
+        self.announced = {}
+        # product_id -> (seria curenta, [[id, pret, ultima observare], ...]) pentru regulile drop,
+        # pe ultimele max_window zile; se recitesc doar cand incepe o serie noua
+        self.windows = {}
+        self.max_window = 0
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.loaded_at = None
+        self.by_product = {}
+        self.by_canonical = {}
+        self.global_watches = []
+
+    def load(self):
+        by_product, by_canonical, global_watches = {}, {}, []
+        max_window = 0
+        rows = self.storage.query('''
+            SELECT id, kind, product_id, canonical_id, threshold, window_days, notifier, last_product_id, last_price
+            FROM price_watches WHERE active = 1
+        ''')
+        for row in rows:
+            watch = dict(zip(('id', 'kind', 'product_id', 'canonical_id', 'threshold', 'window_days', 'notifier',
+                              'last_product_id', 'last_price'), row))
+            if watch['product_id'] is not None:
+                by_product.setdefault(watch['product_id'], []).append(watch)
+            elif watch['canonical_id'] is not None:
+                by_canonical.setdefault(watch['canonical_id'], []).append(watch)
+            else:
+                global_watches.append(watch)
+            if watch['kind'] == 'drop':
+                max_window = max(max_window, watch['window_days'])
+        with self.lock:
+            self.by_product, self.by_canonical, self.global_watches = by_product, by_canonical, global_watches
+            # Produsele pot fi regrupate intre timp (product_matching.rebuild), iar alte
+            # procese pot anunta aceleasi reguli
+            self.canonical_of = {}
+            self.announced = {}
+            # Ferestrele tinute sunt prea scurte pentru o regula noua cu fereastra mai mare
+            if max_window > self.max_window:
+                self.windows = {}
+            self.max_window = max_window
+            self.loaded_at = time.monotonic()
+        return len(rows)
+
+    def _pending(self):
+        pending = getattr(self.local, 'pending', None)
+        if pending is None:
+            pending = self.local.pending = []
+        return pending
+
+    def watches_for(self, cursor, product_id):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.reload_every:
+            self.load()
+        with self.lock:
+            watches = self.by_product.get(product_id, []) + self.global_watches
+            by_canonical = self.by_canonical
+            known = product_id in self.canonical_of
+            canonical_id = self.canonical_of.get(product_id)
+        if by_canonical:
+            if not known:
+                cursor.execute('SELECT canonical_id FROM products WHERE id = ?', (product_id,))
+                row = cursor.fetchone()
+                canonical_id = row[0] if row else None
+                with self.lock:
+                    self.canonical_of[product_id] = canonical_id
+            watches = watches + by_canonical.get(canonical_id, [])
+        return watches
+
+    def check(self, cursor, product_id, row_id, price, date_scraped):
+        """Apelat dupa fiecare pret salvat (row_id = seria din prices in care a intrat)"""
+        watches = self.watches_for(cursor, product_id)
+        for watch in watches:
+            fired = getattr(self, f"_check_{watch['kind']}")(cursor, watch, product_id, row_id, price, date_scraped)
+            if fired:
+                self._fire(cursor, watch, *fired, date_scraped)
+
+    def _check_below(self, cursor, watch, product_id, row_id, price, date_scraped):
+        if price <= watch['threshold']:
+            return product_id, price, watch['threshold'], f"sub pragul de {watch['threshold']} RON"
+        return None
+
+    def _load_window(self, cursor, product_id, date_scraped):
+        since = (datetime.fromisoformat(date_scraped) - timedelta(days=self.max_window)).isoformat()
+        # Seriile unui produs sunt consecutive: dintre cele incepute inainte de fereastra,
+        # doar ultima poate ajunge in ea. Ambele parti merg pe indexul (product_id, date_scraped, ...)
+        cursor.execute('''
+            SELECT id, price, COALESCE(last_seen, date_scraped) FROM prices
+            WHERE product_id = ? AND date_scraped >= ?
+            UNION ALL
+            SELECT * FROM (
+                SELECT id, price, COALESCE(last_seen, date_scraped) FROM prices
+                WHERE product_id = ? AND date_scraped < ?
+                ORDER BY date_scraped DESC LIMIT 1
+            )
+        ''', (product_id, since, product_id, since))
+        return [list(row) for row in cursor.fetchall()]
+
+    def window_min(self, cursor, product_id, row_id, date_scraped, window_days):
+        """Minimul seriilor produsului din ultimele window_days zile, fara seria curenta row_id"""
+        with self.lock:
+            known = self.windows.get(product_id)
+        if known is None or known[0] != row_id:
+            # Produs nevazut sau serie noua (pretul s-a schimbat, aici sau in alt proces)
+            known = (row_id, self._load_window(cursor, product_id, date_scraped))
+        since = (datetime.fromisoformat(date_scraped) - timedelta(days=window_days)).isoformat()
+        with self.lock:
+            self.windows[product_id] = known
+            for run in known[1]:
+                if run[0] == row_id:
+                    run[2] = max(run[2], date_scraped)
+            return min((price for run_id, price, seen in known[1] if run_id != row_id and seen >= since),
+                       default=None)
+
+    def _check_drop(self, cursor, watch, product_id, row_id, price, date_scraped):
+        window_min = self.window_min(cursor, product_id, row_id, date_scraped, watch['window_days'])
+        if window_min and price <= window_min * (1 - watch['threshold'] / 100):
+            drop = (1 - price / window_min) * 100
+            return product_id, price, window_min, (f"-{drop:.1f}% fata de minimul din ultimele "
+                                                   f"{watch['window_days']} zile ({window_min} RON)")
+        return None
+
+    def _check_cheapest(self, cursor, watch, product_id, row_id, price, date_scraped):
+        # Ultimele preturi ale listarilor produsului canonic, din product_summary
+        cursor.execute('''
+            SELECT p.id, s.latest_price FROM products p
+            JOIN product_summary s ON s.product_id = p.id
+            WHERE p.canonical_id = ?
+            ORDER BY s.latest_price, p.id LIMIT 1
+        ''', (watch['canonical_id'],))
+        row = cursor.fetchone()
+        if row and watch['threshold'] is not None and row[1] > watch['threshold']:
+            return None
+        if row:
+            return row[0], row[1], watch['last_price'], "cea mai ieftina oferta pentru acest produs"
+        return None
+
+    def _claim(self, cursor, watch, product_id, price, date_scraped):
+        """
+        Daca evenimentul e nou si il anunta acest proces. Conditia pe starea veche din
+        UPDATE face ca, din mai multe procese, doar unul sa trimita evenimentul.
+        """
+        if watch['kind'] == 'cheapest':
+            # O singura stare pe regula: ce oferta e cea mai ieftina si la ce pret
+            with self.lock:
+                if watch['last_product_id'] == product_id and watch['last_price'] == price:
+                    return False
+            cursor.execute('''
+                UPDATE price_watches SET last_product_id = ?, last_price = ?, last_triggered = ?
+                WHERE id = ? AND (last_product_id IS NOT ? OR last_price IS NOT ?)
+            ''', (product_id, price, date_scraped, watch['id'], product_id, price))
+            with self.lock:
+                watch['last_product_id'], watch['last_price'] = product_id, price
+            return cursor.rowcount > 0
+
+        key = (watch['id'], product_id)
+        with self.lock:
+            known = key in self.announced
+            last_price = self.announced.get(key)
+        if not known:
+            cursor.execute('SELECT last_price FROM price_watch_state WHERE watch_id = ? AND product_id = ?', key)
+            row = cursor.fetchone()
+            last_price = row[0] if row else None
+        if last_price == price:
+            with self.lock:
+                self.announced[key] = price
+            return False
+        cursor.execute('''
+            INSERT INTO price_watch_state (watch_id, product_id, last_price, last_triggered)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (watch_id, product_id) DO UPDATE SET
+                last_price = excluded.last_price,
+                last_triggered = excluded.last_triggered
+            WHERE last_price IS NOT excluded.last_price
+        ''', (watch['id'], product_id, price, date_scraped))
+        with self.lock:
+            self.announced[key] = price
+        if not cursor.rowcount:
+            return False
+        # Ultima alerta a regulii, pentru price_watch.py list
+        cursor.execute('UPDATE price_watches SET last_product_id = ?, last_price = ?, last_triggered = ? WHERE id = ?',
+                       (product_id, price, date_scraped, watch['id']))
+        return True
+
+    def _fire(self, cursor, watch, product_id, price, reference, message, date_scraped):
+        if not self._claim(cursor, watch, product_id, price, date_scraped):
+            return
+
+        cursor.execute('SELECT name, site_name, url FROM products WHERE id = ?', (product_id,))
+        name, site_name, url = cursor.fetchone() or ('', '', '')
+        self._pending().append((watch['notifier'] or self.default_notifier, {
+            'watch_id': watch['id'],
+            'kind': watch['kind'],
+            'product_id': product_id,
+            'product_name': name,
+            'site_name': site_name,
+            'url': url,
+            'price': price,
+            'reference': reference,
+            'message': message,
+            'date': date_scraped
+        }))
+
+    def flush(self):
+        """Trimite evenimentele din tranzactia tocmai confirmata, grupate pe notificator"""
+        pending = self._pending()
+        if not pending:
+            return 0
+        self.local.pending = []
+        grouped = {}
+        for spec, event in pending:
+            grouped.setdefault(spec, []).append(event)
+        for spec, events in grouped.items():
+            with self.lock:
+                if spec not in self.notifiers:
+                    self.notifiers[spec] = open_notifier(spec)
+                notifier = self.notifiers[spec]
+            notifier.send(events)
+        return len(pending)
+
+    def discard(self):
+        """Tranzactia s-a anulat: evenimentele si starea regulilor din memorie nu mai sunt valabile"""
+        self.local.pending = []
+        with self.lock:
+            self.windows = {}
+            self.loaded_at = None
+
+
+def print_watches(storage):
+    rows = storage.query('''
+        SELECT w.id, w.kind, w.threshold, w.window_days, w.notifier, w.active, w.last_price, w.last_triggered,
+               p.name, c.title
+        FROM price_watches w
+        LEFT JOIN products p ON p.id = w.product_id
+        LEFT JOIN canonical_products c ON c.id = w.canonical_id
+        ORDER BY w.id
+    ''')
+    if not rows:
+        print(" Nu exista reguli de urmarire")
+        return
+    print("\n Reguli de urmarire:")
+    print("-" * 100)
+    for watch_id, kind, threshold, window_days, notifier, active, last_price, last_triggered, name, title in rows:
+        target = name or title or 'toate produsele'
+        condition = {
+            'below': f"<= {threshold} RON",
+            'drop': f"-{threshold}% fata de min. {window_days} zile",
+            'cheapest': 'cea mai ieftina oferta' + (f" sub {threshold} RON" if threshold else '')
+        }[kind]
+        last = f"{last_price} RON la {last_triggered[:16]}" if last_triggered else '-'
+        print(f"{watch_id:4d} | {target[:36]:<36} | {condition:<28} | {notifier or 'implicit':<12} | "
+              f"{'activa' if active else 'oprita'} | {last}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='prices.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='adauga o regula')
+    kind = add.add_mutually_exclusive_group(required=True)
+    kind.add_argument('--below', type=float, metavar='RON', help='pretul ajunge cel mult la RON')
+    kind.add_argument('--drop', type=float, metavar='PROCENT', help='scadere fata de minimul din fereastra')
+    kind.add_argument('--cheapest', action='store_true', help='se schimba cea mai ieftina oferta')
+    add.add_argument('--max-price', type=float, help='pentru --cheapest: doar oferte sub acest pret')
+    add.add_argument('--window', type=int, default=30, help='zile, pentru --drop')
+    add.add_argument('--product', type=int, help='id-ul produsului')
+    add.add_argument('--canonical', type=int, help='id-ul produsului canonic (toate site-urile)')
+    add.add_argument('--notifier', help="'stdout', 'file:CALE' sau 'webhook:URL'")
+
+    commands.add_parser('list', help='afiseaza regulile')
+    remove = commands.add_parser('remove', help='sterge o regula')
+    remove.add_argument('watch_id', type=int)
+    args = parser.parse_args(argv)
+
+    # Migrarile aduc baza la schema care contine price_watches
+    from scraper_online import SmartPriceScraper
+    storage = SmartPriceScraper(args.db, use_cache=False).storage
+
+    if args.command == 'add':
+        if args.below is not None:
+            kind, threshold = 'below', args.below
+        elif args.drop is not None:
+            kind, threshold = 'drop', args.drop
+        else:
+            kind, threshold = 'cheapest', args.max_price
+        try:
+            watch_id = add_watch(storage, kind, threshold, args.product, args.canonical, args.window, args.notifier)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Regula {watch_id} adaugata")
+    elif args.command == 'remove':
+        if remove_watch(storage, args.watch_id):
+            print(f"Regula {args.watch_id} stearsa")
+        else:
+            print(f"Nu exista regula {args.watch_id}")
+    else:
+        print_watches(storage)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""
+Potrivirea aceluiasi produs intre site-uri diferite.
+
+Fiecare listare din products e legata de un produs canonic (canonical_products):
+dupa GTIN/EAN cand pagina il expune, altfel dupa semnatura titlului normalizat.
+Candidatii vin dintr-un index inversat token -> produse canonice, asa ca o
+listare noua e comparata doar cu produsele care au aceleasi tokenuri de model,
+nu cu toata tabela.
+
+    python product_matching.py --db prices.db     # regrupeaza toate produsele
+"""
+import argparse
+import re
+import unicodedata
+from collections import Counter, defaultdict, namedtuple
+
+
+TOKEN_RE = re.compile(r'[a-z0-9]+(?:[.,][0-9]+)?')
+# "128 GB" -> "128gb", ca un singur token
+UNIT_RE = re.compile(r'\b(\d+)\s+(gb|tb|mah|mp|hz|inch|inchi)\b')
+CAPACITY_RE = re.compile(r'^(\d+)(gb|tb)$')
+MEASUREMENT_RE = re.compile(r'^\d+[.,]\d+[a-z]*$|^\d+(?:mah|mp|hz|ghz|inch|inchi|mm|cm|w)$')
+
+STOPWORDS = {
+    'telefon', 'mobil', 'smartphone', 'dual', 'sim', 'nano', 'esim', '4g', '5g', 'lte',
+    'wifi', 'nfc', 'ram', 'rom', 'memorie', 'stocare', 'interna', 'internal', 'storage',
+    'cu', 'si', 'de', 'la', 'pentru', 'in', 'the', 'and', 'with', 'nou', 'new',
+    'original', 'deblocat', 'unlocked', 'version', 'versiune', 'eu', 'ro', 'culoare',
+    'display', 'ecran', 'camera', 'baterie', 'procesor', 'octa', 'core', 'gb', 'tb',
+}
+COLORS = {
+    'negru', 'black', 'alb', 'white', 'albastru', 'blue', 'rosu', 'red', 'verde', 'green',
+    'gri', 'gray', 'grey', 'argintiu', 'silver', 'auriu', 'gold', 'roz', 'pink', 'mov',
+    'violet', 'purple', 'galben', 'yellow', 'natural', 'titanium', 'graphite', 'midnight',
+    'starlight', 'space', 'cream', 'lavender', 'mint', 'onyx', 'obsidian', 'porcelain',
+    'phantom', 'marble', 'amber', 'coral', 'navy', 'teal', 'bronze',
+}
+# Cuvinte care schimba modelul: "iPhone 15" si "iPhone 15 Pro" nu sunt acelasi produs
+VARIANTS = {'pro', 'max', 'plus', 'ultra', 'mini', 'lite', 'fe', 'neo', 'edge', 'fold', 'flip', 'prime'}
+
+Signature = namedtuple('Signature', 'tokens model storage_gb')
+
+
+def signature(title):
+    """Tokenurile titlului normalizat, tokenurile de model si capacitatea de stocare"""
+    text = unicodedata.normalize('NFKD', title or '').encode('ascii', 'ignore').decode().casefold()
+    text = UNIT_RE.sub(r'\1\2', text)
+
+    tokens, model = set(), set()
+    storage_gb = None
+    for token in TOKEN_RE.findall(text):
+        if token in STOPWORDS or token in COLORS:
+            continue
+        capacity = CAPACITY_RE.match(token)
+        if capacity:
+            size = int(capacity.group(1)) * (1024 if capacity.group(2) == 'tb' else 1)
+            # Cand titlul contine si RAM-ul, stocarea e capacitatea cea mai mare
+            storage_gb = max(storage_gb or 0, size)
+            continue
+        if MEASUREMENT_RE.match(token):
+            continue
+        tokens.add(token)
+        if token in VARIANTS or any(c.isdigit() for c in token):
+            model.add(token)
+    return Signature(frozenset(tokens), frozenset(model), storage_gb)
+
+
+def similarity(a, b):
+    """Jaccard pe tokenuri, dar 0 daca modelul sau stocarea difera"""
+    if a.model != b.model:
+        return 0.0
+    if a.storage_gb and b.storage_gb and a.storage_gb != b.storage_gb:
+        return 0.0
+    union = a.tokens | b.tokens
+    return len(a.tokens & b.tokens) / len(union) if union else 0.0
+
+
+class ProductMatcher:
+    """
+    Atribuie listarile produselor canonice. Indexul inversat e tinut in memorie
+    si incarcat la prima folosire; produsele canonice noi se scriu prin cursorul
+    primit, in tranzactia apelantului.
+    """
+    def __init__(self, threshold=0.5, max_candidates=200):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.reset()
+
+    def reset(self):
+        """Uita indexul; se reincarca din baza de date la urmatoarea atribuire"""
+        self.index = defaultdict(set)
+        self.signatures = {}
+        self.gtins = {}
+        self.canonical_gtin = {}
+        self.loaded = False
+
+    def load(self, cursor):
+        cursor.execute('SELECT id, title, gtin, storage_gb FROM canonical_products')
+        for canonical_id, title, gtin, storage_gb in cursor.fetchall():
+            sig = signature(title)
+            self._add(canonical_id, Signature(sig.tokens, sig.model, storage_gb), gtin)
+        self.loaded = True
+
+    def _add(self, canonical_id, sig, gtin):
+        self.signatures[canonical_id] = sig
+        for token in sig.tokens:
+            self.index[token].add(canonical_id)
+        if gtin:
+            self.gtins[gtin] = canonical_id
+            self.canonical_gtin[canonical_id] = gtin
+
+    def candidates(self, sig):
+        if sig.model:
+            # Candidatul trebuie sa aiba toate tokenurile de model; se porneste de la cel mai rar
+            postings = sorted((self.index.get(token, set()) for token in sig.model), key=len)
+            found = set(postings[0])
+            for posting in postings[1:]:
+                found &= posting
+                if not found:
+                    break
+            return found
+
+        # Fara tokenuri de model: produsele care au macar unul din cei mai rari doi tokeni
+        rare = sorted((token for token in sig.tokens if token in self.index), key=lambda t: len(self.index[t]))
+        found = set()
+        for token in rare[:2]:
+            found |= self.index[token]
+        return found if len(found) <= self.max_candidates else set()
+
+    def assign(self, cursor, title, gtin=None):
+        """Id-ul produsului canonic pentru o listare; creeaza unul nou daca nu se potriveste nimic"""
+        if not self.loaded:
+            self.load(cursor)
+        if gtin and gtin in self.gtins:
+            return self.gtins[gtin]
+
+        sig = signature(title)
+        best, best_score = None, self.threshold
+        for canonical_id in self.candidates(sig):
+            # Doua coduri GTIN diferite inseamna doua produse diferite
+            if gtin and self.canonical_gtin.get(canonical_id, gtin) != gtin:
+                continue
+            score = similarity(sig, self.signatures[canonical_id])
+            if score >= best_score:
+                best, best_score = canonical_id, score
+
+        if best is not None:
+            if gtin and best not in self.canonical_gtin:
+                cursor.execute('UPDATE canonical_products SET gtin = ? WHERE id = ?', (gtin, best))
+                self.gtins[gtin] = best
+                self.canonical_gtin[best] = gtin
+            return best
+
+        cursor.execute('''
+            INSERT INTO canonical_products (title, gtin, storage_gb) VALUES (?, ?, ?)
+        ''', ((title or '')[:200], gtin, sig.storage_gb))
+        canonical_id = cursor.lastrowid
+        cursor.executemany('INSERT OR IGNORE INTO canonical_tokens (token, canonical_id) VALUES (?, ?)', [
+            (token, canonical_id) for token in sig.tokens
+        ])
+        self._add(canonical_id, sig, gtin)
+        return canonical_id
+
+
+def cluster_products(cursor, matcher, only_unassigned=True):
+    """Leaga de produse canonice listarile din products (implicit doar cele neatribuite)"""
+    cursor.execute(f'''
+        SELECT id, name, gtin FROM products
+        {'WHERE canonical_id IS NULL' if only_unassigned else ''}
+        ORDER BY id
+    ''')
+    updates = [(matcher.assign(cursor, name, gtin), product_id) for product_id, name, gtin in cursor.fetchall()]
+    cursor.executemany('UPDATE products SET canonical_id = ? WHERE id = ?', updates)
+    return len(updates)
+
+
+def search_canonical(storage, text, limit=50):
+    """Produsele canonice care contin toti tokenii textului cautat, din indexul canonical_tokens"""
+    sig = signature(text)
+    tokens = sorted(sig.tokens)
+    if not tokens:
+        return []
+
+    placeholders = ','.join('?' * len(tokens))
+    sql = f'''
+        SELECT t.canonical_id FROM canonical_tokens t
+        JOIN canonical_products c ON c.id = t.canonical_id
+        WHERE t.token IN ({placeholders}) {'AND c.storage_gb = ?' if sig.storage_gb else ''}
+        GROUP BY t.canonical_id HAVING COUNT(*) = ?
+        ORDER BY t.canonical_id LIMIT ?
+    '''
+    params = tokens + ([sig.storage_gb] if sig.storage_gb else []) + [len(tokens), limit]
+    return [row[0] for row in storage.query(sql, params)]
+
+
+def keep_canonical_ids(cursor, previous):
+    """
+    Dupa o regrupare, fiecare produs canonic nou reia id-ul vechi pe care il aveau
+    cele mai multe listari ale lui, ca regulile din price_watches, clientii API-ului
+    si exporturile sa arate tot spre acelasi produs. Un id vechi e refolosit o
+    singura data; grupurile noi fara corespondent raman cu id-ul nou.
+    """
+    cursor.execute('SELECT id, canonical_id FROM products WHERE canonical_id IS NOT NULL')
+    votes = defaultdict(Counter)
+    for product_id, canonical_id in cursor.fetchall():
+        if previous.get(product_id) is not None:
+            votes[canonical_id][previous[product_id]] += 1
+
+    # Grupurile cu cele mai multe listari comune aleg primele
+    pairs = sorted(((count, new_id, old_id) for new_id, counter in votes.items()
+                    for old_id, count in counter.items()), key=lambda pair: (-pair[0], pair[1], pair[2]))
+    renamed, taken = {}, set()
+    for _, new_id, old_id in pairs:
+        if new_id not in renamed and old_id not in taken and new_id != old_id:
+            renamed[new_id] = old_id
+            taken.add(old_id)
+
+    # AUTOINCREMENT: id-urile noi sunt mai mari decat orice id vechi, deci nu se suprapun
+    updates = [(old_id, new_id) for new_id, old_id in renamed.items()]
+    cursor.executemany('UPDATE canonical_products SET id = ? WHERE id = ?', updates)
+    cursor.executemany('UPDATE canonical_tokens SET canonical_id = ? WHERE canonical_id = ?', updates)
+    cursor.executemany('UPDATE products SET canonical_id = ? WHERE canonical_id = ?', updates)
+    return len(renamed)
+
+
+def rebuild(storage, threshold=0.5):
+    """
+    Regrupeaza toate listarile de la zero, intr-o tranzactie. Id-urile produselor
+    canonice care supravietuiesc regruparii raman aceleasi (keep_canonical_ids).
+    """
+    matcher = ProductMatcher(threshold=threshold)
+    with storage.transaction() as cursor:
+        cursor.execute('SELECT id, canonical_id FROM products WHERE canonical_id IS NOT NULL')
+        previous = dict(cursor.fetchall())
+        cursor.execute('UPDATE products SET canonical_id = NULL')
+        cursor.execute('DELETE FROM canonical_tokens')
+        cursor.execute('DELETE FROM canonical_products')
+        listings = cluster_products(cursor, matcher)
+        keep_canonical_ids(cursor, previous)
+        return listings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='prices.db')
+    parser.add_argument('--threshold', type=float, default=0.5, help='similaritatea minima intre titluri (0-1)')
+    args = parser.parse_args(argv)
+
+    # Scraper-ul aplica migrarile care creeaza tabelele canonice
+    from scraper_online import SmartPriceScraper
+    storage = SmartPriceScraper(args.db).storage
+
+    listings = rebuild(storage, args.threshold)
+    canonical, shared = storage.query_one('''
+        SELECT COUNT(*), SUM(sites > 1) FROM (
+            SELECT COUNT(DISTINCT site_name) AS sites FROM products GROUP BY canonical_id
+        )
+    ''')
+    print(f"{listings} listari grupate in {canonical} produse canonice ({shared or 0} pe mai multe site-uri)")
+
+    # Regulile de alerta legate de un grup care a disparut nu se mai declanseaza
+    if storage.query_one("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'price_watches'"):
+        for watch_id, canonical_id in storage.query('''
+            SELECT w.id, w.canonical_id FROM price_watches w
+            LEFT JOIN canonical_products c ON c.id = w.canonical_id
+            WHERE w.canonical_id IS NOT NULL AND c.id IS NULL
+        '''):
+            print(f"Atentie: regula {watch_id} urmareste produsul canonic {canonical_id}, care nu mai exista")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Mod daemon: reimprospateaza preturile continuu, fiecare produs cu intervalul lui.
+
+    python scheduler.py --db prices.db --workers 16 --per-site 2
+
+Produsele al caror pret s-a schimbat recent sunt verificate mai des (intervalul
+se injumatateste), cele stabile tot mai rar (intervalul creste), intre limitele
+--min-interval si --max-interval. Un scrape esuat nu schimba intervalul: produsul
+se reincearca dupa --retry-delay, dublat la fiecare esec consecutiv, dar niciodata
+mai tarziu decat intervalul lui. Ordinea vine dintr-un heap dupa next_due.
+"""
+import argparse
+import heapq
+import os
+import queue
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import metrics
+from http_client import DomainRateLimiter
+from scraper_online import ScrapeResult, SmartPriceScraper
+
+
+def to_timestamp(value):
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def adapt_interval(interval, changed, min_interval=1800, max_interval=7 * 86400, speedup=0.5, slowdown=1.5):
+    """Intervalul urmator: mai scurt dupa o schimbare de pret, mai lung cand pretul e stabil"""
+    factor = speedup if changed else slowdown
+    return int(min(max_interval, max(min_interval, interval * factor)))
+
+
+class PriceScheduler:
+    """Coada de prioritate peste products, cu limita de request-uri simultane pe site"""
+    def __init__(self, scraper, max_workers=16, per_site=2, delay=3,
+                 min_interval=1800, max_interval=7 * 86400,
+                 speedup=0.5, slowdown=1.5, retry_delay=300, reload_every=300, metrics_file=None):
+        self.scraper = scraper
+        self.max_workers = max_workers
+        self.per_site = per_site
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self.retry_delay = retry_delay
+        self.reload_every = reload_every
+        self.metrics_file = metrics_file
+
+        self.limiter = DomainRateLimiter(delay)
+        self.heap = []
+        self.products = {}
+        self.active = defaultdict(int)
+        # Produse scadente amanate pentru ca site-ul lor era la limita, cate un heap pe site
+        self.parked = defaultdict(list)
+        self.results = queue.Queue()
+        self.running = False
+
+    def load_products(self):
+        """Adauga in heap produsele noi (cele deja programate raman neatinse)"""
+        rows = self.scraper.storage.query('''
+            SELECT id, name, url, selector, refresh_interval, next_due FROM products
+        ''')
+        self.scraper.load_latest_prices()
+        added = 0
+        for product_id, name, url, selector, interval, next_due in rows:
+            if product_id in self.products:
+                continue
+            self.products[product_id] = {
+                'id': product_id,
+                'name': name,
+                'url': url,
+                'selector': selector,
+                'site_key': self.scraper.detect_site_name(url),
+                'interval': interval or 21600,
+                'failures': 0
+            }
+            heapq.heappush(self.heap, (to_timestamp(next_due), product_id))
+            added += 1
+        return added
+
+    def next_interval(self, product, changed):
+        return adapt_interval(product['interval'], changed, self.min_interval, self.max_interval,
+                              self.speedup, self.slowdown)
+
+    def retry_delay_for(self, product):
+        """Pauza pana la reincercarea dupa esecuri consecutive, plafonata la intervalul produsului"""
+        return min(product['interval'], self.retry_delay * 2 ** (product['failures'] - 1))
+
+    def _scrape(self, product):
+        result = ScrapeResult(None, False, False, product['selector'], [])
+        try:
+            self.limiter.wait(product['site_key'])
+            # Selectorul poate fi re-invatat intre timp; se citeste cel curent
+            row = self.scraper.storage.query_one('SELECT selector FROM products WHERE id = ?', (product['id'],))
+            if row:
+                product['selector'] = row[0]
+            result = self.scraper.scrape_product(product['url'], product['selector'])
+        except Exception as e:
+            print(f"Eroare la {product['url']}: {e}")
+        finally:
+            self.results.put((product, result))
+
+    def _finish(self, product, result):
+        self.active[product['site_key']] -= 1
+        # Slotul eliberat trece la cel mai vechi produs amanat al site-ului
+        parked = self.parked[product['site_key']]
+        if parked:
+            heapq.heappush(self.heap, heapq.heappop(parked))
+        now = datetime.now().isoformat()
+        price = result.price
+
+        with metrics.current().timer('db_write'), self.scraper.price_transaction() as cursor:
+            # insert_prices deschide o serie noua doar cand pretul difera de ultimul salvat
+            changed = bool(price) and self.scraper.insert_prices(cursor, [(product['id'], price, now)]) > 0
+            # Selectorul inlocuit se citeste din products la urmatorul scrape
+            self.scraper.record_selector(cursor, product['id'], product['selector'], result)
+            if price:
+                # Doar un pret observat (schimbat sau nu) muta intervalul
+                product['failures'] = 0
+                product['interval'] = self.next_interval(product, changed)
+                delay = product['interval']
+            else:
+                product['failures'] += 1
+                delay = self.retry_delay_for(product)
+            next_due = time.time() + delay
+            cursor.execute('UPDATE products SET refresh_interval = ?, next_due = ? WHERE id = ?', (
+                product['interval'], datetime.fromtimestamp(next_due).isoformat(), product['id']
+            ))
+        heapq.heappush(self.heap, (next_due, product['id']))
+
+        status = 'schimbat' if changed else ('neschimbat' if price else f"negasit (esecul {product['failures']})")
+        print(f"{now[:19]} | {product['name'][:40]:<40} | {price or '-'} RON | {status} | "
+              f"urmatorul in {delay // 60} min")
+
+    def _dispatch(self, executor, now):
+        """Porneste produsele scadente, respectand limita per site si limita totala"""
+        inflight = sum(self.active.values())
+        while self.heap and self.heap[0][0] <= now and inflight < self.max_workers:
+            due, product_id = heapq.heappop(self.heap)
+            product = self.products.get(product_id)
+            if product is None:
+                continue
+            if self.active[product['site_key']] >= self.per_site:
+                # Revine in heap doar cand se elibereaza un slot pe site (vezi _finish)
+                heapq.heappush(self.parked[product['site_key']], (due, product_id))
+                continue
+            self.active[product['site_key']] += 1
+            inflight += 1
+            executor.submit(metrics.bind(self._scrape), product)
+
+    def write_metrics(self):
+        """Scrie metricile rularii in format Prometheus (pentru textfile collector)"""
+        if not self.metrics_file:
+            return
+        temp_path = f"{self.metrics_file}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(metrics.current().to_prometheus())
+        os.replace(temp_path, self.metrics_file)
+
+    def run(self, max_runtime=None):
+        with metrics.run('scheduler', self.scraper.storage) as run_metrics:
+            self._loop(max_runtime)
+        self.write_metrics()
+        metrics.print_summary(run_metrics)
+
+    def _loop(self, max_runtime):
+        self.running = True
+        self.load_products()
+        print(f"Scheduler pornit: {len(self.products)} produse")
+
+        started = time.time()
+        last_reload = started
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                while self.running:
+                    now = time.time()
+                    if max_runtime is not None and now - started >= max_runtime:
+                        break
+                    if now - last_reload >= self.reload_every:
+                        added = self.load_products()
+                        if added:
+                            print(f"{added} produse noi programate")
+                        self.write_metrics()
+                        last_reload = now
+
+                    self._dispatch(executor, now)
+
+                    # Asteapta fie un rezultat, fie urmatorul produs scadent
+                    wait = 5.0
+                    if self.heap:
+                        wait = min(wait, max(0.05, self.heap[0][0] - time.time()))
+                    if max_runtime is not None:
+                        wait = min(wait, max(0.05, started + max_runtime - time.time()))
+                    try:
+                        self._finish(*self.results.get(timeout=wait))
+                        while True:
+                            self._finish(*self.results.get_nowait())
+                    except queue.Empty:
+                        pass
+            except KeyboardInterrupt:
+                print("\nOpresc scheduler-ul...")
+            finally:
+                self.running = False
+                # Rezultatele request-urilor deja pornite se salveaza inainte de iesire
+                while sum(self.active.values()) > 0:
+                    self._finish(*self.results.get())
+
+    def stop(self):
+        self.running = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='prices.db')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--per-site', type=int, default=2, help='request-uri simultane pe acelasi site')
+    parser.add_argument('--delay', type=float, default=3, help='pauza minima intre request-uri pe acelasi site')
+    parser.add_argument('--min-interval', type=int, default=1800, help='secunde')
+    parser.add_argument('--max-interval', type=int, default=7 * 86400, help='secunde')
+    parser.add_argument('--retry-delay', type=int, default=300, help='prima reincercare dupa un esec, in secunde')
+    parser.add_argument('--max-runtime', type=float, help='opreste dupa atatea secunde')
+    parser.add_argument('--metrics-file', help='fisier .prom rescris periodic cu metricile rularii')
+    args = parser.parse_args(argv)
+
+    scheduler = PriceScheduler(
+        SmartPriceScraper(args.db),
+        max_workers=args.workers,
+        per_site=args.per_site,
+        delay=args.delay,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        retry_delay=args.retry_delay,
+        metrics_file=args.metrics_file
+    )
+    scheduler.run(max_runtime=args.max_runtime)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Worker fara interfata pentru scraping distribuit: revendica joburi din coada
+comuna, scrapeaza produsele si scrie preturile. Mai multe masini sau procese
+pornite pe aceeasi coada isi impart catalogul fara sa faca aceeasi munca de doua ori.
+
+    python scrape_worker.py --db /date/prices.db --threads 16
+    python scrape_worker.py --db prices.db --queue sqlite:/date/jobs.db --worker-id host-2
+    python scrape_worker.py --db prices.db --status
+
+Jobul unui produs devine scadent la products.next_due; dupa scrape intervalul
+se adapteaza ca in scheduler.py. Cand coada sta in baza cu preturile, pretul si
+terminarea jobului se scriu in aceeasi tranzactie; un worker care si-a pierdut
+lease-ul nu mai scrie nimic, deci fiecare rezultat ajunge o singura data.
+Pauza --delay pe site se aplica in fiecare worker, nu intre workeri.
+"""
+import argparse
+import os
+import queue
+import socket
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import metrics
+from http_client import DomainRateLimiter
+from job_queue import LeaseLost, open_queue
+from scheduler import adapt_interval, to_timestamp
+from scraper_online import ScrapeResult, SmartPriceScraper
+
+
+class QueueWorker:
+    """
+    Bucla unui worker: claim pe loturi de batch_size joburi, scrape pe thread-uri
+    (cate per_site simultan pe acelasi site), scriere din thread-ul principal.
+    Lease-urile lotului se prelungesc cat timp scrape-ul dureaza.
+    """
+    def __init__(self, scraper, job_queue, worker_id=None, threads=8, per_site=2, delay=3,
+                 batch_size=32, lease_seconds=600, retry_delay=300, idle_sleep=5, sync_every=300,
+                 min_interval=1800, max_interval=7 * 86400):
+        self.scraper = scraper
+        self.queue = job_queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.threads = threads
+        self.per_site = per_site
+        self.limiter = DomainRateLimiter(delay)
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        self.idle_sleep = idle_sleep
+        self.sync_every = sync_every
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.summary = None
+        self.running = False
+
+    def sync_products(self):
+        """Produsele fara job intra in coada, scadente la next_due (produsele noi imediat)"""
+        rows = self.scraper.storage.query('SELECT id, next_due FROM products')
+        return self.queue.enqueue((product_id, to_timestamp(next_due)) for product_id, next_due in rows)
+
+    def load_products(self, jobs):
+        placeholders = ','.join('?' * len(jobs))
+        rows = self.scraper.storage.query(f'''
+            SELECT id, name, url, selector, site_name, refresh_interval
+            FROM products WHERE id IN ({placeholders})
+        ''', [job.product_id for job in jobs])
+        return {row[0]: row for row in rows}
+
+    def run_batch(self, jobs):
+        """Scrapeaza un lot revendicat; intoarce cate joburi au fost terminate"""
+        products = self.load_products(jobs)
+        # Produsele sterse intre timp nu mai au ce scrapa
+        missing = [job.product_id for job in jobs if job.product_id not in products]
+        if missing:
+            self.summary['removed'] += self.queue.remove(missing)
+        jobs = {job.product_id: job for job in jobs if job.product_id in products}
+        if not jobs:
+            return 0
+
+        by_site = defaultdict(list)
+        for product_id in jobs:
+            product = products[product_id]
+            by_site[self.scraper.detect_site_name(product[2])].append(product)
+        lanes = [(site_key, site_products[lane::self.per_site])
+                 for site_key, site_products in by_site.items()
+                 for lane in range(self.per_site) if site_products[lane::self.per_site]]
+
+        results = queue.Queue()
+
+        def scrape_lane(site_key, lane_products):
+            for product in lane_products:
+                result = ScrapeResult(None, False, False, product[3], [])
+                try:
+                    self.limiter.wait(site_key)
+                    result = self.scraper.scrape_product(product[2], product[3])
+                except Exception as e:
+                    metrics.current().incr('errors', site_key, stage='scrape')
+                    print(f"Eroare la scraping {product[2]}: {e}")
+                finally:
+                    results.put((product, result))
+
+        pending = dict(jobs)
+        renewed = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.threads, len(lanes)))) as executor:
+            for site_key, lane_products in lanes:
+                executor.submit(metrics.bind(scrape_lane), site_key, lane_products)
+
+            while pending:
+                try:
+                    product, result = results.get(timeout=self.lease_seconds / 4)
+                    self._finish(pending.pop(product[0]), product, result)
+                except queue.Empty:
+                    pass
+                if pending and time.monotonic() - renewed >= self.lease_seconds / 4:
+                    held = self.queue.extend(list(pending.values()), self.lease_seconds)
+                    if len(held) < len(pending):
+                        print(f"{len(pending) - len(held)} lease-uri pierdute; rezultatele lor se ignora")
+                    renewed = time.monotonic()
+        return len(jobs)
+
+    def _finish(self, job, product, result):
+        product_id, name, url, selector, site_name, interval = product
+        self.summary['jobs'] += 1
+        now = datetime.now().isoformat()
+        price = result.price
+
+        if not price:
+            if result.missed:
+                with self.scraper.storage.transaction() as cursor:
+                    self.scraper.record_selector(cursor, product_id, selector, result)
+            # Reincercarile se fac tot mai rar, pana la max_interval
+            retry_at = time.time() + min(self.max_interval, self.retry_delay * 2 ** (job.attempts - 1))
+            if self.queue.fail(job, retry_at, 'pret negasit'):
+                self.summary['failed'] += 1
+            else:
+                self.summary['lost'] += 1
+            print(f"{now[:19]} | {name[:40]:<40} | - RON | negasit (incercarea {job.attempts})")
+            return
+
+        # Coada din aceeasi baza se actualizeaza in tranzactia pretului; altfel separat, inainte de commit
+        shared = self.queue.storage is self.scraper.storage
+        # Alt worker poate sa fi scris intre timp pretul acestui produs; ultimul pret se citeste din baza
+        self.scraper.latest_prices.pop(product_id, None)
+        try:
+            with metrics.current().timer('db_write'), self.scraper.price_transaction() as cursor:
+                changed = self.scraper.insert_prices(cursor, [(product_id, price, now)]) > 0
+                self.scraper.record_selector(cursor, product_id, selector, result)
+                interval = adapt_interval(interval or 21600, changed, self.min_interval, self.max_interval)
+                next_due = time.time() + interval
+                cursor.execute('UPDATE products SET refresh_interval = ?, next_due = ? WHERE id = ?', (
+                    interval, datetime.fromtimestamp(next_due).isoformat(), product_id
+                ))
+                if not self.queue.complete(job, next_due, cursor if shared else None):
+                    raise LeaseLost(product_id)
+        except LeaseLost:
+            self.scraper.latest_prices.pop(product_id, None)
+            self.summary['lost'] += 1
+            print(f"{now[:19]} | {name[:40]:<40} | lease pierdut, rezultat ignorat")
+            return
+
+        self.summary['prices'] += 1
+        self.summary['changed'] += changed
+        status = 'schimbat' if changed else 'neschimbat'
+        print(f"{now[:19]} | {name[:40]:<40} | {price} RON | {status} | urmatorul in {interval // 60} min")
+
+    def run(self, max_runtime=None, once=False):
+        """Lucreaza pana la oprire; cu once=True se opreste cand nu mai sunt joburi scadente"""
+        self.summary = {'jobs': 0, 'prices': 0, 'changed': 0, 'failed': 0, 'lost': 0, 'removed': 0}
+        start = time.perf_counter()
+        with metrics.run('worker', self.scraper.storage) as run_metrics:
+            self._loop(max_runtime, once)
+        if self.scraper.cache:
+            self.scraper.cache.evict()
+        self.summary['elapsed'] = time.perf_counter() - start
+        self.summary['metrics'] = run_metrics
+        return self.summary
+
+    def _loop(self, max_runtime, once):
+        self.running = True
+        started = time.time()
+        last_sync = None
+        print(f"Worker {self.worker_id} pornit")
+        try:
+            while self.running:
+                now = time.time()
+                if max_runtime is not None and now - started >= max_runtime:
+                    break
+                if last_sync is None or now - last_sync >= self.sync_every:
+                    added = self.sync_products()
+                    requeued = self.queue.requeue_expired()
+                    if added or requeued:
+                        print(f"{added} joburi noi, {requeued} lease-uri expirate reintroduse in coada")
+                    last_sync = now
+
+                jobs = self.queue.claim(self.worker_id, self.batch_size, self.lease_seconds)
+                if jobs:
+                    self.run_batch(jobs)
+                elif once:
+                    break
+                else:
+                    time.sleep(self.idle_sleep)
+        except KeyboardInterrupt:
+            # Joburile revendicate si neterminate revin in coada cand le expira lease-ul
+            print("\nOpresc worker-ul...")
+        finally:
+            self.running = False
+
+    def stop(self):
+        self.running = False
+
+
+def print_status(stats):
+    print("\nStarea cozii de joburi:")
+    print("-" * 40)
+    print(f"Joburi:               {stats['total']}")
+    print(f"Scadente:             {stats['ready']}")
+    print(f"Programate:           {stats['scheduled']}")
+    print(f"In lucru:             {stats['leased']}")
+    print(f"Lease expirat:        {stats['expired']}")
+    print(f"Cu erori:             {stats['failing']}")
+    for worker_id, count in sorted(stats['workers'].items()):
+        print(f"  {worker_id:<30} {count}")
+
+
+def print_summary(summary):
+    print("\nRezumat worker:")
+    print("-" * 40)
+    print(f"Joburi:               {summary['jobs']}")
+    print(f"Preturi scrise:       {summary['prices']}")
+    print(f"Preturi schimbate:    {summary['changed']}")
+    print(f"Esuate:               {summary['failed']}")
+    print(f"Lease-uri pierdute:   {summary['lost']}")
+    print(f"Produse sterse:       {summary['removed']}")
+    if 'elapsed' in summary:
+        print(f"Durata:               {summary['elapsed']:.1f}s")
+    if summary.get('metrics'):
+        metrics.print_summary(summary['metrics'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='prices.db')
+    parser.add_argument('--queue', default='sqlite',
+                        help="'sqlite' (in --db), 'sqlite:CALE' (alt fisier) sau 'memory'")
+    parser.add_argument('--worker-id', help='implicit host:pid')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--per-site', type=int, default=2, help='request-uri simultane pe acelasi site')
+    parser.add_argument('--delay', type=float, default=3, help='pauza minima intre request-uri pe acelasi site')
+    parser.add_argument('--batch', type=int, default=32, help='joburi revendicate deodata')
+    parser.add_argument('--lease', type=int, default=600, help='secunde cat un job ramane al worker-ului')
+    parser.add_argument('--retry-delay', type=int, default=300, help='prima reincercare dupa un esec, in secunde')
+    parser.add_argument('--min-interval', type=int, default=1800, help='secunde')
+    parser.add_argument('--max-interval', type=int, default=7 * 86400, help='secunde')
+    parser.add_argument('--max-runtime', type=float, help='opreste dupa atatea secunde')
+    parser.add_argument('--once', action='store_true', help='opreste cand nu mai sunt joburi scadente')
+    parser.add_argument('--status', action='store_true', help='afiseaza starea cozii si iese')
+    args = parser.parse_args(argv)
+
+    scraper = SmartPriceScraper(args.db)
+    job_queue = open_queue(args.queue, args.db)
+    if args.status:
+        print_status(job_queue.stats())
+        return
+
+    worker = QueueWorker(
+        scraper, job_queue,
+        worker_id=args.worker_id,
+        threads=args.threads,
+        per_site=args.per_site,
+        delay=args.delay,
+        batch_size=args.batch,
+        lease_seconds=args.lease,
+        retry_delay=args.retry_delay,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval
+    )
+    print_summary(worker.run(max_runtime=args.max_runtime, once=args.once))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,53 @@
-import requests
-from bs4 import BeautifulSoup
-import sqlite3
 from datetime import datetime
 import time
 import re
+import queue
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import metrics
+from http_client import DomainRateLimiter, get_default_client
+from http_cache import HttpCache, body_hash, cache_path_for
+from html_parsing import UnsupportedSelector, make_soup, select_first
+from selector_registry import SelectorRegistry
+from migrations import PRICE_MIGRATIONS, migrate
+from price_parser import PriceParser
+import price_summary
+from price_watch import PriceWatcher
+from product_matching import ProductMatcher, search_canonical
+from storage import get_storage
+from structured_data import STRATEGIES, extract_gtin, extract_structured_price, is_structured_selector
+
+
+# Rezultatul scrape-ului unui produs, fara nicio scriere in baza de date:
+# missed - selectorul salvat nu a gasit pretul in pagina
+# selector - selectorul care a gasit pretul (cel salvat sau unul detectat din nou)
+# outcomes - (site, selector, gasit) pentru SelectorRegistry.record
+ScrapeResult = namedtuple('ScrapeResult', 'price unchanged missed selector outcomes')
+
+# Dupa cate ratari consecutive ale selectorului salvat se trece pe cel detectat;
+# o singura ratare poate fi o pagina de eroare sau un produs indisponibil
+RELEARN_AFTER_MISSES = 3
+
 
 class SmartPriceScraper:
-    def __init__(self, db_name="prices.db"):
+    def __init__(self, db_name="prices.db", http_client=None, use_cache=True, read_only=False):
+        # read_only: doar extragere (de ex. procesele de parsare din pipeline), fara
+        # migrari si fara scrieri; baza trebuie sa existe deja
         self.db_name = db_name
-        self.init_database()
+        self.storage = get_storage(db_name, read_only=read_only)
+        self.http = http_client or get_default_client()
+        self.cache = HttpCache(cache_path_for(db_name)) if use_cache else None
+        # product_id -> (id-ul randului cu ultima serie de preturi, pret)
+        self.latest_prices = {}
+        self.matcher = ProductMatcher()
+        self.price_parser = PriceParser()
+        if not read_only:
+            self.init_database()
+        self.registry = SelectorRegistry(db_name, read_only=read_only)
+        self.watcher = None if read_only else PriceWatcher(self.storage)
         
         self.price_selectors = [
             '.product-new-price', '.product-price', '.price-new',
@@ -20,6 +59,9 @@ class SmartPriceScraper:
             '[property="product:price:amount"]', '[property="price"]'
         ]
         
+        # Selectori unde pretul e impartit in parte intreaga + <sup> cu zecimalele
+        self.split_price_selectors = ['.product-new-price', '.pret_n']
+        
         self.title_selectors = [
             'h1', '.product-title', '.product-name', 
             '[property="og:title"]', 'title',
@@ -27,58 +69,11 @@ class SmartPriceScraper:
         ]
     
     def init_database(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                url TEXT NOT NULL,
-                selector TEXT NOT NULL,
-                site_name TEXT NOT NULL,
-                auto_detected INTEGER DEFAULT 1
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS prices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER,
-                price REAL,
-                date_scraped TEXT,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        migrate(self.storage, PRICE_MIGRATIONS)
     
     def extract_price(self, text):
-        if not text:
-            return None
-            
-        text = re.sub(r'[^\d.,\s]', '', text)
-        
-        price_patterns = [
-            r'(\d{1,3}(?:[.,]\d{3})*[.,]\d{2})',  
-            r'(\d{1,3}(?:[.,]\d{3})+)',           
-            r'(\d+[.,]\d{2})',                    
-            r'(\d+)'                              
-        ]
-        
-        for pattern in price_patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                price_str = matches[0].replace(',', '.')
-                try:
-                    price = float(price_str)
-                    if 10 <= price <= 50000: 
-                        return price
-                except ValueError:
-                    continue
-        
-        return None
+        """Pretul dintr-un text de pe pagina ("1.299,99 lei"); vezi PriceParser"""
+        return self.price_parser.parse(text)
     
     def detect_site_name(self, url):
         import urllib.parse
@@ -104,18 +99,7 @@ class SmartPriceScraper:
     def get_page_content(self, url):
         """Obtine continutul paginii"""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'ro-RO,ro;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
+            response = self.http.get(url)
             return response.content
             
         except Exception as e:
@@ -149,146 +133,465 @@ class SmartPriceScraper:
         
         return f"Produs de pe {self.detect_site_name(url)}"
     
-    def detect_price_selector(self, soup):
+    def detect_price_selector(self, soup, exclude=()):
         emag_selectors = [
             '.product-new-price', '.product-price', '[itemprop="price"]', '[data-product-price]', '[data-price]'
         ]
         cel_selectors = [
             '.pret_n', '.pret', '[itemprop="price"]', '[data-price]'
         ]
-        all_selectors = emag_selectors + cel_selectors + self.price_selectors
+        # Pastreaza ordinea, dar fara selectori duplicati
+        all_selectors = list(dict.fromkeys(emag_selectors + cel_selectors + self.price_selectors))
 
         for selector in all_selectors:
-            try:
-                elements = soup.select(selector)
-                if selector in ['.product-new-price', '.pret_n']:
-                    if elements:
-                        price = self.extract_emag_price(elements[0])
-                        if price:
-                            return selector, price
-                    continue  
-                for element in elements:
-                    price = None
-                    if element.has_attr('content'):
-                        price = self.extract_price(element['content'])
-                    if not price and element.has_attr('data-price'):
-                        price = self.extract_price(element['data-price'])
-                    if not price and element.has_attr('data-product-price'):
-                        price = self.extract_price(element['data-product-price'])
-                    if not price:
-                        price = self.extract_price(element.get_text(strip=True))
-                    if price:
-                        return selector, price
-            except Exception:
+            if selector in exclude:
                 continue
+            price = self.price_for_selector(soup, selector)
+            if price:
+                return selector, price
 
         return None, None
     
-    def auto_add_product(self, url):
-        print(f"Analizez pagina: {url}")
+    def element_price(self, element, selector):
+        """Pretul dintr-un element gasit de selector (atribute content/data-*, apoi text)"""
+        if selector in self.split_price_selectors:
+            return self.extract_emag_price(element)
+        price = None
+        if element.has_attr('content'):
+            price = self.extract_price(element['content'])
+        if not price and element.has_attr('data-price'):
+            price = self.extract_price(element['data-price'])
+        if not price and element.has_attr('data-product-price'):
+            price = self.extract_price(element['data-product-price'])
+        if not price:
+            price = self.extract_price(element.get_text(strip=True))
+        return price
+    
+    def price_for_selector(self, soup, selector):
+        try:
+            elements = soup.select(selector)
+            if selector in self.split_price_selectors:
+                elements = elements[:1]
+            for element in elements:
+                price = self.element_price(element, selector)
+                if price:
+                    return price
+        except Exception:
+            pass
+        return None
+    
+    def detect_price(self, content, soup, site_name, exclude=(), outcomes=None):
+        """
+        Ordinea: selectorii deja dovediti pe acest site, datele structurate
+        (JSON-LD, microdata, OpenGraph), apoi cascada completa de selectori CSS.
+        Cu outcomes (o lista), rezultatele pentru registry se adauga acolo in loc
+        sa fie scrise, ca detectia sa poata rula pe alt thread sau in alt proces.
+        """
+        def record(selector, found):
+            if outcomes is not None:
+                outcomes.append((site_name, selector, found))
+            elif found:
+                self.registry.record_hit(site_name, selector)
+            else:
+                self.registry.record_miss(site_name, selector)
+        
+        for selector in self.registry.candidates(site_name):
+            if selector in exclude:
+                continue
+            if is_structured_selector(selector):
+                price = self.extract_price_from_content(content, selector)
+            else:
+                price = self.price_for_selector(soup, selector)
+            if price:
+                record(selector, True)
+                return selector, price
+            record(selector, False)
+        
+        strategy, price = extract_structured_price(content)
+        if strategy and strategy not in exclude:
+            record(strategy, True)
+            return strategy, price
+        
+        selector, price = self.detect_price_selector(soup, exclude)
+        if selector:
+            record(selector, True)
+            return selector, price
+        
+        return None, None
+    
+    def record_selector(self, cursor, product_id, stored_selector, result):
+        """
+        Aplica in tranzactia data ce a aflat scrape-ul despre selectorul produsului.
+        Selectorul salvat se inlocuieste abia dupa RELEARN_AFTER_MISSES ratari
+        consecutive; intoarce selectorul nou cand l-a inlocuit, altfel None.
+        """
+        self.registry.record(cursor, result.outcomes)
+        if product_id is None:
+            return None
+        if not result.missed:
+            if result.price:
+                cursor.execute('UPDATE products SET selector_misses = 0 WHERE id = ? AND selector_misses > 0',
+                               (product_id,))
+            return None
+        
+        cursor.execute('''
+            UPDATE products SET selector_misses = selector_misses + 1 WHERE id = ?
+            RETURNING selector_misses
+        ''', (product_id,))
+        row = cursor.fetchone()
+        if not row or not result.selector or row[0] < RELEARN_AFTER_MISSES:
+            return None
+        
+        cursor.execute('UPDATE products SET selector = ?, selector_misses = 0 WHERE id = ?',
+                       (result.selector, product_id))
+        print(f" Selector nou dupa {row[0]} ratari: {result.selector} (inlocuieste {stored_selector})")
+        return result.selector
+    
+    def analyze_product(self, url, verbose=True):
+        """Detecteaza numele, pretul si selectorul unui produs, fara sa scrie in baza de date"""
+        log = print if verbose else (lambda *args: None)
+        log(f"Analizez pagina: {url}")
         
         content = self.get_page_content(url)
         if not content:
-            print(" Nu pot accesa pagina")
-            return False
+            log(" Nu pot accesa pagina")
+            return None
         
-        soup = BeautifulSoup(content, 'html.parser')
+        collector = metrics.current()
+        domain = urlparse(url).hostname or ''
+        with collector.timer('parse', domain):
+            soup = make_soup(content)
         
         product_name = self.detect_product_name(soup, url)
-        print(f" Produs detectat: {product_name}")
+        log(f" Produs detectat: {product_name}")
         
-        price_selector, detected_price = self.detect_price_selector(soup)
+        site_name = self.detect_site_name(url)
+        # Ruleaza si din thread-urile importului in masa: rezultatele pentru registry
+        # se scriu abia in save_products
+        outcomes = []
+        with collector.timer('select', domain):
+            price_selector, detected_price = self.detect_price(content, soup, site_name, outcomes=outcomes)
         
         if not price_selector:
-            print(" Nu am gasit pretul pe aceasta pagina")
-            return False
-        
-        print(f" Pret detectat: {detected_price} RON (selector: {price_selector})")
+            log(" Nu am gasit pretul pe aceasta pagina")
+            return None
         
-        site_name = self.detect_site_name(url)
-        print(f" Site: {site_name}")
+        log(f" Pret detectat: {detected_price} RON (selector: {price_selector})")
+        log(f" Site: {site_name}")
+        
+        return {
+            'name': product_name,
+            'url': url,
+            'selector': price_selector,
+            'site_name': site_name,
+            'price': detected_price,
+            'gtin': extract_gtin(content),
+            'selector_outcomes': outcomes
+        }
+    
+    def save_products(self, products):
+        """Salveaza produsele noi si pretul initial intr-o singura tranzactie"""
+        if not products:
+            return 0
         
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        now = datetime.now().isoformat()
         
-        cursor.execute('''
-            INSERT INTO products (name, url, selector, site_name, auto_detected)
-            VALUES (?, ?, ?, ?, 1)
-        ''', (product_name, url, price_selector, site_name))
+        initial_prices = []
+        try:
+            with metrics.current().timer('db_write'), self.price_transaction() as cursor:
+                for product in products:
+                    self.registry.record(cursor, product.get('selector_outcomes', ()))
+                    # URL-ul e unic: un produs deja monitorizat nu se adauga a doua oara
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO products (name, url, selector, site_name, auto_detected, gtin)
+                        VALUES (?, ?, ?, ?, 1, ?)
+                    ''', (product['name'], product['url'], product['selector'], product['site_name'], product.get('gtin')))
+                    if not cursor.rowcount:
+                        continue
+                    product_id = cursor.lastrowid
+                    initial_prices.append((product_id, product['price'], now))
+                    # Acelasi produs de pe alt site primeste acelasi id canonic
+                    canonical_id = self.matcher.assign(cursor, product['name'], product.get('gtin'))
+                    cursor.execute('UPDATE products SET canonical_id = ? WHERE id = ?', (canonical_id, product_id))
+                
+                self.insert_prices(cursor, initial_prices)
+        except Exception:
+            # Produsele canonice create in tranzactie au disparut la rollback
+            self.matcher.reset()
+            raise
         
-        product_id = cursor.lastrowid
+        return len(initial_prices)
+    
+    def record_prices(self, rows, selector_results=()):
+        """
+        Scrie un lot de (product_id, pret, data) intr-o singura tranzactie, impreuna
+        cu rezultatele (product_id, selector salvat, ScrapeResult) pentru record_selector
+        """
+        if not rows and not selector_results:
+            return 0
+        with metrics.current().timer('db_write'), self.price_transaction() as cursor:
+            created = self.insert_prices(cursor, rows)
+            for product_id, selector, result in selector_results:
+                self.record_selector(cursor, product_id, selector, result)
+            return created
+    
+    @contextmanager
+    def price_transaction(self):
+        """
+        Tranzactia in care se scriu preturi: regulile de urmarire se evalueaza la
+        fiecare pret, dar alertele pleaca doar dupa commit
+        """
+        try:
+            with self.storage.transaction() as cursor:
+                yield cursor
+        except BaseException:
+            self.watcher.discard()
+            raise
+        self.watcher.flush()
+    
+    def load_latest_prices(self):
+        """Incarca intr-o singura interogare ultimul pret al fiecarui produs"""
+        rows = self.storage.query('SELECT product_id, latest_id, latest_price FROM product_summary')
+        self.latest_prices = {product_id: (row_id, price) for product_id, row_id, price in rows}
+        return self.latest_prices
+    
+    def latest_price(self, cursor, product_id):
+        if product_id not in self.latest_prices:
+            cursor.execute('''
+                SELECT id, price FROM prices WHERE product_id = ?
+                ORDER BY date_scraped DESC, id DESC LIMIT 1
+            ''', (product_id,))
+            self.latest_prices[product_id] = cursor.fetchone()
+        return self.latest_prices[product_id]
+    
+    def insert_prices(self, cursor, rows):
+        """
+        Salveaza doar schimbarile de pret: un pret egal cu ultimul prelungeste seria
+        existenta (last_seen, samples), unul diferit deschide o serie noua.
+        Rezumatul produsului (product_summary) se actualizeaza in aceeasi tranzactie,
+        apoi se evalueaza regulile de urmarire (vezi price_transaction).
+        Returneaza cate serii noi s-au creat.
+        """
+        created = 0
+        for product_id, price, date_scraped in rows:
+            latest = self.latest_price(cursor, product_id)
+            if latest and latest[1] == price:
+                # Conditiile pe produs si pret protejeaza de un cache ramas in urma
+                cursor.execute('''
+                    UPDATE prices SET last_seen = MAX(last_seen, ?), samples = samples + 1
+                    WHERE id = ? AND product_id = ? AND price = ?
+                ''', (date_scraped, latest[0], product_id, price))
+                if cursor.rowcount:
+                    price_summary.record(cursor, product_id, latest[0], price, date_scraped)
+                    self.watcher.check(cursor, product_id, latest[0], price, date_scraped)
+                    continue
+    
+            cursor.execute('''
+                INSERT INTO prices (product_id, price, date_scraped, last_seen, samples)
+                VALUES (?, ?, ?, ?, 1)
+            ''', (product_id, price, date_scraped, date_scraped))
+            row_id = cursor.lastrowid
+            self.latest_prices[product_id] = (row_id, price)
+            price_summary.record(cursor, product_id, row_id, price, date_scraped)
+            self.watcher.check(cursor, product_id, row_id, price, date_scraped)
+            created += 1
+        return created
+    
+    def existing_urls(self):
+        return {row[0] for row in self.storage.query('SELECT url FROM products')}
+    
+    def auto_add_product(self, url):
+        if self.storage.query_one('SELECT 1 FROM products WHERE url = ?', (url,)):
+            print(" Produsul este deja monitorizat")
+            return False
         
-        cursor.execute('''
-            INSERT INTO prices (product_id, price, date_scraped)
-            VALUES (?, ?, ?)
-        ''', (product_id, detected_price, datetime.now().isoformat()))
+        product = self.analyze_product(url)
+        if not product:
+            return False
         
-        conn.commit()
-        conn.close()
+        self.save_products([product])
         
         print(" Produs adaugat cu succes!")
         return True
     
     def scrape_price(self, url, selector):
-        content = self.get_page_content(url)
-        if not content:
-            return None
-        
-        soup = BeautifulSoup(content, 'html.parser')
+        price, _ = self.fetch_price(url, selector)
+        return price
+    
+    def fetch_page(self, url, selector):
+        """
+        Descarcarea cu cache conditional: (pret, None) cand pagina nu s-a modificat
+        de la ultimul scrape, altfel (None, raspuns). Erorile de retea se propaga.
+        """
+        collector = metrics.current()
+        domain = urlparse(url).hostname or ''
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and (entry['selector'] != selector or entry['price'] is None):
+            entry = None
+        
+        headers = self.cache.conditional_headers(entry) if self.cache else None
+        response = self.http.get(url, headers=headers)
+        
+        if response.status_code == 304 and entry:
+            collector.incr('cache_hits', domain, kind='not_modified')
+            self.cache.touch(url)
+            return entry['price'], None
+        
+        if entry and entry['body_hash'] == body_hash(response.content):
+            collector.incr('cache_hits', domain, kind='same_body')
+            self.cache.store(url, response, entry['body_hash'], selector, entry['price'])
+            return entry['price'], None
+        if self.cache:
+            collector.incr('cache_misses', domain)
+        return None, response
+    
+    def fetch_price(self, url, selector):
+        """
+        Returneaza (pret, neschimbat); sare peste parsare cand pagina nu s-a modificat.
+        Scrie imediat ce s-a aflat despre selector, deci e pentru apeluri din thread-ul
+        principal; scrape-urile concurente folosesc scrape_product si record_selector.
+        """
+        result = self.scrape_product(url, selector)
+        if result.missed or result.price:
+            with self.storage.transaction() as cursor:
+                cursor.execute('SELECT id FROM products WHERE url = ?', (url,))
+                row = cursor.fetchone()
+                self.record_selector(cursor, row and row[0], selector, result)
+        return result.price, result.unchanged
+    
+    def scrape_product(self, url, selector):
+        """Descarca pagina si extrage pretul, fara scrieri in baza de date; intoarce un ScrapeResult"""
+        try:
+            cached_price, response = self.fetch_page(url, selector)
+        except Exception as e:
+            print(f"Eroare la accesarea paginii: {e}")
+            return ScrapeResult(None, False, False, selector, [])
+        if response is None:
+            return ScrapeResult(cached_price, True, False, selector, [])
+        
+        result = self.extract_result(url, response.content, selector)
+        if self.cache and result.price:
+            self.cache.store(url, response, body_hash(response.content), result.selector, result.price)
+        return result
+    
+    def extract_result(self, url, content, selector):
+        """
+        Pretul cu selectorul salvat; daca acesta nu gaseste nimic, detectia completa.
+        Nu scrie in baza de date: rezultatele pentru registry raman in ScrapeResult.outcomes.
+        """
+        collector = metrics.current()
+        domain = urlparse(url).hostname or ''
+        price = self.extract_price_from_content(content, selector, domain)
+        if price:
+            return ScrapeResult(price, False, False, selector, [])
+        
+        collector.incr('relearned', domain)
+        site_name = self.detect_site_name(url)
+        outcomes = [(site_name, selector, False)]
+        with collector.timer('parse', domain):
+            soup = make_soup(content)
+        with collector.timer('select', domain):
+            new_selector, price = self.detect_price(content, soup, site_name, exclude={selector}, outcomes=outcomes)
+        return ScrapeResult(price, False, True, new_selector, outcomes)
+    
+    def extract_price_from_content(self, content, selector, domain=''):
+        collector = metrics.current()
+        if is_structured_selector(selector):
+            with collector.timer('parse', domain):
+                if isinstance(content, bytes):
+                    content = content.decode('utf-8', errors='replace')
+                return STRATEGIES[selector](content)
         
         try:
-            price_element = soup.select_one(selector)
-            if price_element:
-                price_text = price_element.get_text(strip=True)
-                return self.extract_price(price_text)
+            # Selectorii simpli (.clasa, tag, [attr]) se extrag direct, fara arborele complet;
+            # parsarea tintita si potrivirea selectorului sunt un singur pas
+            with collector.timer('select', domain):
+                price_element = select_first(content, selector)
+        except UnsupportedSelector:
+            with collector.timer('parse', domain):
+                soup = make_soup(content)
+            with collector.timer('select', domain):
+                price_element = soup.select_one(selector)
         except Exception as e:
+            collector.incr('errors', domain, stage='extract')
             print(f"Eroare la extragerea pretului: {e}")
+            return None
         
+        if price_element:
+            return self.element_price(price_element, selector)
         return None
     
-    def scrape_all_products(self):
-        """Scrapeaza toate produsele din baza de date"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id, name, url, selector, site_name FROM products')
-        products = cursor.fetchall()
+    def scrape_all_products(self, max_workers=8, delay=3, batch_size=100):
+        """Scrapeaza toate produsele din baza de date, cate un worker pe site"""
+        products = self.storage.query('SELECT id, name, url, selector, site_name FROM products')
         
         if not products:
             print("Nu exista produse de monitorizat!")
-            conn.close()
             return
         
-        print(f"Scrapez {len(products)} produse...")
-        
+        # Grupeaza produsele pe site: site-urile diferite se scrapeaza in paralel,
+        # iar pauza dintre request-uri se aplica doar pe acelasi site
+        by_site = defaultdict(list)
         for product in products:
-            product_id, name, url, selector, site_name = product
-            print(f"\n {name} ({site_name})")
-            
-            price = self.scrape_price(url, selector)
-            
-            if price:
-                cursor.execute('''
-                    INSERT INTO prices (product_id, price, date_scraped)
-                    VALUES (?, ?, ?)
-                ''', (product_id, price, datetime.now().isoformat()))
+            by_site[self.detect_site_name(product[2])].append(product)
+        
+        print(f"Scrapez {len(products)} produse de pe {len(by_site)} site-uri...")
+        self.load_latest_prices()
+        
+        limiter = DomainRateLimiter(delay)
+        results = queue.Queue()
+        
+        def scrape_site(site_key, site_products):
+            for product in site_products:
+                result = ScrapeResult(None, False, False, product[3], [])
+                try:
+                    limiter.wait(site_key)
+                    result = self.scrape_product(product[2], product[3])
+                except Exception as e:
+                    metrics.current().incr('errors', urlparse(product[2]).hostname, stage='scrape')
+                    print(f"Eroare la scraping {product[2]}: {e}")
+                finally:
+                    results.put((product, result))
+        
+        # Metricile rularii (timpi pe etapa si domeniu) se salveaza in scrape_runs
+        with metrics.run('scrape_all', self.storage) as run_metrics:
+            pending = []
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(by_site)))) as executor:
+                for site_key, site_products in by_site.items():
+                    executor.submit(metrics.bind(scrape_site), site_key, site_products)
                 
-                print(f" Pret: {price} RON")
-            else:
-                print(" Nu s-a gasit pretul")
+                # Scrierile in baza de date (preturi si selectori) raman in thread-ul principal
+                selector_results = []
+                for _ in range(len(products)):
+                    product, result = results.get()
+                    product_id, name, url, selector, site_name = product
+                    print(f"\n {name} ({site_name})")
+                    
+                    if result.missed or result.price:
+                        selector_results.append((product_id, selector, result))
+                    if result.price:
+                        pending.append((product_id, result.price, datetime.now().isoformat()))
+                        if len(pending) >= batch_size:
+                            self.record_prices(pending, selector_results)
+                            pending, selector_results = [], []
+                        
+                        if result.unchanged:
+                            print(f" Pret neschimbat: {result.price} RON (din cache)")
+                        else:
+                            print(f" Pret: {result.price} RON")
+                    else:
+                        print(" Nu s-a gasit pretul")
             
-            time.sleep(3)  # Pauza între requests
+            self.record_prices(pending, selector_results)
         
-        conn.commit()
-        conn.close()
+        if self.cache:
+            self.cache.evict()
+        metrics.print_summary(run_metrics)
         print("\n Scraping terminat!")
     
     def get_price_history(self, product_name):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT p.name, p.site_name, pr.price, pr.date_scraped
+        results = self.storage.query('''
+            SELECT p.name, p.site_name, pr.price, pr.date_scraped, pr.last_seen, pr.samples
             FROM products p
             JOIN prices pr ON p.id = pr.product_id
             WHERE p.name LIKE ?
@@ -296,66 +599,67 @@ class SmartPriceScraper:
             LIMIT 20
         ''', (f'%{product_name}%',))
         
-        results = cursor.fetchall()
-        
         if results:
             print(f"\n Istoricul preturilor pentru '{product_name}':")
             print("-" * 60)
-            for name, site, price, date in results:
-                date_formatted = date[:19].replace('T', ' ')
-                print(f"{date_formatted} | {site:15} | {price:8.2f} RON")
+            # Fiecare rand e o serie de preturi egale, de la prima la ultima observare
+            for name, site, price, first_seen, last_seen, samples in results:
+                first_formatted = first_seen[:19].replace('T', ' ')
+                last_formatted = (last_seen or first_seen)[:19].replace('T', ' ')
+                print(f"{first_formatted} - {last_formatted} | {site:15} | {price:8.2f} RON | {samples}x")
         else:
             print(f" Nu exista date pentru '{product_name}'")
-        
-        conn.close()
     
     def compare_prices(self, product_name):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT p.site_name, 
-                   MIN(pr.price) as min_price, 
-                   MAX(pr.price) as max_price,
-                   AVG(pr.price) as avg_price, 
-                   COUNT(*) as count,
-                   MAX(pr.date_scraped) as last_update
+        # Cautarea merge pe indexul de tokenuri al produselor canonice; LIKE ramane
+        # doar pentru textele care nu contin niciun token intreg (ex. "Gala")
+        canonical_ids = search_canonical(self.storage, product_name)
+        if canonical_ids:
+            condition = f"p.canonical_id IN ({','.join('?' * len(canonical_ids))})"
+            params = canonical_ids
+        else:
+            condition = 'p.name LIKE ?'
+            params = [f'%{product_name}%']
+        
+        # Min/max/media vin din rezumatul fiecarui produs, nu din tot istoricul
+        results = self.storage.query(f'''
+            SELECT p.canonical_id, COALESCE(c.title, p.name), p.site_name,
+                   MIN(s.min_price) as min_price,
+                   MAX(s.max_price) as max_price,
+                   SUM(s.price_sum) / SUM(s.samples) as avg_price,
+                   SUM(s.samples) as count,
+                   MAX(s.last_seen) as last_update
             FROM products p
-            JOIN prices pr ON p.id = pr.product_id
-            WHERE p.name LIKE ?
-            GROUP BY p.site_name
-            ORDER BY min_price ASC
-        ''', (f'%{product_name}%',))
-        
-        results = cursor.fetchall()
+            JOIN product_summary s ON p.id = s.product_id
+            LEFT JOIN canonical_products c ON c.id = p.canonical_id
+            WHERE {condition}
+            GROUP BY p.canonical_id, p.site_name
+            ORDER BY p.canonical_id, min_price ASC
+        ''', params)
         
         if results:
             print(f"\n Comparatie preturi pentru '{product_name}':")
-            print("-" * 80)
-            print(f"{'Site':<15} | {'Min':<8} | {'Max':<8} | {'Mediu':<8} | {'Ultima'}")
-            print("-" * 80)
-            
-            for site, min_price, max_price, avg_price, count, last_update in results:
+            current = object()
+            for canonical_id, title, site, min_price, max_price, avg_price, count, last_update in results:
+                if canonical_id != current:
+                    current = canonical_id
+                    print(f"\n {title[:78]}")
+                    print("-" * 80)
+                    print(f"{'Site':<15} | {'Min':<8} | {'Max':<8} | {'Mediu':<8} | {'Ultima'}")
+                    print("-" * 80)
                 last_date = last_update[:10] if last_update else 'N/A'
                 print(f"{site:<15} | {min_price:8.2f} | {max_price:8.2f} | {avg_price:8.2f} | {last_date}")
         else:
             print(f" Nu exista date pentru '{product_name}'")
-        
-        conn.close()
     
     def list_products(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT p.name, p.site_name, p.url, COUNT(pr.id) as price_count,
-                   MAX(pr.date_scraped) as last_scrape
+        products = self.storage.query('''
+            SELECT p.name, p.site_name, p.url, COALESCE(s.samples, 0) as price_count,
+                   s.last_seen as last_scrape
             FROM products p
-            LEFT JOIN prices pr ON p.id = pr.product_id
-            GROUP BY p.id
+            LEFT JOIN product_summary s ON p.id = s.product_id
             ORDER BY last_scrape DESC
         ''')
-        products = cursor.fetchall()
         
         if products:
             print("\n Produse monitorizate:")
@@ -365,8 +669,6 @@ class SmartPriceScraper:
                 print(f" {name[:40]:<40} | {site:<12} | {count:3d} preturi | {last_date}")
         else:
             print(" Nu exista produse monitorizate")
-        
-        conn.close()
     
     def extract_emag_price(self, element):
         try:
@@ -393,6 +695,7 @@ def main():
         print("3.  Vezi istoricul preturilor")
         print("4.   Compara preturi")
         print("5.  Listeaza produse")
+        print("6.  Import produse din fisier (CSV/JSONL/TXT)")
         print("0.  Iesire")
         
         choice = input("\n Alegeti o optiune: ")
@@ -422,6 +725,17 @@ def main():
         elif choice == '5':
             scraper.list_products()
         
+        elif choice == '6':
+            path = input(" Calea fisierului cu URL-uri: ").strip()
+            if path:
+                from bulk_import import BulkImporter, detect_format, print_summary, read_urls
+                try:
+                    with open(path, encoding='utf-8', newline='') as f:
+                        summary = BulkImporter(scraper).import_urls(read_urls(f, detect_format(path)))
+                    print_summary(summary)
+                except OSError as e:
+                    print(f" Nu pot citi fisierul: {e}")
+        
         elif choice == '0':
             print(" La revedere!")
             break
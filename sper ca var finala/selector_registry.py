@@ -0,0 +1,75 @@
+from datetime import datetime
+
+from storage import get_storage
+
+
+HIT_SQL = '''
+    INSERT INTO domain_selectors (site_name, selector, hits, misses, last_success)
+    VALUES (?, ?, 1, 0, ?)
+    ON CONFLICT(site_name, selector) DO UPDATE SET
+        hits = hits + 1,
+        last_success = excluded.last_success
+'''
+
+MISS_SQL = '''
+    INSERT INTO domain_selectors (site_name, selector, hits, misses)
+    VALUES (?, ?, 0, 1)
+    ON CONFLICT(site_name, selector) DO UPDATE SET misses = misses + 1
+'''
+
+
+def create_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS domain_selectors (
+            site_name TEXT NOT NULL,
+            selector TEXT NOT NULL,
+            hits INTEGER DEFAULT 0,
+            misses INTEGER DEFAULT 0,
+            last_success TEXT,
+            PRIMARY KEY (site_name, selector)
+        )
+    ''')
+
+
+class SelectorRegistry:
+    """
+    Selectorii de pret invatati pe fiecare site, cu statistici de reusita.
+    Tabela domain_selectors e creata de migrarile din prices.db (vezi migrations.py).
+    """
+    def __init__(self, db_name, read_only=False):
+        self.db_name = db_name
+        self.storage = get_storage(db_name, read_only=read_only)
+
+    def candidates(self, site_name, limit=5):
+        """Selectorii dovediti pe site, cei mai de incredere primii"""
+        rows = self.storage.query('''
+            SELECT selector FROM domain_selectors
+            WHERE site_name = ? AND hits > 0
+            ORDER BY hits - misses DESC, last_success DESC
+            LIMIT ?
+        ''', (site_name, limit))
+        return [row[0] for row in rows]
+
+    def record_hit(self, site_name, selector):
+        self.storage.execute(HIT_SQL, (site_name, selector, datetime.now().isoformat()))
+
+    def record_miss(self, site_name, selector):
+        self.storage.execute(MISS_SQL, (site_name, selector))
+
+    def record(self, cursor, outcomes):
+        """Scrie in tranzactia data rezultatele (site, selector, gasit) adunate fara scrieri"""
+        now = datetime.now().isoformat()
+        hits = [(site_name, selector, now) for site_name, selector, found in outcomes if found]
+        misses = [(site_name, selector) for site_name, selector, found in outcomes if not found]
+        if hits:
+            cursor.executemany(HIT_SQL, hits)
+        if misses:
+            cursor.executemany(MISS_SQL, misses)
+
+    def stats(self, site_name=None):
+        query = 'SELECT site_name, selector, hits, misses, last_success FROM domain_selectors'
+        params = ()
+        if site_name:
+            query += ' WHERE site_name = ?'
+            params = (site_name,)
+        return self.storage.query(query + ' ORDER BY site_name, hits DESC', params)
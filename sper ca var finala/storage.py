@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+
+class Storage:
+    """
+    Strat comun de acces la SQLite: o conexiune de lunga durata pe fiecare thread,
+    in mod WAL, ca rapoartele sa poata citi in timp ce scraping-ul scrie.
+    Cu read_only=True conexiunile sunt deschise doar pentru citire (mode=ro).
+    """
+    def __init__(self, db_name, cache_size_kb=20000, busy_timeout_ms=10000, read_only=False):
+        self.db_name = db_name
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.read_only = read_only
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+
+    def _connect(self):
+        # Fiecare conexiune e folosita doar de thread-ul ei; check_same_thread=False
+        # permite doar ca close() sa le inchida pe toate din thread-ul principal
+        if self.read_only:
+            # Modul jurnalului (WAL) il stabileste scriitorul; o conexiune ro nu il poate schimba
+            uri = f"file:{pathname2url(os.path.abspath(self.db_name))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+            conn.execute('PRAGMA query_only = ON')
+        else:
+            conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA cache_size = -{int(self.cache_size_kb)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        return conn
+
+    def open_connection(self):
+        """O conexiune separata de cele per thread, cu aceleasi setari; o inchide apelantul"""
+        return self._connect()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def query(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def iterate(self, sql, params=(), chunk_size=10000):
+        """Rezultatul pe bucati de chunk_size randuri, fara sa fie tinut intreg in memorie"""
+        cursor = self.connection().execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """Un singur commit pentru tot blocul; rollback daca apare o exceptie"""
+        conn = self.connection()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            # Si la KeyboardInterrupt sau GeneratorExit: conexiunea thread-ului e refolosita,
+            # iar o tranzactie lasata deschisa ar fi confirmata de urmatorul commit
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def execute(self, sql, params=()):
+        with self.transaction() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def executemany(self, sql, rows):
+        with self.transaction() as cursor:
+            cursor.executemany(sql, rows)
+            return cursor.rowcount
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+        self.local = threading.local()
+
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage(db_name, read_only=False):
+    """Aceeasi instanta Storage pentru acelasi fisier, partajata intre scraper-e"""
+    key = (db_name, read_only)
+    with _storages_lock:
+        if key not in _storages:
+            _storages[key] = Storage(db_name, read_only=read_only)
+        return _storages[key]
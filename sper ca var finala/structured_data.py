@@ -0,0 +1,247 @@
+import html
+import json
+import re
+from urllib.parse import urlparse
+
+
+JSON_LD_RE = re.compile(
+    r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+MICRODATA_RE = re.compile(
+    r'<[a-z][^>]*\bitemprop=["\']price["\'][^>]*>([^<]*)',
+    re.IGNORECASE
+)
+OG_PRICE_RE = re.compile(
+    r'<meta[^>]+(?:property|name)=["\'](?:product|og):price:amount["\'][^>]*>',
+    re.IGNORECASE
+)
+CONTENT_ATTR_RE = re.compile(r'\bcontent=["\']([^"\']*)["\']', re.IGNORECASE)
+GTIN_MICRODATA_RE = re.compile(
+    r'<[a-z][^>]*\b(?:itemprop|property)=["\'](?:gtin(?:8|12|13|14)?|ean|product:ean)["\'][^>]*>([^<]*)',
+    re.IGNORECASE
+)
+GTIN_KEYS = ('gtin13', 'gtin', 'gtin14', 'gtin12', 'gtin8', 'ean')
+# Identitatea paginii, ca sa se aleaga produsul paginii dintre mai multe noduri Product
+PAGE_URL_RE = re.compile(
+    r'<(?:link[^>]+rel=["\']canonical["\']|meta[^>]+property=["\']og:url["\'])[^>]*>',
+    re.IGNORECASE
+)
+URL_ATTR_RE = re.compile(r'\b(?:href|content)=["\']([^"\']*)["\']', re.IGNORECASE)
+PAGE_TITLE_RE = re.compile(
+    r'<title[^>]*>(.*?)</title>|<meta[^>]+property=["\']og:title["\'][^>]*>',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def to_price(value):
+    """Preturile din date structurate sunt numerice (1299.99), nu formatate pentru afisare"""
+    if isinstance(value, (int, float)):
+        price = float(value)
+    else:
+        try:
+            price = float(str(value).strip().replace(',', '.'))
+        except ValueError:
+            return None
+    return price if price > 0 else None
+
+
+def _iter_json_nodes(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from _iter_json_nodes(item)
+    elif isinstance(node, dict):
+        yield node
+        for value in node.values():
+            if isinstance(value, (list, dict)):
+                yield from _iter_json_nodes(value)
+
+
+def _types(node):
+    node_type = node.get('@type', '')
+    return node_type if isinstance(node_type, list) else [node_type]
+
+
+def _top_level_nodes(data):
+    """Nodurile de la radacina unui bloc JSON-LD: lista, @graph si mainEntity"""
+    if isinstance(data, list):
+        for item in data:
+            yield from _top_level_nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        for key in ('@graph', 'mainEntity'):
+            if isinstance(data.get(key), (list, dict)):
+                yield from _top_level_nodes(data[key])
+
+
+def _url_key(url):
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    return (host[4:] if host.startswith('www.') else host), parsed.path.rstrip('/')
+
+
+def _normalize_text(text):
+    return ' '.join(html.unescape(text).casefold().split())
+
+
+def _page_identity(text):
+    """URL-urile (canonical, og:url) si titlurile (<title>, og:title) declarate de pagina"""
+    urls = []
+    for match in PAGE_URL_RE.finditer(text):
+        attr = URL_ATTR_RE.search(match.group(0))
+        if attr and _url_key(attr.group(1))[1]:
+            urls.append(_url_key(attr.group(1)))
+    titles = []
+    for match in PAGE_TITLE_RE.finditer(text):
+        title = match.group(1)
+        if title is None:
+            attr = CONTENT_ATTR_RE.search(match.group(0))
+            title = attr.group(1) if attr else ''
+        if _normalize_text(title):
+            titles.append(_normalize_text(title))
+    return urls, titles
+
+
+def _is_page_product(node, urls, titles):
+    for key in ('url', '@id'):
+        value = node.get(key)
+        if isinstance(value, str) and value:
+            host, path = _url_key(value)
+            if path and any(path == page_path and (not host or not page_host or host == page_host)
+                            for page_host, page_path in urls):
+                return True
+    name = node.get('name')
+    if isinstance(name, str):
+        name = _normalize_text(name)
+        # Titlul paginii are de obicei si numele magazinului ("... | eMAG.ro")
+        return bool(name) and any(name == title or (len(name) >= 8 and name in title) for title in titles)
+    return False
+
+
+def _offer_price(product):
+    for node in _iter_json_nodes(product.get('offers') or []):
+        types = _types(node)
+        if 'Offer' in types or 'AggregateOffer' in types:
+            price = to_price(node.get('price', node.get('lowPrice', '')))
+            if price:
+                return price
+    return None
+
+
+def extract_json_ld(text):
+    """
+    Pretul produsului paginii din JSON-LD. Pagina poate avea si produse recomandate
+    sau accesorii, uneori in blocuri aflate inaintea celui principal: se alege
+    nodul Product al carui url sau nume corespunde paginii, altfel primul Product
+    de la radacina unui bloc. Fara niciun Product ramane primul Offer cu pret.
+    """
+    products, top_level = [], []
+    first_offer = None
+    for match in JSON_LD_RE.finditer(text):
+        try:
+            data = json.loads(match.group(1).strip())
+        except ValueError:
+            continue
+        top_level.extend(node for node in _top_level_nodes(data) if 'Product' in _types(node))
+        for node in _iter_json_nodes(data):
+            types = _types(node)
+            if 'Product' in types:
+                products.append(node)
+            elif first_offer is None and ('Offer' in types or 'AggregateOffer' in types):
+                first_offer = to_price(node.get('price', node.get('lowPrice', '')))
+
+    if products:
+        urls, titles = _page_identity(text)
+        for product in [node for node in products if _is_page_product(node, urls, titles)] + top_level:
+            price = _offer_price(product)
+            if price:
+                return price
+    return first_offer
+
+
+def extract_microdata(text):
+    for match in MICRODATA_RE.finditer(text):
+        tag = match.group(0)
+        content = CONTENT_ATTR_RE.search(tag)
+        price = to_price(content.group(1) if content else match.group(1))
+        if price:
+            return price
+    return None
+
+
+def extract_opengraph(text):
+    for match in OG_PRICE_RE.finditer(text):
+        content = CONTENT_ATTR_RE.search(match.group(0))
+        if content:
+            price = to_price(content.group(1))
+            if price:
+                return price
+    return None
+
+
+def normalize_gtin(value):
+    """GTIN-8/12/13/14 adus la 14 cifre, doar daca cifra de control e corecta"""
+    digits = re.sub(r'[\s-]', '', str(value or ''))
+    if not digits.isdigit() or len(digits) not in (8, 12, 13, 14):
+        return None
+    digits = digits.zfill(14)
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(digits[:13]))
+    if (10 - total % 10) % 10 != int(digits[13]):
+        return None
+    return digits
+
+
+def extract_gtin(content):
+    """Codul EAN/GTIN al produsului din JSON-LD sau microdata, daca pagina il expune"""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+
+    for match in JSON_LD_RE.finditer(content):
+        try:
+            data = json.loads(match.group(1).strip())
+        except ValueError:
+            continue
+        for node in _iter_json_nodes(data):
+            for key in GTIN_KEYS:
+                gtin = normalize_gtin(node.get(key))
+                if gtin:
+                    return gtin
+
+    for match in GTIN_MICRODATA_RE.finditer(content):
+        attr = CONTENT_ATTR_RE.search(match.group(0))
+        gtin = normalize_gtin(attr.group(1) if attr else match.group(1))
+        if gtin:
+            return gtin
+    return None
+
+
+# Pseudo-selectori: se salveaza in products.selector ca orice selector CSS
+STRATEGIES = {
+    '@ld+json': extract_json_ld,
+    '@microdata': extract_microdata,
+    '@og': extract_opengraph,
+}
+
+
+def is_structured_selector(selector):
+    return selector in STRATEGIES
+
+
+def extract_structured_price(content, preferred=None):
+    """
+    Cauta pretul in JSON-LD, microdata si OpenGraph, incepand cu strategia preferata.
+    Returneaza (strategie, pret) sau (None, None).
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+
+    order = list(STRATEGIES)
+    if preferred in STRATEGIES:
+        order.remove(preferred)
+        order.insert(0, preferred)
+
+    for strategy in order:
+        price = STRATEGIES[strategy](content)
+        if price:
+            return strategy, price
+    return None, None
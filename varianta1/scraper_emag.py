@@ -1,12 +1,22 @@
-import requests
+import os
+import sys
 from bs4 import BeautifulSoup
 import sqlite3
 from datetime import datetime
 
+# HttpClient sta langa scraperele din "sper ca var finala", care nu e pachet
+# (numele are spatii), deci nu se poate importa direct. Calea se construieste
+# fata de acest fisier, ca scriptul sa mearga din orice director curent.
+FINAL_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'sper ca var finala'))
+if FINAL_DIR not in sys.path:
+    sys.path.insert(0, FINAL_DIR)
+
+from http_client import HttpClient
+
 url = "https://www.emag.ro/range-extender-wireless-ac1750-tp-link-moduri-re-ap-gigabit-antene-externe-dual-band-re450/pd/D1JS9YBBM/"
 
-headers = {"User-Agent": "Mozilla/5.0"}
-response = requests.get(url, headers=headers)
+client = HttpClient(headers={"User-Agent": "Mozilla/5.0"})
+response = client.get(url)
 soup = BeautifulSoup(response.text, "html.parser")
 
 title_tag = soup.find("h1", class_="page-title")